@@ -42,9 +42,9 @@ class AdapterInterface:
         
         return result
 
-    def update_data(self) -> bool:
+    async def update_data(self) -> bool:
         """Update the provider's data"""
-        return self.agent.update_pool_data() 
+        return await self.agent.update_pool_data() 
 
 async def main():
     adapter = await AdapterInterface().initialize()
@@ -0,0 +1,72 @@
+from web3 import Web3
+
+# ABI fragments of adcs/src/ADCSCoordinator.sol used by the provider
+
+DATA_REQUESTED_EVENT_ABI = {
+    "anonymous": False,
+    "name": "DataRequested",
+    "type": "event",
+    "inputs": [
+        {"indexed": True, "name": "requestId", "type": "uint256"},
+        {"indexed": False, "name": "callbackGasLimit", "type": "uint256"},
+        {"indexed": True, "name": "sender", "type": "address"},
+        {"indexed": False, "name": "jobId", "type": "bytes32"},
+        {"indexed": False, "name": "blockNumber", "type": "uint256"},
+        {"indexed": False, "name": "data", "type": "bytes"},
+    ],
+}
+
+# IADCSCoordinatorBase.RequestCommitment
+REQUEST_COMMITMENT_ABI = {
+    "name": "rc",
+    "type": "tuple",
+    "components": [
+        {"name": "blockNum", "type": "uint64"},
+        {"name": "callbackGasLimit", "type": "uint256"},
+        {"name": "sender", "type": "address"},
+        {"name": "jobId", "type": "bytes32"},
+    ],
+}
+
+
+def _fulfill_function_abi(name, response_abi):
+    return {
+        "name": name,
+        "type": "function",
+        "stateMutability": "nonpayable",
+        "inputs": [
+            {"name": "requestId", "type": "uint256"},
+            response_abi,
+            REQUEST_COMMITMENT_ABI,
+        ],
+        "outputs": [],
+    }
+
+
+# Commitment of an open request, zero once it is fulfilled or cancelled
+GET_COMMITMENT_ABI = {
+    "name": "getCommitment",
+    "type": "function",
+    "stateMutability": "view",
+    "inputs": [{"name": "requestId", "type": "uint256"}],
+    "outputs": [{"name": "", "type": "bytes32"}],
+}
+
+COORDINATOR_ABI = [
+    DATA_REQUESTED_EVENT_ABI,
+    GET_COMMITMENT_ABI,
+    _fulfill_function_abi("fulfillDataRequestUint256", {"name": "response", "type": "uint256"}),
+    _fulfill_function_abi("fulfillDataRequestBool", {"name": "response", "type": "bool"}),
+    _fulfill_function_abi("fulfillDataRequestBytes32", {"name": "response", "type": "bytes32"}),
+    _fulfill_function_abi("fulfillDataRequestBytes", {"name": "response", "type": "bytes"}),
+    _fulfill_function_abi("fulfillDataRequestStringAndBool", {
+        "name": "response",
+        "type": "tuple",
+        "components": [
+            {"name": "name", "type": "string"},
+            {"name": "response", "type": "bool"},
+        ],
+    }),
+]
+
+DATA_REQUESTED_TOPIC = Web3.keccak(text="DataRequested(uint256,uint256,address,bytes32,uint256,bytes)")
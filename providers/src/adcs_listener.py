@@ -0,0 +1,481 @@
+import asyncio
+import json
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional, Set
+
+from adapter_interface import AdapterInterface, AdapterRequest
+from adcs_abi import COORDINATOR_ABI, DATA_REQUESTED_TOPIC
+from concurrency import run_blocking
+from result_store import COMPUTED, FAILED, ResultStore, StoredResult
+from web3 import Web3
+from web3.exceptions import TransactionNotFound
+
+
+class DataRequest(NamedTuple):
+    """A DataRequested event of ADCSCoordinator"""
+    request_id: int
+    callback_gas_limit: int
+    sender: str
+    job_id: bytes
+    block_number: int
+    data: bytes
+    tx_hash: str
+
+
+def is_error_result(result: Any) -> bool:
+    """
+    True for the placeholders the provider returns when it could not answer
+
+    Formatted answers are {"explanation", "value"} dicts; handle_request falls
+    back to bare default values and _format_output to an error explanation.
+    """
+    if not isinstance(result, dict):
+        return True
+    if result.get('success') is False or result.get('value') is None:
+        return True
+    return str(result.get('explanation', '')).startswith('Error formatting response')
+
+
+# End marker of indefinite length CBOR items
+_BREAK = object()
+
+
+def decode_cbor_params(data: bytes) -> Dict[str, Any]:
+    """
+    Decode the CBOR buffer built by ADCS.add / ADCS.addBytes
+
+    The buffer is a flat sequence of key/value items (no enclosing map).
+    Supports unsigned/negative integers, byte and text strings, big numbers
+    (tags 2/3) and indefinite arrays.
+    """
+    offset = 0
+
+    def read_length(info: int) -> int:
+        nonlocal offset
+        if info < 24:
+            return info
+        size = {24: 1, 25: 2, 26: 4, 27: 8}.get(info)
+        if size is None:
+            raise ValueError(f"Unsupported CBOR length encoding: {info}")
+        value = int.from_bytes(data[offset:offset + size], 'big')
+        offset += size
+        return value
+
+    def read_item() -> Any:
+        nonlocal offset
+        initial = data[offset]
+        offset += 1
+        major, info = initial >> 5, initial & 0x1F
+
+        if major == 7 and info == 31:
+            return _BREAK
+        if major in (4, 5) and info == 31:
+            items = []
+            while True:
+                item = read_item()
+                if item is _BREAK:
+                    break
+                items.append(item)
+            return items if major == 4 else dict(zip(items[::2], items[1::2]))
+
+        length = read_length(info)
+        if major == 0:
+            return length
+        if major == 1:
+            return -1 - length
+        if major in (2, 3):
+            value = data[offset:offset + length]
+            offset += length
+            return bytes(value) if major == 2 else value.decode('utf-8')
+        if major == 6:
+            value = read_item()
+            if length == 2:
+                return int.from_bytes(value, 'big')
+            if length == 3:
+                return -1 - int.from_bytes(value, 'big')
+            return value
+        raise ValueError(f"Unsupported CBOR major type: {major}")
+
+    items = []
+    while offset < len(data):
+        items.append(read_item())
+    return dict(zip(items[::2], items[1::2]))
+
+
+class JobRegistry:
+    """
+    What to ask the provider for every jobId
+
+    Loaded from a JSON file mapping a job id (0x-prefixed bytes32 or its
+    plain text name) to AdapterRequest fields, e.g.:
+
+        {"smart-farming": {"network": "BASE", "output_type_id": 2,
+                           "prompt": "Which pool has the highest TVL and APR on BASE?"}}
+
+    Keys in the request's CBOR data (prompt, network, output_type_id) override
+    the job defaults.
+    """
+
+    def __init__(self, jobs: Dict[str, Dict[str, Any]]):
+        self.jobs: Dict[bytes, Dict[str, Any]] = {}
+        for job_id, job in jobs.items():
+            if job_id.startswith('0x'):
+                key = bytes.fromhex(job_id[2:])
+            else:
+                key = job_id.encode('utf-8').ljust(32, b'\x00')
+            self.jobs[key] = job
+
+    @classmethod
+    def from_file(cls, path: str) -> 'JobRegistry':
+        with open(path, 'r') as f:
+            return cls(json.load(f))
+
+    def build_request(self, request: DataRequest) -> AdapterRequest:
+        job = dict(self.jobs.get(bytes(request.job_id), {}))
+        if request.data:
+            job.update({key: value for key, value in decode_cbor_params(request.data).items() if isinstance(key, str)})
+        if 'prompt' not in job:
+            raise ValueError(f"Unknown job {request.job_id.hex()} for request {request.request_id}")
+
+        return AdapterRequest(
+            name=job.get('name', "ADCS Request"),
+            network=job.get('network', 'BASE'),
+            description=job.get('description', ""),
+            variables=job.get('variables', ""),
+            category_id=int(job.get('category_id', 1)),
+            output_type_id=int(job['output_type_id']),
+            prompt=job['prompt']
+        )
+
+
+class DataRequestListener:
+    """
+    Scan ADCSCoordinator DataRequested logs and feed them to the adapter
+
+    Logs are read with one eth_getLogs per block range. The range doubles while
+    scans succeed and halves when the node rejects it (result or range limits),
+    so catching up after downtime takes few RPC calls. The last block whose
+    requests have all been processed is persisted in a checkpoint file.
+    Requests are processed by a fixed number of workers through a bounded queue,
+    which also throttles scanning when the pipeline falls behind.
+
+    With a ResultStore, computed results are persisted before submission:
+    requests seen again reuse the stored result, and results not confirmed
+    on-chain are resubmitted when the listener starts and every
+    `resubmit_interval` seconds after, unless their last transaction was mined
+    or is still pending or the coordinator no longer holds the request. Failed
+    fulfillments are retried up to `max_attempts`. Error placeholders of the
+    provider (see is_error_result) are stored as failed and never submitted.
+
+    `on_result` returns the hash of the transaction it sent, if any.
+    """
+
+    def __init__(
+        self,
+        adapter: AdapterInterface,
+        rpc_url: str,
+        coordinator_address: str,
+        jobs: JobRegistry,
+        checkpoint_path: str = './adcs_listener_checkpoint.json',
+        start_block: int = 0,
+        confirmations: int = 0,
+        concurrency: int = 4,
+        initial_range: int = 2000,
+        max_range: int = 100000,
+        poll_interval: float = 2.0,
+        on_result: Optional[Callable[[DataRequest, AdapterRequest, Any], Awaitable[Optional[str]]]] = None,
+        result_store: Optional[ResultStore] = None,
+        max_attempts: int = 3,
+        resubmit_interval: float = 60.0
+    ):
+        self.adapter = adapter
+        self.web3 = Web3(Web3.HTTPProvider(rpc_url))
+        self.coordinator_address = Web3.to_checksum_address(coordinator_address)
+        self.contract = self.web3.eth.contract(address=self.coordinator_address, abi=COORDINATOR_ABI)
+        self.jobs = jobs
+        self.checkpoint_path = checkpoint_path
+        self.start_block = start_block
+        self.confirmations = confirmations
+        self.concurrency = concurrency
+        self.block_range = initial_range
+        self.max_range = max_range
+        self.poll_interval = poll_interval
+        self.on_result = on_result or self._print_result
+        self.result_store = result_store
+        self.max_attempts = max_attempts
+        self.resubmit_interval = resubmit_interval
+
+        self.scanned_to = self._load_checkpoint()
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 4)
+        self._in_flight: Dict[int, int] = {}
+        self._processing: Set[int] = set()
+        self._resubmitted_at = 0.0
+        self._workers: List[asyncio.Task] = []
+        self._stopped = asyncio.Event()
+
+    @classmethod
+    def from_env(cls, adapter: AdapterInterface, **kwargs) -> 'DataRequestListener':
+        """Build the listener from ADCS_* environment variables"""
+        return cls(
+            adapter,
+            rpc_url=os.getenv('ADCS_RPC_URL', 'http://127.0.0.1:8545'),
+            coordinator_address=os.environ['ADCS_COORDINATOR_ADDRESS'],
+            jobs=JobRegistry.from_file(os.getenv('ADCS_JOBS_FILE', './adcs_jobs.json')),
+            checkpoint_path=os.getenv('ADCS_CHECKPOINT_PATH', './adcs_listener_checkpoint.json'),
+            start_block=int(os.getenv('ADCS_START_BLOCK', '0')),
+            confirmations=int(os.getenv('ADCS_CONFIRMATIONS', '0')),
+            concurrency=int(os.getenv('ADCS_CONCURRENCY', '4')),
+            max_attempts=int(os.getenv('ADCS_MAX_ATTEMPTS', '3')),
+            resubmit_interval=float(os.getenv('ADCS_RESUBMIT_INTERVAL', '60')),
+            **kwargs
+        )
+
+    @staticmethod
+    async def _print_result(request: DataRequest, adapter_request: AdapterRequest, result: Any) -> Optional[str]:
+        print(f"Processed ADCS request {request.request_id}: {result}")
+
+    def _load_checkpoint(self) -> int:
+        try:
+            with open(self.checkpoint_path, 'r') as f:
+                return int(json.load(f)['last_block'])
+        except FileNotFoundError:
+            return self.start_block - 1
+
+    def _save_checkpoint(self) -> None:
+        # Never move past a block that still has requests being processed
+        last_block = min(self._in_flight) - 1 if self._in_flight else self.scanned_to
+        temporary = f"{self.checkpoint_path}.tmp"
+        with open(temporary, 'w') as f:
+            json.dump({"last_block": last_block, "updated_at": time.time()}, f)
+        os.replace(temporary, self.checkpoint_path)
+
+    def _get_logs(self, from_block: int, to_block: int) -> List[DataRequest]:
+        logs = self.web3.eth.get_logs({
+            "address": self.coordinator_address,
+            "fromBlock": from_block,
+            "toBlock": to_block,
+            "topics": [DATA_REQUESTED_TOPIC],
+        })
+        event = self.contract.events.DataRequested()
+        requests = []
+        for log in logs:
+            args = event.process_log(log)['args']
+            requests.append(DataRequest(
+                request_id=args['requestId'],
+                callback_gas_limit=args['callbackGasLimit'],
+                sender=args['sender'],
+                job_id=bytes(args['jobId']),
+                block_number=args['blockNumber'],
+                data=bytes(args['data']),
+                tx_hash=log['transactionHash'].hex()
+            ))
+        return requests
+
+    @staticmethod
+    def _is_range_error(error: Exception) -> bool:
+        message = str(error).lower()
+        return any(hint in message for hint in ('range', 'limit', 'too many', 'exceed', 'timeout', 'response size'))
+
+    async def scan_once(self) -> int:
+        """
+        Scan from the checkpoint up to the confirmed head
+
+        Returns:
+            Number of requests found
+        """
+        head = await run_blocking(lambda: self.web3.eth.block_number) - self.confirmations
+        found = 0
+        while self.scanned_to < head and not self._stopped.is_set():
+            from_block = self.scanned_to + 1
+            to_block = min(head, from_block + self.block_range - 1)
+            try:
+                requests = await run_blocking(self._get_logs, from_block, to_block)
+            except Exception as e:
+                if self._is_range_error(e) and self.block_range > 1:
+                    self.block_range = max(1, self.block_range // 2)
+                    continue
+                raise
+
+            for request in requests:
+                self._in_flight[request.block_number] = self._in_flight.get(request.block_number, 0) + 1
+                await self._queue.put(request)
+            found += len(requests)
+            self.scanned_to = to_block
+            self.block_range = min(self.max_range, self.block_range * 2)
+            self._save_checkpoint()
+        return found
+
+    def _snapshot_version(self, network: str) -> Optional[int]:
+        snapshot = self.adapter.agent.snapshots.get(network.upper())
+        return snapshot.version if snapshot else None
+
+    async def _submit(self, request: DataRequest, adapter_request: AdapterRequest, result: Any) -> None:
+        try:
+            tx_hash = await self.on_result(request, adapter_request, result)
+        except Exception as e:
+            if self.result_store:
+                self.result_store.mark_failed(request.request_id, str(e), attempted=True)
+            raise
+        if self.result_store:
+            self.result_store.mark_submitted(request.request_id, tx_hash)
+
+    def _transaction_pending(self, tx_hash: str) -> bool:
+        try:
+            return self.web3.eth.get_transaction(tx_hash) is not None
+        except TransactionNotFound:
+            return False
+
+    async def _settled_on_chain(self, stored: StoredResult) -> bool:
+        """
+        True when a stored result must not be sent again
+
+        That is when its last transaction was mined successfully (the row is
+        marked confirmed) or is still pending, or when the coordinator no
+        longer holds the request (fulfilled or cancelled).
+        """
+        if stored.tx_hash:
+            try:
+                receipt = await run_blocking(self.web3.eth.get_transaction_receipt, stored.tx_hash)
+            except TransactionNotFound:
+                receipt = None
+            if receipt is not None and receipt['status'] == 1:
+                self.result_store.mark_confirmed(stored.request_id, stored.tx_hash)
+                return True
+            if receipt is None and await run_blocking(self._transaction_pending, stored.tx_hash):
+                return True
+        commitment = await run_blocking(self.contract.functions.getCommitment(stored.request_id).call)
+        if not any(commitment):
+            self.result_store.mark_confirmed(stored.request_id, stored.tx_hash)
+            return True
+        return False
+
+    async def _resubmit(self, stored: StoredResult, request: DataRequest, adapter_request: AdapterRequest) -> bool:
+        """Send a stored result again unless it is settled on-chain, returns whether it was sent"""
+        if is_error_result(stored.result):
+            return False
+        if stored.status != COMPUTED and await self._settled_on_chain(stored):
+            return False
+        await self._submit(request, adapter_request, stored.result)
+        return True
+
+    async def process(self, request: DataRequest) -> None:
+        """Answer one request, reusing a stored result when there is one"""
+        adapter_request = self.jobs.build_request(request)
+        stored = self.result_store.get(request.request_id) if self.result_store else None
+        if stored is not None:
+            # Submitted rows are checked and resent by resubmit_stored only,
+            # confirmed ones are done and failed ones retry while attempts remain
+            if stored.status in (COMPUTED, FAILED) and stored.attempts < self.max_attempts:
+                await self._resubmit(stored, request, adapter_request)
+            return
+
+        result = await self.adapter.process_request(adapter_request)
+        if self.result_store:
+            self.result_store.save(request, adapter_request.output_type_id, result, self._snapshot_version(adapter_request.network))
+        if is_error_result(result):
+            if self.result_store:
+                self.result_store.mark_failed(request.request_id, "Provider returned an error result, not submitted")
+            print(f"Not submitting ADCS request {request.request_id}: provider returned an error result {result!r}")
+            return
+        await self._submit(request, adapter_request, result)
+
+    async def resubmit_stored(self) -> int:
+        """
+        Resubmit stored results that were never confirmed (e.g. after a crash)
+
+        Returns:
+            Number of results resubmitted
+        """
+        if not self.result_store:
+            return 0
+        self._resubmitted_at = time.monotonic()
+        resubmitted = 0
+        for stored in self.result_store.unfinished(self.max_attempts):
+            if stored.request_id in self._processing:
+                continue  # a worker is answering it right now
+            request = DataRequest(**stored.request)
+            try:
+                resubmitted += await self._resubmit(stored, request, self.jobs.build_request(request))
+            except Exception as e:
+                print(f"Error resubmitting ADCS request {request.request_id}: {e}")
+        return resubmitted
+
+    async def _worker(self) -> None:
+        while True:
+            request = await self._queue.get()
+            self._processing.add(request.request_id)
+            try:
+                await self.process(request)
+            except Exception as e:
+                print(f"Error processing ADCS request {request.request_id}: {e}")
+            finally:
+                self._processing.discard(request.request_id)
+                remaining = self._in_flight[request.block_number] - 1
+                if remaining:
+                    self._in_flight[request.block_number] = remaining
+                else:
+                    del self._in_flight[request.block_number]
+                    self._save_checkpoint()
+                self._queue.task_done()
+
+    async def run(self) -> None:
+        """Scan and process requests until stop() is called"""
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+        try:
+            await self.resubmit_stored()
+            while not self._stopped.is_set():
+                try:
+                    await self.scan_once()
+                except Exception as e:
+                    print(f"Error scanning DataRequested logs: {e}")
+                if self.result_store:
+                    if time.monotonic() - self._resubmitted_at >= self.resubmit_interval:
+                        await self.resubmit_stored()
+                    self.result_store.maybe_compact()
+                try:
+                    await asyncio.wait_for(self._stopped.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+            await self._queue.join()
+        finally:
+            for worker in self._workers:
+                worker.cancel()
+            await asyncio.gather(*self._workers, return_exceptions=True)
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+
+async def main():
+    """
+    Run the listener against a chain, e.g. a local anvil / hardhat node:
+
+        ADCS_RPC_URL=http://127.0.0.1:8545 ADCS_COORDINATOR_ADDRESS=0x... \\
+        ADCS_JOBS_FILE=./adcs_jobs.json python adcs_listener.py
+
+    Results are submitted on-chain when ADCS_ORACLE_PRIVATE_KEY is set,
+    otherwise they are only printed.
+    """
+    from fulfillment_submitter import FulfillmentSubmitter
+
+    adapter = await AdapterInterface().initialize()
+    result_store = ResultStore.from_env()
+    submitter = None
+    if os.getenv('ADCS_ORACLE_PRIVATE_KEY'):
+        submitter = await FulfillmentSubmitter.from_env(result_store=result_store).start()
+    listener = DataRequestListener.from_env(
+        adapter,
+        on_result=submitter.on_result if submitter else None,
+        result_store=result_store
+    )
+    try:
+        await listener.run()
+    finally:
+        if submitter:
+            await submitter.stop()
+        result_store.close()
+        await adapter.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
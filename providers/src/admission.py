@@ -0,0 +1,211 @@
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, List, NamedTuple, Optional
+
+# Request classes in priority order: oracle fulfillments have an on-chain deadline,
+# ad-hoc queries (dashboards, manual calls) can wait or be retried
+ORACLE = 'oracle'
+QUERY = 'query'
+
+
+class PriorityClass(NamedTuple):
+    """An admission class and its limits"""
+    name: str
+    max_queue: int       # waiting requests before new ones are rejected with 429
+    max_wait: float      # seconds in the queue before a request is rejected with 503
+    max_in_flight: int   # running requests of the class, leaves the rest of the slots to higher classes
+
+
+class AdmissionRejected(Exception):
+    """A request the server cannot take now, answered with `status_code` and Retry-After"""
+
+    def __init__(self, status_code: int, retry_after: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.detail = detail
+
+
+class ClassStats:
+    """Counters and queue wait window of a priority class"""
+
+    def __init__(self, window: int = 1000):
+        self.waits: Deque[float] = deque(maxlen=window)
+        self.admitted = 0
+        self.rejected_full = 0
+        self.rejected_timeout = 0
+        self.in_flight = 0
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.waits:
+            return None
+        ordered = sorted(self.waits)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class AdmissionController:
+    """
+    Bounded priority admission in front of the query pipeline
+
+    At most `concurrency` requests run at once, the number of pipelines the
+    upstreams (LLM provider, subgraph, quote API) sustain together. When every
+    slot is busy requests wait in their class queue, and a freed slot goes to
+    the highest class with a waiter. Lower classes are also capped below
+    `concurrency` so a burst of ad-hoc queries always leaves slots for oracle
+    requests. A full queue rejects immediately (429) and a request that waited
+    longer than its class allows is rejected (503), both with a Retry-After
+    estimated from the recent service time.
+    """
+
+    def __init__(self, concurrency: int, classes: List[PriorityClass]):
+        self.concurrency = concurrency
+        self.classes = {priority_class.name: priority_class for priority_class in classes}
+        self.order = [priority_class.name for priority_class in classes]
+        self._queues: Dict[str, Deque[asyncio.Future]] = {name: deque() for name in self.order}
+        self._stats: Dict[str, ClassStats] = {name: ClassStats() for name in self.order}
+        self._service_times: Deque[float] = deque(maxlen=200)
+        self.in_flight = 0
+
+    @classmethod
+    def from_env(cls) -> 'AdmissionController':
+        concurrency = int(os.getenv('ADMISSION_CONCURRENCY', '16'))
+        reserved = int(os.getenv('ADMISSION_ORACLE_RESERVED', str(max(1, concurrency // 4))))
+        return cls(concurrency, [
+            PriorityClass(
+                name=ORACLE,
+                max_queue=int(os.getenv('ADMISSION_QUEUE_ORACLE', '256')),
+                max_wait=float(os.getenv('ADMISSION_MAX_WAIT_ORACLE', '60')),
+                max_in_flight=concurrency,
+            ),
+            PriorityClass(
+                name=QUERY,
+                max_queue=int(os.getenv('ADMISSION_QUEUE_QUERY', '64')),
+                max_wait=float(os.getenv('ADMISSION_MAX_WAIT_QUERY', '10')),
+                max_in_flight=max(1, concurrency - reserved),
+            ),
+        ])
+
+    def _can_start(self, name: str) -> bool:
+        return self.in_flight < self.concurrency and self._stats[name].in_flight < self.classes[name].max_in_flight
+
+    def _waiting_ahead(self, name: str) -> bool:
+        """Whether a request of this class or a higher one is already queued"""
+        for other in self.order:
+            if self._queues[other]:
+                return True
+            if other == name:
+                return False
+        return False
+
+    def retry_after(self, name: str) -> int:
+        """Seconds until the queue of a class has likely drained"""
+        service = sum(self._service_times) / len(self._service_times) if self._service_times else 1.0
+        ahead = sum(len(self._queues[other]) for other in self.order[:self.order.index(name) + 1])
+        return max(1, math.ceil(service * (ahead + 1) / self.concurrency))
+
+    def _start(self, name: str) -> None:
+        self.in_flight += 1
+        self._stats[name].in_flight += 1
+        self._stats[name].admitted += 1
+
+    def _dispatch(self) -> None:
+        """Hand free slots to queued requests, highest class first"""
+        for name in self.order:
+            queue = self._queues[name]
+            while queue and self._can_start(name):
+                waiter = queue.popleft()
+                if waiter.done():
+                    continue  # timed out or cancelled meanwhile
+                self._start(name)
+                waiter.set_result(None)
+
+    async def acquire(self, name: str) -> float:
+        """
+        Wait for a slot
+
+        Returns:
+            Seconds spent in the queue
+
+        Raises:
+            AdmissionRejected: The queue is full or the wait exceeded the class limit
+        """
+        priority_class = self.classes[name]
+        stats = self._stats[name]
+        if self._can_start(name) and not self._waiting_ahead(name):
+            self._start(name)
+            stats.waits.append(0.0)
+            return 0.0
+
+        queue = self._queues[name]
+        if len(queue) >= priority_class.max_queue:
+            stats.rejected_full += 1
+            raise AdmissionRejected(429, self.retry_after(name), f"Too many queued {name} requests")
+
+        waiter = asyncio.get_running_loop().create_future()
+        queue.append(waiter)
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout=priority_class.max_wait)
+        except asyncio.TimeoutError:
+            if waiter.done() and not waiter.cancelled():
+                # Granted while the timeout fired, give the slot back
+                self.release(name, 0.0)
+            else:
+                waiter.cancel()
+            stats.rejected_timeout += 1
+            raise AdmissionRejected(503, self.retry_after(name), f"Timed out waiting for capacity ({name})")
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release(name, 0.0)
+            else:
+                waiter.cancel()
+            raise
+        finally:
+            if waiter in queue:
+                queue.remove(waiter)
+        waited = time.perf_counter() - started
+        stats.waits.append(waited)
+        return waited
+
+    def release(self, name: str, service_time: Optional[float] = None) -> None:
+        self.in_flight -= 1
+        self._stats[name].in_flight -= 1
+        if service_time:
+            self._service_times.append(service_time)
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, name: str) -> AsyncIterator[float]:
+        """Run a request under admission control, yields the queue wait in seconds"""
+        waited = await self.acquire(name)
+        started = time.perf_counter()
+        try:
+            yield waited
+        finally:
+            self.release(name, time.perf_counter() - started)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "concurrency": self.concurrency,
+            "in_flight": self.in_flight,
+            "avg_service_seconds": sum(self._service_times) / len(self._service_times) if self._service_times else None,
+            "classes": {
+                name: {
+                    "queue_depth": len(self._queues[name]),
+                    "max_queue": self.classes[name].max_queue,
+                    "in_flight": stats.in_flight,
+                    "max_in_flight": self.classes[name].max_in_flight,
+                    "admitted": stats.admitted,
+                    "rejected_full": stats.rejected_full,
+                    "rejected_timeout": stats.rejected_timeout,
+                    "wait_p50": stats.percentile(0.50),
+                    "wait_p95": stats.percentile(0.95),
+                    "wait_p99": stats.percentile(0.99),
+                }
+                for name, stats in self._stats.items()
+            },
+        }
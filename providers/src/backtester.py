@@ -0,0 +1,343 @@
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+from pool_snapshot import PoolSnapshot
+from risk_scoring import SECONDS_PER_YEAR, compute_risk_scores
+from timeseries_store import PoolTimeSeriesStore
+
+
+class BacktestData(NamedTuple):
+    """Pool history aligned on a common time grid, columns are pools"""
+    timestamps: np.ndarray   # (T,)
+    addresses: List[str]     # (P,)
+    fee_tier: np.ndarray     # (P,)
+    tvl: np.ndarray          # (T, P), NaN when the pool was not tracked
+    volume_24h: np.ndarray   # (T, P)
+    price: np.ndarray        # (T, P) pool price from the on-chain tick, NaN when not recorded
+
+
+class PolicyGrid(NamedTuple):
+    """
+    Parameters of K selection policies, one array entry per policy
+
+    The policy is the provider's: pick the pool with the best
+    apr_bps - risk_weight * risk_bps among pools above min_tvl.
+    """
+    rebalance_steps: np.ndarray        # re-evaluate every N time steps
+    lookback_steps: np.ndarray         # volatility window in time steps
+    risk_weight: np.ndarray            # weight of risk_bps against apr_bps
+    min_tvl: np.ndarray                # ignore pools shallower than this
+    rotation_threshold_bps: np.ndarray # required score gain to rotate
+
+
+class BacktestResult(NamedTuple):
+    """Outcome of every policy, arrays of length K"""
+    final_value: np.ndarray
+    fee_income: np.ndarray
+    impermanent_loss: np.ndarray
+    swap_costs: np.ndarray
+    rotations: np.ndarray
+    annualized_return: np.ndarray
+
+
+def make_policy_grid(
+    rebalance_steps: Sequence[int] = (24,),
+    lookback_steps: Sequence[int] = (168,),
+    risk_weight: Sequence[float] = (1.0,),
+    min_tvl: Sequence[float] = (0.0,),
+    rotation_threshold_bps: Sequence[float] = (0.0,),
+) -> PolicyGrid:
+    """Cartesian product of the parameter values"""
+    product = np.array(list(itertools.product(
+        rebalance_steps, lookback_steps, risk_weight, min_tvl, rotation_threshold_bps
+    )), dtype=np.float64)
+    return PolicyGrid(
+        rebalance_steps=product[:, 0].astype(np.int64),
+        lookback_steps=product[:, 1].astype(np.int64),
+        risk_weight=product[:, 2],
+        min_tvl=product[:, 3],
+        rotation_threshold_bps=product[:, 4],
+    )
+
+
+def _slice_grid(grid: PolicyGrid, start: int, end: int) -> PolicyGrid:
+    return PolicyGrid(*(field[start:end] for field in grid))
+
+
+def load_backtest_data(
+    store: PoolTimeSeriesStore,
+    snapshot: PoolSnapshot,
+    start: float,
+    end: float,
+    interval: float = 3600,
+    max_pools: int = 200
+) -> BacktestData:
+    """
+    Load the history of the deepest pools of a snapshot from the time-series store
+
+    Fee tiers come from the snapshot, so only pools present in it are kept.
+    """
+    timestamps, addresses, tvl = store.read_matrix(snapshot.chain, start, end, 'tvl', interval=interval)
+    _, _, volume = store.read_matrix(snapshot.chain, start, end, 'volume_24h', interval=interval)
+    _, _, price = store.read_matrix(snapshot.chain, start, end, 'price', interval=interval)
+
+    rows = [(column, snapshot.index_of(address)) for column, address in enumerate(addresses)]
+    rows = [(column, row) for column, row in rows if row is not None]
+    rows.sort(key=lambda item: -snapshot.tvl[item[1]])
+    rows = rows[:max_pools]
+    columns = np.array([column for column, _ in rows], dtype=np.int64)
+
+    return BacktestData(
+        timestamps=timestamps,
+        addresses=[addresses[column] for column in columns],
+        fee_tier=np.array([snapshot.fee_tier[row] for _, row in rows], dtype=np.int64),
+        tvl=tvl[:, columns],
+        volume_24h=volume[:, columns],
+        price=price[:, columns],
+    )
+
+
+def _forward_fill(values: np.ndarray) -> np.ndarray:
+    """Last finite value of every column at every step, NaN before the first one"""
+    valid = np.isfinite(values)
+    last = np.maximum.accumulate(np.where(valid, np.arange(len(values))[:, None], 0), axis=0)
+    filled = values[last, np.arange(values.shape[1])]
+    return np.where(np.maximum.accumulate(valid, axis=0), filled, np.nan)
+
+
+def _rolling_volatility(log_price: np.ndarray, window: int, sample_interval: float) -> np.ndarray:
+    """Annualized volatility over the last `window` returns at every step, (T, P)"""
+    returns = np.vstack([np.full((1, log_price.shape[1]), np.nan), np.diff(log_price, axis=0)])
+    valid = np.isfinite(returns)
+    returns = np.where(valid, returns, 0.0)
+
+    def window_sum(values):
+        cumulative = np.cumsum(values, axis=0)
+        # Histories shorter than the window sum everything so far
+        shift = min(window, len(values))
+        shifted = np.vstack([np.zeros((shift, values.shape[1])), cumulative[:len(values) - shift]])
+        return cumulative - shifted
+
+    count = window_sum(valid.astype(np.float64))
+    total = window_sum(returns)
+    squares = window_sum(returns ** 2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        variance = (squares - total ** 2 / count) / (count - 1)
+    volatility = np.sqrt(np.clip(variance, 0, None) * SECONDS_PER_YEAR / sample_interval)
+    return np.where(count >= 2, volatility, np.nan)
+
+
+def simulate(data: BacktestData, grid: PolicyGrid, slippage: float = 1.0, position_usd: float = 10_000.0) -> BacktestResult:
+    """
+    Simulate K policies at once over the history
+
+    Each step is vectorized over policies and pools: positions earn the pool's
+    fee share of volume, suffer impermanent loss of the pool price relative to
+    their entry and pay swap fees plus price impact (slippage * amount in USD
+    / tvl) for the USDC <-> token swaps on every rotation. Values are relative
+    to an initial position of 1 (position_usd dollars). Steps without a
+    recorded price carry the last one; pools never priced incur no IL.
+
+    Args:
+        data: Aligned pool history
+        grid: Policy parameters
+        slippage: Price impact coefficient of the swaps
+        position_usd: Initial position size in USD, scales the price impact
+
+    Raises:
+        ValueError: A policy rebalances every zero or fewer steps
+    """
+    if np.any(grid.rebalance_steps <= 0):
+        raise ValueError("rebalance_steps must be positive")
+    steps, pools = data.tvl.shape
+    policies = len(grid.risk_weight)
+    if steps < 2 or pools == 0:
+        empty = np.zeros(policies)
+        return BacktestResult(np.ones(policies), empty, empty, empty, empty.astype(np.int64), empty)
+
+    sample_interval = float(np.median(np.diff(data.timestamps)))
+    tvl = data.tvl
+    available = np.isfinite(tvl) & (tvl > 0)
+    tvl_filled = np.where(available, tvl, 0.0)
+    volume = np.nan_to_num(data.volume_24h)
+    price = np.where(np.isfinite(data.price) & (data.price > 0), data.price, np.nan)
+    log_price = np.log(price)
+    price = _forward_fill(price)
+
+    # Volatility for every distinct lookback, policies index into it
+    lookbacks, lookback_index = np.unique(grid.lookback_steps, return_inverse=True)
+    volatility = np.stack([_rolling_volatility(log_price, int(window), sample_interval) for window in lookbacks])
+
+    # Fee yield of one unit of liquidity over one step
+    with np.errstate(divide='ignore', invalid='ignore'):
+        step_fee_yield = np.where(
+            available, volume * data.fee_tier / 1e6 / tvl_filled * sample_interval / 86400, 0.0
+        )
+    swap_fee = data.fee_tier / 1e6
+
+    policy_index = np.arange(policies)
+    held = np.full(policies, -1)
+    value = np.ones(policies)
+    entry_price = np.zeros(policies)
+    entry_value = np.ones(policies)
+    fees = np.zeros(policies)
+    losses = np.zeros(policies)
+    costs = np.zeros(policies)
+    rotations = np.zeros(policies, dtype=np.int64)
+
+    def lp_ratio(current):
+        # LP value relative to its entry from the price move only
+        known = (held >= 0) & np.isfinite(current) & np.isfinite(entry_price)
+        ratio = np.where(known, current / np.where(known, entry_price, 1.0), 1.0)
+        return 2 * np.sqrt(ratio) / (1 + ratio)
+
+    for t in range(steps - 1):
+        due = (t % grid.rebalance_steps) == 0
+        if due.any():
+            # Risk only depends on the lookback, score it once per distinct window
+            scores = compute_risk_scores(data.fee_tier, tvl_filled[t], volume[t], volatility[:, t])
+            score = scores.apr_bps.astype(np.float64) - grid.risk_weight[:, None] * scores.risk_bps[lookback_index]
+            eligible = available[t] & (tvl_filled[t] >= grid.min_tvl[:, None])
+            score = np.where(eligible, score, -np.inf)
+            best = np.argmax(score, axis=1)
+            best_score = score[policy_index, best]
+            current_score = np.where(held >= 0, score[policy_index, np.maximum(held, 0)], -np.inf)
+            rotate = due & np.isfinite(best_score) & (best != held) & (
+                best_score - current_score > grid.rotation_threshold_bps
+            )
+
+            if rotate.any():
+                # Exit: swap both sides of the old position back to USDC
+                old = np.maximum(held, 0)
+                exit_cost = np.where(
+                    held >= 0,
+                    swap_fee[old] + slippage * position_usd * value / np.maximum(tvl_filled[t, old], 1.0),
+                    0.0
+                )
+                # Enter: swap USDC into both sides of the new pool
+                enter_cost = swap_fee[best] + slippage * position_usd * value / np.maximum(tvl_filled[t, best], 1.0)
+                cost = np.where(rotate, value * np.clip(exit_cost + enter_cost, 0, 1), 0.0)
+                costs += cost
+                value -= cost
+                rotations += rotate
+                held = np.where(rotate, best, held)
+                entry_price = np.where(rotate, price[t, best], entry_price)
+                entry_value = np.where(rotate, value, entry_value)
+
+        if (held < 0).all():
+            continue
+
+        index = np.maximum(held, 0)
+        holding = (held >= 0) & available[t + 1, index]
+        before = lp_ratio(np.where(holding, price[t, index], entry_price))
+        after = lp_ratio(np.where(holding, price[t + 1, index], entry_price))
+        il_step = np.where(holding, entry_value * (after - before), 0.0)
+        fee_step = np.where(holding, value * step_fee_yield[t + 1, index], 0.0)
+        value += il_step + fee_step
+        fees += fee_step
+        losses -= il_step
+        # Positions entered before their pool had a recorded price start tracking IL at the first one
+        unpriced = holding & ~np.isfinite(entry_price) & np.isfinite(price[t + 1, index])
+        entry_price = np.where(unpriced, price[t + 1, index], entry_price)
+        entry_value = np.where(unpriced, value, entry_value)
+
+    years = (data.timestamps[-1] - data.timestamps[0]) / SECONDS_PER_YEAR
+    with np.errstate(invalid='ignore', divide='ignore'):
+        annualized = np.where(years > 0, np.sign(value) * np.abs(value) ** (1 / years) - 1, 0.0)
+    return BacktestResult(value, fees, losses, costs, rotations, annualized)
+
+
+# Backtest data of a worker process, sent once by the initializer
+_worker_data: Optional[BacktestData] = None
+
+
+def _init_worker(data: BacktestData) -> None:
+    global _worker_data
+    _worker_data = data
+
+
+def _simulate_chunk(grid: PolicyGrid, slippage: float, position_usd: float) -> BacktestResult:
+    return simulate(_worker_data, grid, slippage, position_usd)
+
+
+def run_backtest(
+    data: BacktestData,
+    grid: PolicyGrid,
+    slippage: float = 1.0,
+    workers: Optional[int] = None,
+    chunk_size: int = 256,
+    position_usd: float = 10_000.0
+) -> BacktestResult:
+    """
+    Evaluate every policy of the grid, spreading chunks of policies across processes
+
+    Args:
+        position_usd: Initial position size in USD (see simulate)
+        workers: Process count (default: CPU count, 1 runs in-process)
+        chunk_size: Policies per chunk
+    """
+    workers = workers or os.cpu_count() or 1
+    policies = len(grid.risk_weight)
+    if workers == 1 or policies <= chunk_size:
+        return simulate(data, grid, slippage, position_usd)
+
+    chunks = [_slice_grid(grid, start, start + chunk_size) for start in range(0, policies, chunk_size)]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(data,)) as executor:
+        results = list(executor.map(_simulate_chunk, chunks, itertools.repeat(slippage), itertools.repeat(position_usd)))
+    return BacktestResult(*(np.concatenate(field) for field in zip(*results)))
+
+
+def summarize(grid: PolicyGrid, result: BacktestResult, top_n: int = 10) -> List[Dict[str, float]]:
+    """Best policies by final value"""
+    order = np.argsort(-result.final_value)[:top_n]
+    return [
+        {
+            **{name: float(getattr(grid, name)[index]) for name in PolicyGrid._fields},
+            **{name: float(getattr(result, name)[index]) for name in BacktestResult._fields},
+        }
+        for index in order
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep farming policies over the local pool history")
+    parser.add_argument('--network', default='BASE')
+    parser.add_argument('--days', type=float, default=90)
+    parser.add_argument('--interval', type=float, default=3600, help="Time step in seconds")
+    parser.add_argument('--max-pools', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--position-usd', type=float, default=10_000.0, help="Position size the price impact is computed for")
+    args = parser.parse_args()
+
+    store = PoolTimeSeriesStore.from_env()
+    end = time.time()
+    start = end - args.days * 86400
+
+    # Pool universe and fee tiers from a fresh snapshot
+    from graphql_client import fetch_pools_once
+    snapshot = PoolSnapshot.from_graphql(asyncio.run(fetch_pools_once(args.network, 'tvl')), args.network)
+
+    data = load_backtest_data(store, snapshot, start, end, args.interval, args.max_pools)
+    grid = make_policy_grid(
+        rebalance_steps=(6, 12, 24, 72, 168),
+        lookback_steps=(24, 72, 168, 336),
+        risk_weight=(0.0, 0.5, 1.0, 2.0, 4.0),
+        min_tvl=(1e5, 1e6),
+        rotation_threshold_bps=(0, 100, 500),
+    )
+
+    started = time.perf_counter()
+    result = run_backtest(data, grid, workers=args.workers, position_usd=args.position_usd)
+    print(f"{len(grid.risk_weight)} policies x {len(data.timestamps)} steps x {len(data.addresses)} pools "
+          f"in {time.perf_counter() - started:.1f}s")
+    print(json.dumps(summarize(grid, result), indent=2))
+
+if __name__ == "__main__":
+    main()
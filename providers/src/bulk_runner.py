@@ -0,0 +1,301 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterator, Optional, Set, Tuple
+
+from adapter_interface import AdapterInterface, AdapterRequest
+from response_encoding import dumps_json
+
+# Fields of a request line, with the defaults of the HTTP API
+REQUEST_DEFAULTS = {
+    "name": "Uniswap Query",
+    "description": "",
+    "variables": "",
+    "category_id": 1,
+}
+
+
+def parse_request(line: str) -> Tuple[Optional[Any], AdapterRequest]:
+    """
+    AdapterRequest of a JSONL line
+
+    Returns:
+        The line's "id" (None when absent) and the request
+
+    Raises:
+        ValueError: The line is not a valid request
+    """
+    try:
+        fields = json.loads(line)
+        return fields.get('id'), AdapterRequest(
+            name=fields.get('name', REQUEST_DEFAULTS['name']),
+            network=fields['network'],
+            description=fields.get('description', REQUEST_DEFAULTS['description']),
+            variables=fields.get('variables', REQUEST_DEFAULTS['variables']),
+            category_id=int(fields.get('category_id', REQUEST_DEFAULTS['category_id'])),
+            output_type_id=int(fields['output_type_id']),
+            prompt=fields['prompt'],
+        )
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        raise ValueError(f"Invalid request line: {e!r}")
+
+
+class Checkpoint:
+    """
+    Progress of a run: every position below `next_line` is done, plus `done` beyond it
+
+    Positions count the lines of one shard (line // shards). `output_bytes` is
+    the output size when the checkpoint was written; results appended after it
+    are read back on resume (the whole output when no checkpoint was saved
+    yet), so a crash between writing a result and saving the checkpoint does
+    not process the line twice.
+    """
+
+    def __init__(self, path: str, shards: int = 1):
+        self.path = path
+        self.shards = shards
+        self.next_line = 0
+        self.done: Set[int] = set()
+        self.output_bytes = 0
+
+    def load(self, output_path: str) -> 'Checkpoint':
+        try:
+            with open(self.path, 'r') as f:
+                state = json.load(f)
+            self.next_line = int(state['next_line'])
+            self.done = set(state['done'])
+            self.output_bytes = int(state['output_bytes'])
+        except FileNotFoundError:
+            # Killed before the first save: every result in the output counts
+            self.output_bytes = 0
+        # Results written after the last save
+        if os.path.exists(output_path):
+            with open(output_path, 'r+b') as f:
+                f.seek(self.output_bytes)
+                complete = f.tell()
+                for raw in iter(f.readline, b''):
+                    try:
+                        self.mark(json.loads(raw)['line'] // self.shards)
+                    except (ValueError, KeyError):
+                        break
+                    complete = f.tell()
+                # Drop the torn last line of an interrupted write
+                f.truncate(complete)
+        return self
+
+    def is_done(self, position: int) -> bool:
+        return position < self.next_line or position in self.done
+
+    def mark(self, position: int) -> None:
+        self.done.add(position)
+        while self.next_line in self.done:
+            self.done.discard(self.next_line)
+            self.next_line += 1
+
+    def save(self, output_bytes: int) -> None:
+        self.output_bytes = output_bytes
+        temporary = self.path + '.tmp'
+        with open(temporary, 'w') as f:
+            json.dump({"next_line": self.next_line, "done": sorted(self.done), "output_bytes": output_bytes}, f)
+        os.replace(temporary, self.path)
+
+
+class BulkRunner:
+    """
+    Process a JSONL file of requests through AdapterInterface without the HTTP server
+
+    Lines are read lazily and processed by `concurrency` workers; results are
+    appended to the output JSONL as they complete ({"line", "id", "result" or
+    "error", "elapsed"}), so they are out of input order. Lines are only
+    dispatched within `window` of the oldest unfinished one, which bounds the
+    checkpoint and memory regardless of the input size. With `shards` > 1 the
+    runner only takes the lines of its shard (line % shards == shard).
+
+    Args:
+        adapter: Initialized adapter the requests go through
+        input_path: JSONL file of requests
+        output_path: JSONL file results are appended to
+        checkpoint_path: Progress file, resumed when it exists
+        concurrency: Requests processed at once
+        window: Lines dispatched ahead of the oldest unfinished line
+        checkpoint_every: Completed lines between checkpoint saves
+    """
+
+    def __init__(
+        self,
+        adapter: AdapterInterface,
+        input_path: str,
+        output_path: str,
+        checkpoint_path: Optional[str] = None,
+        concurrency: int = 8,
+        window: Optional[int] = None,
+        checkpoint_every: int = 100,
+        shard: int = 0,
+        shards: int = 1
+    ):
+        self.adapter = adapter
+        self.input_path = input_path
+        self.output_path = output_path
+        self.checkpoint = Checkpoint(checkpoint_path or output_path + '.checkpoint.json', shards)
+        self.concurrency = concurrency
+        self.window = window or concurrency * 64
+        self.checkpoint_every = checkpoint_every
+        self.shard = shard
+        self.shards = shards
+        self.counters = {"processed": 0, "errors": 0, "skipped": 0}
+
+    def _lines(self) -> Iterator[Tuple[int, str]]:
+        """Unfinished lines of the shard with their line number"""
+        with open(self.input_path, 'r') as f:
+            for number, line in enumerate(f):
+                if number % self.shards != self.shard:
+                    continue
+                position = number // self.shards
+                if self.checkpoint.is_done(position):
+                    self.counters["skipped"] += 1
+                elif not line.strip():
+                    self.checkpoint.mark(position)
+                else:
+                    yield number, line
+
+    async def _process(self, number: int, line: str) -> Dict[str, Any]:
+        started = time.perf_counter()
+        record: Dict[str, Any] = {"line": number}
+        try:
+            record["id"], request = parse_request(line)
+            record["result"] = await self.adapter.process_request(request)
+        except Exception as e:
+            record["error"] = str(e)
+        record["elapsed"] = round(time.perf_counter() - started, 4)
+        return record
+
+    @staticmethod
+    def _encode(record: Dict[str, Any]) -> bytes:
+        """Output line of a record, an error record when the result cannot be encoded"""
+        try:
+            return dumps_json(record) + b'\n'
+        except Exception as e:
+            record.pop("result", None)
+            record["error"] = f"Unencodable result: {e}"
+            return dumps_json({"line": record["line"], "error": record["error"], "elapsed": record["elapsed"]}) + b'\n'
+
+    async def run(self) -> Dict[str, int]:
+        self.checkpoint.load(self.output_path)
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency * 2)
+        progress = asyncio.Condition()
+        started = time.perf_counter()
+        since_save = 0
+
+        with open(self.output_path, 'ab') as output:
+            output.seek(0, os.SEEK_END)
+
+            async def worker() -> None:
+                nonlocal since_save
+                while True:
+                    item = await queue.get()
+                    if item is None:
+                        return
+                    record = await self._process(*item)
+                    output.write(self._encode(record))
+                    self.counters["processed"] += 1
+                    self.counters["errors"] += 'error' in record
+                    async with progress:
+                        self.checkpoint.mark(record["line"] // self.shards)
+                        progress.notify_all()
+                    since_save += 1
+                    if since_save >= self.checkpoint_every:
+                        since_save = 0
+                        output.flush()
+                        self.checkpoint.save(output.tell())
+                        self._report(started)
+
+            async def feed() -> None:
+                for number, line in self._lines():
+                    # Stay within the window of the oldest unfinished line
+                    async with progress:
+                        await progress.wait_for(lambda: number // self.shards < self.checkpoint.next_line + self.window)
+                    await queue.put((number, line))
+                for _ in range(self.concurrency):
+                    await queue.put(None)
+
+            tasks = [asyncio.create_task(worker()) for _ in range(self.concurrency)]
+            tasks.append(asyncio.create_task(feed()))
+            try:
+                # A failed worker (e.g. an output write error) fails the run
+                # instead of leaving the feeder waiting on its line forever
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+                for task in done:
+                    if task.exception() is not None:
+                        raise task.exception()
+            finally:
+                for task in tasks:
+                    task.cancel()
+                output.flush()
+                self.checkpoint.save(output.tell())
+        self._report(started)
+        return dict(self.counters)
+
+    def _report(self, started: float) -> None:
+        elapsed = time.perf_counter() - started
+        rate = self.counters["processed"] / elapsed if elapsed > 0 else 0.0
+        print(
+            f"[shard {self.shard}/{self.shards}] processed {self.counters['processed']} "
+            f"(errors {self.counters['errors']}, skipped {self.counters['skipped']}), "
+            f"{rate:.1f} req/s, checkpoint at line {self.checkpoint.next_line * self.shards + self.shard}"
+        )
+
+
+async def run_bulk(args: argparse.Namespace, shard: int = 0, shards: int = 1) -> Dict[str, int]:
+    output_path = args.output if shards == 1 else f"{args.output}.{shard}"
+    checkpoint_path = args.checkpoint if shards == 1 or not args.checkpoint else f"{args.checkpoint}.{shard}"
+    adapter = await AdapterInterface().initialize()
+    try:
+        runner = BulkRunner(
+            adapter,
+            args.input,
+            output_path,
+            checkpoint_path=checkpoint_path,
+            concurrency=args.concurrency,
+            window=args.window,
+            checkpoint_every=args.checkpoint_every,
+            shard=shard,
+            shards=shards
+        )
+        return await runner.run()
+    finally:
+        await adapter.close()
+
+
+def _run_shard(args: argparse.Namespace, shard: int, shards: int) -> Dict[str, int]:
+    return asyncio.run(run_bulk(args, shard, shards))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Process a JSONL file of adapter requests without the HTTP server")
+    parser.add_argument('input', help="JSONL requests: network, output_type_id, prompt (+ optional id, name, description, variables, category_id)")
+    parser.add_argument('output', help="JSONL results, appended as requests complete")
+    parser.add_argument('--checkpoint', default=None, help="Progress file (default <output>.checkpoint.json)")
+    parser.add_argument('--concurrency', type=int, default=int(os.getenv('BULK_CONCURRENCY', '8')), help="Requests in flight per process")
+    parser.add_argument('--processes', type=int, default=1, help="Worker processes, each with its own adapter; outputs go to <output>.<n>")
+    parser.add_argument('--window', type=int, default=None, help="Lines dispatched ahead of the oldest unfinished one")
+    parser.add_argument('--checkpoint-every', type=int, default=100)
+    args = parser.parse_args()
+
+    if args.processes <= 1:
+        asyncio.run(run_bulk(args))
+        return
+
+    with ProcessPoolExecutor(max_workers=args.processes) as executor:
+        futures = [executor.submit(_run_shard, args, shard, args.processes) for shard in range(args.processes)]
+        totals: Dict[str, int] = {}
+        for future in futures:
+            for key, value in future.result().items():
+                totals[key] = totals.get(key, 0) + value
+    print(json.dumps(totals))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+import asyncio
+import re
+import time
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Tuple
+
+_WORD = re.compile(r"[a-z0-9]+")
+_ADDRESS = re.compile(r"0x[0-9a-fA-F]{40}")
+
+# Words naming a network, ignored when matching a prompt to a template
+_NETWORK_WORDS = frozenset({'on', 'in', 'base', 'arbitrum', 'rivalz', 'network', 'chain'})
+
+# Words that do not change what a prompt asks, ignored by the word-set match
+_FILLER_WORDS = frozenset({'which', 'what', 'the', 'a', 'is', 'has', 'currently', 'now', 'please'})
+
+_SWAP_WORDS = frozenset({'swap', 'swapping', 'route', 'path', 'exchange', 'convert'})
+
+# Set while answers are being materialized, so the refreshes they trigger do
+# not schedule another materialization
+_materializing: ContextVar[bool] = ContextVar('_materializing', default=False)
+
+
+class CanonicalQuestion(NamedTuple):
+    """A frequent oracle question whose answer only depends on the pool snapshot"""
+    key: str
+    template: str  # formatted with {network}
+
+
+CANONICAL_QUESTIONS = [
+    CanonicalQuestion(key='highest_tvl_apr', template="Which pool has the highest TVL and APR on {network}?"),
+    CanonicalQuestion(key='highest_volume_24h', template="Which pool has the highest 24h volume on {network}?"),
+    CanonicalQuestion(key='most_liquid_stablecoin', template="Which stablecoin pool has the most liquidity on {network}?"),
+]
+
+
+def is_materializing() -> bool:
+    """True inside a materialization (snapshots must stay pinned)"""
+    return _materializing.get()
+
+
+def _words(prompt: str) -> List[str]:
+    return _WORD.findall(prompt.lower())
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Lowercase words of a prompt without punctuation and network names"""
+    return ' '.join(word for word in _words(prompt) if word not in _NETWORK_WORDS)
+
+
+def fast_intent(prompt: str) -> Optional[str]:
+    """
+    Keyword intent classification for unambiguous prompts
+
+    Returns:
+        'swap_path', 'pool_info' or None when the LLM should decide
+    """
+    words = set(_words(prompt))
+    if len(_ADDRESS.findall(prompt)) >= 2 and words & _SWAP_WORDS:
+        return 'swap_path'
+    if match_canonical(prompt):
+        return 'pool_info'
+    return None
+
+
+_EXACT = {normalize_prompt(question.template.format(network='')): question.key for question in CANONICAL_QUESTIONS}
+
+
+def _content_words(normalized: str) -> FrozenSet[str]:
+    return frozenset(word for word in normalized.split() if word not in _FILLER_WORDS)
+
+
+_CONTENT_WORDS = {_content_words(normalized): key for normalized, key in _EXACT.items()}
+
+
+def match_canonical(prompt: str) -> Optional[str]:
+    """
+    Key of the canonical question a prompt asks, None if it is not one
+
+    A prompt matches when it is a template up to case, punctuation and network
+    name, or when it has exactly the template's content words (word order and
+    filler words aside). Any other word (a token, a filter, a second criterion)
+    can change the answer, so such prompts go through the pipeline.
+    """
+    normalized = normalize_prompt(prompt)
+    key = _EXACT.get(normalized)
+    if key:
+        return key
+    if _ADDRESS.search(prompt):
+        return None
+    return _CONTENT_WORDS.get(_content_words(normalized))
+
+
+class MaterializedAnswers:
+    """
+    Answers of the canonical questions per network and output type
+
+    Recomputed in the background after every snapshot refresh and served
+    only while the snapshot they were computed from is still the latest one.
+
+    The handler stage runs once per question; only the format stage runs per
+    output type.
+
+    Args:
+        respond: Raw handler response of a question, respond(question, network)
+        format: Formatted answer of a raw response, format(raw_response, output_type, question)
+        current_version: Version of the latest snapshot of a network (None if none)
+        output_types: Output types to materialize for each question
+    """
+
+    def __init__(
+        self,
+        respond: Callable[[str, str], Awaitable[Any]],
+        format: Callable[[Any, Any, str], Awaitable[Any]],
+        current_version: Callable[[str], Optional[int]],
+        output_types: Iterable[Any],
+        questions: List[CanonicalQuestion] = CANONICAL_QUESTIONS
+    ):
+        self.respond = respond
+        self.format = format
+        self.current_version = current_version
+        self.output_types = list(output_types)
+        self.questions = {question.key: question for question in questions}
+        self._answers: Dict[Tuple[str, str, Any], Tuple[int, Any]] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+        self.last_build_seconds: Dict[str, float] = {}
+
+    def lookup(self, prompt: str, network: str, output_type: Any) -> Optional[Any]:
+        """Materialized answer to a prompt, None when it is not canonical or is stale"""
+        if _materializing.get():
+            return None
+        key = match_canonical(prompt)
+        if key is None:
+            return None
+        entry = self._answers.get((key, network, output_type))
+        if entry is None or entry[0] != self.current_version(network):
+            self.misses += 1
+            return None
+        self.hits += 1
+        # Callers may rewrite the value (e.g. bytes to hex), hand out a copy
+        return dict(entry[1]) if isinstance(entry[1], dict) else entry[1]
+
+    def schedule(self, network: str, version: int) -> None:
+        """Start rebuilding the answers of a network, replacing a running rebuild"""
+        if _materializing.get():
+            return
+        running = self._tasks.get(network)
+        if running and not running.done():
+            running.cancel()
+        self._tasks[network] = asyncio.create_task(self.materialize(network, version))
+
+    async def materialize(self, network: str, version: int) -> int:
+        """
+        Compute every canonical answer of a network for a snapshot version
+
+        Returns:
+            Number of answers stored
+        """
+        token = _materializing.set(True)
+        started = time.perf_counter()
+        stored = 0
+        try:
+            for question in self.questions.values():
+                if self.current_version(network) != version:
+                    return stored  # a newer snapshot arrived, its rebuild takes over
+                prompt = question.template.format(network=network)
+                try:
+                    raw_response = await self.respond(prompt, network)
+                except Exception as e:
+                    print(f"Error materializing '{question.key}' on {network}: {e}")
+                    continue
+                results = await asyncio.gather(
+                    *(self.format(raw_response, output_type, prompt) for output_type in self.output_types),
+                    return_exceptions=True
+                )
+                for output_type, result in zip(self.output_types, results):
+                    if isinstance(result, Exception):
+                        print(f"Error materializing '{question.key}' on {network}: {result}")
+                    # Only keep formatted answers, not error fallbacks
+                    elif isinstance(result, dict) and result.get('value') is not None:
+                        self._answers[(question.key, network, output_type)] = (version, result)
+                        stored += 1
+            self.last_build_seconds[network] = time.perf_counter() - started
+            return stored
+        finally:
+            _materializing.reset(token)
+
+    async def close(self) -> None:
+        for task in self._tasks.values():
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "answers": len(self._answers),
+            "hits": self.hits,
+            "misses": self.misses,
+            "last_build_seconds": dict(self.last_build_seconds),
+        }
@@ -0,0 +1,104 @@
+import asyncio
+import functools
+import os
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+# Bounded executor for the remaining synchronous calls (ChromaDB, web3 HTTP provider, ...)
+BLOCKING_EXECUTOR = ThreadPoolExecutor(
+    max_workers=int(os.getenv('BLOCKING_EXECUTOR_WORKERS', '8')),
+    thread_name_prefix='blocking'
+)
+
+
+async def run_blocking(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run a synchronous call on the bounded executor without blocking the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(BLOCKING_EXECUTOR, functools.partial(func, *args, **kwargs))
+
+
+class EventLoopLagMonitor:
+    """
+    Detect event loop stalls and report the stack that caused them
+
+    A heartbeat task stamps the time every `interval` seconds. A watchdog thread
+    checks the stamp, and when the loop has not come back for longer than
+    `threshold` it grabs the loop thread's current stack, i.e. the code that is
+    blocking the loop right now.
+    """
+
+    def __init__(self, threshold: float = 0.1, interval: float = 0.05, report: Optional[Callable[[float, str], None]] = None):
+        self.threshold = threshold
+        self.interval = interval
+        self.report = report or self._print_report
+        self.stalls = 0
+        self.max_lag = 0.0
+        self.last_stall: Optional[Dict[str, Any]] = None
+        self._beat = time.perf_counter()
+        self._beat_reported = False
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stop = threading.Event()
+        self._watchdog: Optional[threading.Thread] = None
+
+    @staticmethod
+    def _print_report(lag: float, stack: str) -> None:
+        print(f"Event loop blocked for {lag * 1000:.0f} ms at:\n{stack}")
+
+    def start(self) -> None:
+        """Start monitoring the running event loop"""
+        if self._task:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._beat = time.perf_counter()
+        self._stop.clear()
+        self._task = asyncio.get_running_loop().create_task(self._heartbeat())
+        self._watchdog = threading.Thread(target=self._watch, name='loop-lag-watchdog', daemon=True)
+        self._watchdog.start()
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _heartbeat(self) -> None:
+        while True:
+            self._beat = time.perf_counter()
+            self._beat_reported = False
+            await asyncio.sleep(self.interval)
+            lag = time.perf_counter() - self._beat - self.interval
+            self.max_lag = max(self.max_lag, lag)
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.threshold / 2):
+            lag = time.perf_counter() - self._beat - self.interval
+            if lag <= self.threshold or self._beat_reported:
+                continue
+
+            # Report each stall once, with the stack of the loop thread right now
+            self._beat_reported = True
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame else "<unavailable>"
+            self.stalls += 1
+            self.last_stall = {"lag": lag, "stack": stack, "time": time.time()}
+            try:
+                self.report(lag, stack)
+            except Exception as e:
+                print(f"Error reporting event loop stall: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "threshold_ms": self.threshold * 1000,
+            "stalls": self.stalls,
+            "max_lag_ms": self.max_lag * 1000,
+            "last_stall": self.last_stall,
+        }
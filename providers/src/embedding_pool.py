@@ -0,0 +1,122 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from typing import List, Optional
+
+import numpy as np
+
+# all-MiniLM-L6-v2 (chromadb DefaultEmbeddingFunction) output dimension
+DEFAULT_EMBEDDING_DIM = 384
+
+# Embedding function loaded once per worker process
+_worker_embedder = None
+
+
+def _init_worker() -> None:
+    """Load the ONNX model once when the worker process starts"""
+    global _worker_embedder
+    from chromadb.utils import embedding_functions
+
+    _worker_embedder = embedding_functions.DefaultEmbeddingFunction()
+    _worker_embedder(["warmup"])
+
+
+def _warmup() -> int:
+    return os.getpid()
+
+
+def _embed_into_shared(shm_name: str, shape: tuple, offset: int, documents: List[str]) -> int:
+    """Embed a batch and write the vectors into rows [offset, offset + len) of the shared buffer"""
+    shm = SharedMemory(name=shm_name)
+    try:
+        out = np.ndarray(shape, dtype=np.float32, buffer=shm.buf)
+        vectors = np.asarray(_worker_embedder(documents), dtype=np.float32)
+        if vectors.shape != (len(documents), shape[1]):
+            raise ValueError(f"Unexpected embedding shape {vectors.shape}, expected {(len(documents), shape[1])}")
+        out[offset:offset + len(documents)] = vectors
+        del out
+        return len(documents)
+    finally:
+        shm.close()
+
+
+class EmbeddingProcessPool:
+    """
+    Compute embeddings in worker processes so the API process keeps the GIL
+
+    Documents are split into batches, each worker writes its vectors straight
+    into one shared memory block, and only the batch bounds travel over IPC.
+    """
+
+    def __init__(self, workers: int, batch_size: int = 256, dim: int = DEFAULT_EMBEDDING_DIM):
+        if workers < 1:
+            raise ValueError(f"Embedding pool needs at least one worker, got {workers}")
+        self.workers = workers
+        self.batch_size = batch_size
+        self.dim = dim
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    @classmethod
+    def from_env(cls) -> Optional['EmbeddingProcessPool']:
+        """
+        Build the pool from EMBEDDING_WORKERS / EMBEDDING_BATCH_SIZE / EMBEDDING_DIM
+
+        Opt-in: every worker loads its own copy of the ONNX model, and every
+        agent (server, ADCS listener, bulk runner processes) would start its
+        own pool. Returns None when EMBEDDING_WORKERS is unset or 0 (embed
+        in-process).
+        """
+        workers = int(os.getenv('EMBEDDING_WORKERS', '0'))
+        if workers == 0:
+            return None
+        return cls(
+            workers=workers,
+            batch_size=int(os.getenv('EMBEDDING_BATCH_SIZE', '256')),
+            dim=int(os.getenv('EMBEDDING_DIM', str(DEFAULT_EMBEDDING_DIM)))
+        )
+
+    async def start(self) -> None:
+        """Spawn the workers and wait until every one of them has loaded the model"""
+        if self._executor:
+            return
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker
+        )
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self._executor, _warmup) for _ in range(self.workers)))
+
+    async def embed(self, documents: List[str]) -> np.ndarray:
+        """
+        Embed documents across the worker pool
+
+        Returns:
+            float32 array of shape (len(documents), dim)
+        """
+        if not documents:
+            return np.empty((0, self.dim), dtype=np.float32)
+        await self.start()
+
+        shape = (len(documents), self.dim)
+        shm = SharedMemory(create=True, size=shape[0] * shape[1] * np.dtype(np.float32).itemsize)
+        try:
+            loop = asyncio.get_running_loop()
+            await asyncio.gather(*(
+                loop.run_in_executor(
+                    self._executor, _embed_into_shared,
+                    shm.name, shape, offset, documents[offset:offset + self.batch_size]
+                )
+                for offset in range(0, len(documents), self.batch_size)
+            ))
+            return np.ndarray(shape, dtype=np.float32, buffer=shm.buf).copy()
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def shutdown(self) -> None:
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
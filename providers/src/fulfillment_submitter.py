@@ -0,0 +1,430 @@
+import asyncio
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from adapter_interface import AdapterRequest
+from adcs_abi import COORDINATOR_ABI
+from adcs_listener import DataRequest
+from concurrency import run_blocking
+from eth_account import Account
+from result_store import ResultStore
+from uniswap_provider import OutputType
+from web3 import Web3
+from web3.exceptions import TransactionNotFound
+
+GWEI = 10 ** 9
+
+# Gas the coordinator spends around the consumer callback (commitment checks,
+# storage cleanup, events), on top of the request's callbackGasLimit
+COORDINATOR_GAS_OVERHEAD = 100_000
+
+# Fulfill function of the coordinator for every output type
+FULFILL_FUNCTIONS = {
+    OutputType.BOOL: "fulfillDataRequestBool",
+    OutputType.BYTES: "fulfillDataRequestBytes",
+    OutputType.UINT256: "fulfillDataRequestUint256",
+    OutputType.STRING_AND_BOOL: "fulfillDataRequestStringAndBool",
+}
+
+
+def _to_bytes(value: Any) -> bytes:
+    if isinstance(value, (bytes, bytearray)):
+        return bytes(value)
+    if isinstance(value, str):
+        if value.startswith('0x'):
+            return bytes.fromhex(value[2:])
+        return value.encode('utf-8')
+    if value is None:
+        return b''
+    return json.dumps(value).encode('utf-8')
+
+
+def encode_fulfillment(output_type: OutputType, result: Any) -> Tuple[str, Any, int]:
+    """
+    Map a provider result to the coordinator fulfill call
+
+    Accepts both the formatted {"explanation", "value"} dict and the bare
+    fallback values returned by handle_request on errors.
+
+    Returns:
+        (function name, response argument, payload size in bytes)
+    """
+    value = result['value'] if isinstance(result, dict) and 'value' in result else result
+
+    if output_type == OutputType.BOOL:
+        response = bool(value)
+        return FULFILL_FUNCTIONS[output_type], response, 32
+    if output_type == OutputType.UINT256:
+        response = int(value or 0)
+        return FULFILL_FUNCTIONS[output_type], response, 32
+    if output_type == OutputType.BYTES:
+        response = _to_bytes(value)
+        return FULFILL_FUNCTIONS[output_type], response, len(response)
+    if output_type == OutputType.STRING_AND_BOOL:
+        if isinstance(value, dict):
+            name, decision = str(value.get('explanation', '')), bool(value.get('decision', False))
+        else:
+            name, decision = str(value[0]), bool(value[1])
+        return FULFILL_FUNCTIONS[output_type], (name, decision), len(name.encode('utf-8'))
+    raise ValueError(f"Unsupported output type: {output_type}")
+
+
+class PendingTransaction:
+    """
+    A sent fulfillment waiting to be mined, with every hash sent for its nonce
+
+    Once the fulfillment is given up, its nonce is freed with a cancellation
+    transaction: the hashes from index `cancelled_at` on are cancellations.
+    """
+
+    __slots__ = ('request_id', 'nonce', 'transaction', 'tx_hashes', 'sent_at', 'bumps', 'future', 'cancelled_at')
+
+    def __init__(self, request_id: int, nonce: int, transaction: Dict[str, Any], tx_hash: str, future: asyncio.Future):
+        self.request_id = request_id
+        self.nonce = nonce
+        self.transaction = transaction
+        self.tx_hashes = [tx_hash]
+        self.sent_at = time.monotonic()
+        self.bumps = 0
+        self.future = future
+        self.cancelled_at: Optional[int] = None
+
+
+class FulfillmentSubmitter:
+    """
+    Submit fulfillment transactions to ADCSCoordinator without waiting for receipts
+
+    Nonces are handed out from a local counter (synced from the node at start and
+    after a "nonce too low" error), so fulfillments are signed and sent back to
+    back instead of one per block. Gas estimates are cached per fulfill function,
+    payload size bucket and callback gas limit, and the gas limit never goes
+    below what the callback is owed: the coordinator deletes the commitment
+    even when the callback runs out of gas, whose cost depends on on-chain
+    state and differs between requests. A background task checks the
+    account's mined nonce and collects receipts; transactions still pending after
+    `replace_after` seconds are re-sent with the same nonce and bumped fees.
+    When `max_bumps` or the fee cap is reached the fulfillment fails and its
+    nonce is freed by a zero-value transfer to self (21000 gas, not bound by
+    the fee cap), so later fulfillments are not stuck behind it.
+
+    Example against a local anvil node (first default account):
+        ADCS_ORACLE_PRIVATE_KEY=0xac0974bec39a17e36ba4a6b4d238ff944bacb478cbed5efcae784d7bf4f2ff80
+    """
+
+    def __init__(
+        self,
+        rpc_url: str,
+        coordinator_address: str,
+        private_key: str,
+        gas_margin: float = 1.2,
+        gas_bucket: int = 256,
+        gas_overhead: int = COORDINATOR_GAS_OVERHEAD,
+        fee_bump: float = 1.125,
+        replace_after: float = 30.0,
+        max_bumps: int = 5,
+        max_fee_cap: Optional[int] = None,
+        poll_interval: float = 1.0,
+        fee_refresh: float = 10.0,
+        result_store: Optional[ResultStore] = None
+    ):
+        self.web3 = Web3(Web3.HTTPProvider(rpc_url))
+        self.contract = self.web3.eth.contract(address=Web3.to_checksum_address(coordinator_address), abi=COORDINATOR_ABI)
+        self.account = Account.from_key(private_key)
+        self.address = self.account.address
+        self.gas_margin = gas_margin
+        self.gas_bucket = gas_bucket
+        self.gas_overhead = gas_overhead
+        # Nodes reject replacements that raise fees by less than 10%
+        self.fee_bump = max(fee_bump, 1.1)
+        self.replace_after = replace_after
+        self.max_bumps = max_bumps
+        self.max_fee_cap = max_fee_cap
+        self.poll_interval = poll_interval
+        self.fee_refresh = fee_refresh
+        self.result_store = result_store
+
+        self.chain_id: Optional[int] = None
+        self._next_nonce: Optional[int] = None
+        self._send_lock = asyncio.Lock()
+        self._gas_cache: Dict[Tuple[str, int, int], int] = {}
+        self._fees: Optional[Dict[str, int]] = None
+        self._fees_at = 0.0
+        self._pending: Dict[int, PendingTransaction] = {}
+        self._tracker: Optional[asyncio.Task] = None
+        self.counters = {
+            "submitted": 0, "confirmed": 0, "reverted": 0, "replaced": 0,
+            "dropped": 0, "cancelled": 0, "gas_cache_hits": 0, "gas_cache_misses": 0,
+        }
+
+    @classmethod
+    def from_env(cls, **kwargs) -> 'FulfillmentSubmitter':
+        """Build the submitter from ADCS_* environment variables"""
+        max_fee_gwei = os.getenv('ADCS_MAX_FEE_GWEI')
+        return cls(
+            rpc_url=os.getenv('ADCS_RPC_URL', 'http://127.0.0.1:8545'),
+            coordinator_address=os.environ['ADCS_COORDINATOR_ADDRESS'],
+            private_key=os.environ['ADCS_ORACLE_PRIVATE_KEY'],
+            replace_after=float(os.getenv('ADCS_REPLACE_AFTER', '30')),
+            max_fee_cap=int(float(max_fee_gwei) * GWEI) if max_fee_gwei else None,
+            gas_overhead=int(os.getenv('ADCS_GAS_OVERHEAD', str(COORDINATOR_GAS_OVERHEAD))),
+            **kwargs
+        )
+
+    async def start(self) -> 'FulfillmentSubmitter':
+        self.chain_id = await run_blocking(lambda: self.web3.eth.chain_id)
+        await self._sync_nonce()
+        if self._tracker is None:
+            self._tracker = asyncio.create_task(self._track_receipts())
+        return self
+
+    async def stop(self, timeout: float = 60.0) -> None:
+        """Wait for pending fulfillments (up to timeout), then stop tracking"""
+        futures = [pending.future for pending in self._pending.values()]
+        if futures:
+            await asyncio.wait(futures, timeout=timeout)
+        if self._tracker:
+            self._tracker.cancel()
+            await asyncio.gather(self._tracker, return_exceptions=True)
+            self._tracker = None
+
+    async def _sync_nonce(self) -> None:
+        self._next_nonce = await run_blocking(self.web3.eth.get_transaction_count, self.address, 'pending')
+
+    async def _current_fees(self) -> Dict[str, int]:
+        now = time.monotonic()
+        if self._fees is None or now - self._fees_at > self.fee_refresh:
+            block = await run_blocking(self.web3.eth.get_block, 'latest')
+            base_fee = block.get('baseFeePerGas')
+            if base_fee is None:
+                fees = {"gasPrice": await run_blocking(lambda: self.web3.eth.gas_price)}
+            else:
+                try:
+                    priority_fee = await run_blocking(lambda: self.web3.eth.max_priority_fee)
+                except Exception:
+                    priority_fee = GWEI
+                fees = {"maxFeePerGas": 2 * base_fee + priority_fee, "maxPriorityFeePerGas": priority_fee}
+            if self.max_fee_cap:
+                fees = {key: min(value, self.max_fee_cap) for key, value in fees.items()}
+            self._fees, self._fees_at = fees, now
+        return dict(self._fees)
+
+    async def _estimate_gas(self, function: str, args: List[Any], payload_size: int, callback_gas_limit: int) -> int:
+        # The callback must get its whole callbackGasLimit: 63/64 of the
+        # remaining gas is forwarded to it (EIP-150), plus the coordinator's own
+        floor = callback_gas_limit * 64 // 63 + self.gas_overhead
+        key = (function, -(-payload_size // self.gas_bucket), callback_gas_limit)
+        gas = self._gas_cache.get(key)
+        if gas is not None:
+            self.counters["gas_cache_hits"] += 1
+            return max(gas, floor)
+
+        self.counters["gas_cache_misses"] += 1
+        call = self.contract.functions[function](*args)
+        estimate = await run_blocking(call.estimate_gas, {"from": self.address})
+        gas = int(estimate * self.gas_margin)
+        self._gas_cache[key] = gas
+        return max(gas, floor)
+
+    async def _send(self, transaction: Dict[str, Any]) -> str:
+        signed = self.account.sign_transaction(transaction)
+        raw = getattr(signed, 'raw_transaction', None) or signed.rawTransaction
+        tx_hash = await run_blocking(self.web3.eth.send_raw_transaction, raw)
+        return Web3.to_hex(tx_hash)
+
+    async def submit(self, request: DataRequest, output_type: OutputType, result: Any) -> asyncio.Future:
+        """
+        Sign and send the fulfillment of a request
+
+        Returns:
+            Future resolved with the receipt once mined (exception if reverted
+            or dropped)
+        """
+        return (await self._submit(request, output_type, result)).future
+
+    async def _submit(self, request: DataRequest, output_type: OutputType, result: Any) -> PendingTransaction:
+        if self._next_nonce is None:
+            await self.start()
+
+        function, response, payload_size = encode_fulfillment(output_type, result)
+        commitment = (request.block_number, request.callback_gas_limit, Web3.to_checksum_address(request.sender), request.job_id)
+        args = [request.request_id, response, commitment]
+        gas = await self._estimate_gas(function, args, payload_size, request.callback_gas_limit)
+        fees = await self._current_fees()
+
+        async with self._send_lock:
+            for attempt in range(2):
+                transaction = self.contract.functions[function](*args).build_transaction({
+                    "from": self.address,
+                    "nonce": self._next_nonce,
+                    "gas": gas,
+                    "chainId": self.chain_id,
+                    **fees,
+                })
+                try:
+                    tx_hash = await self._send(transaction)
+                    break
+                except Exception as e:
+                    if attempt == 0 and 'nonce too low' in str(e).lower():
+                        await self._sync_nonce()
+                        continue
+                    raise
+            nonce = self._next_nonce
+            self._next_nonce += 1
+
+        future = asyncio.get_running_loop().create_future()
+        pending = PendingTransaction(request.request_id, nonce, transaction, tx_hash, future)
+        self._pending[nonce] = pending
+        self.counters["submitted"] += 1
+        return pending
+
+    async def on_result(self, request: DataRequest, adapter_request: AdapterRequest, result: Any) -> str:
+        """
+        DataRequestListener callback: submit and report the receipt in the background
+
+        Returns:
+            Hash of the sent transaction
+        """
+        pending = await self._submit(request, OutputType(adapter_request.output_type_id), result)
+        pending.future.add_done_callback(lambda done: self._report(request, done))
+        return pending.tx_hashes[0]
+
+    def _report(self, request: DataRequest, future: asyncio.Future) -> None:
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error:
+            print(f"Fulfillment of ADCS request {request.request_id} failed: {error}")
+            if self.result_store:
+                self.result_store.mark_failed(request.request_id, str(error))
+        else:
+            receipt = future.result()
+            print(f"Fulfilled ADCS request {request.request_id} in block {receipt['blockNumber']}")
+            if self.result_store:
+                self.result_store.mark_confirmed(request.request_id, Web3.to_hex(receipt['transactionHash']))
+
+    def _bumped_fees(self, transaction: Dict[str, Any], current: Dict[str, int]) -> Dict[str, int]:
+        fees = {}
+        for key, value in current.items():
+            bumped = int(transaction.get(key, 0) * self.fee_bump) + 1
+            fees[key] = max(bumped, value)
+        if "maxFeePerGas" in fees:
+            fees["maxFeePerGas"] = max(fees["maxFeePerGas"], fees["maxPriorityFeePerGas"])
+        return fees
+
+    async def _replace(self, pending: PendingTransaction, transaction: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Re-send the pending transaction (or `transaction`) at its nonce with bumped fees
+
+        Returns:
+            False when the fulfillment cannot be bumped without exceeding the fee cap
+        """
+        fees = self._bumped_fees(pending.transaction, await self._current_fees())
+        cancelling = pending.cancelled_at is not None or transaction is not None
+        if not cancelling and self.max_fee_cap and max(fees.values()) > self.max_fee_cap:
+            return False
+        transaction = {**(transaction or pending.transaction), **fees}
+        try:
+            tx_hash = await self._send(transaction)
+        except Exception as e:
+            # Typically "nonce too low": an earlier hash was mined meanwhile
+            print(f"Error replacing transaction of ADCS request {pending.request_id} at nonce {pending.nonce}: {e}")
+            return True
+        pending.transaction = transaction
+        pending.tx_hashes.append(tx_hash)
+        if not cancelling and self.result_store:
+            self.result_store.record_tx_hash(pending.request_id, tx_hash)
+        pending.sent_at = time.monotonic()
+        pending.bumps += 1
+        self.counters["replaced"] += 1
+        return True
+
+    async def _cancel(self, pending: PendingTransaction) -> None:
+        """Fail a fulfillment that cannot be replaced any more and free its nonce"""
+        if not pending.future.done():
+            pending.future.set_exception(RuntimeError(
+                f"Fulfillment stuck at nonce {pending.nonce} after {pending.bumps} fee bumps, nonce cancelled"
+            ))
+        cancellation = {
+            "from": self.address,
+            "to": self.address,
+            "value": 0,
+            "nonce": pending.nonce,
+            "gas": 21000,
+            "chainId": self.chain_id,
+        }
+        sent = len(pending.tx_hashes)
+        await self._replace(pending, cancellation)
+        if len(pending.tx_hashes) > sent:
+            pending.cancelled_at = sent
+            pending.bumps = 0
+
+    async def _find_receipt(self, pending: PendingTransaction) -> Optional[Dict[str, Any]]:
+        for tx_hash in reversed(pending.tx_hashes):
+            try:
+                return await run_blocking(self.web3.eth.get_transaction_receipt, tx_hash)
+            except TransactionNotFound:
+                continue
+        return None
+
+    async def check_pending(self) -> None:
+        """One tracker pass: resolve mined nonces and replace stuck ones"""
+        if not self._pending:
+            return
+        mined_nonce = await run_blocking(self.web3.eth.get_transaction_count, self.address, 'latest')
+        now = time.monotonic()
+        for nonce in sorted(self._pending):
+            pending = self._pending[nonce]
+            if nonce < mined_nonce:
+                receipt = await self._find_receipt(pending)
+                del self._pending[nonce]
+                if pending.future.done():
+                    self._settle_cancelled(pending, receipt)
+                elif receipt is None:
+                    self.counters["dropped"] += 1
+                    pending.future.set_exception(RuntimeError(f"Nonce {nonce} was used by a transaction not sent for this request"))
+                elif receipt['status'] != 1:
+                    self.counters["reverted"] += 1
+                    pending.future.set_exception(RuntimeError(f"Transaction {Web3.to_hex(receipt['transactionHash'])} reverted"))
+                else:
+                    self.counters["confirmed"] += 1
+                    pending.future.set_result(receipt)
+            elif now - pending.sent_at <= self.replace_after:
+                continue
+            elif pending.future.done():
+                # Cancellation still pending
+                if pending.cancelled_at is None:
+                    await self._cancel(pending)
+                elif pending.bumps < self.max_bumps:
+                    await self._replace(pending)
+            elif pending.bumps >= self.max_bumps or not await self._replace(pending):
+                await self._cancel(pending)
+
+    def _settle_cancelled(self, pending: PendingTransaction, receipt: Optional[Dict[str, Any]]) -> None:
+        """Account for the mined nonce of a fulfillment that was given up"""
+        fulfillment_hashes = pending.tx_hashes[:pending.cancelled_at]
+        if receipt is not None and receipt['status'] == 1 and Web3.to_hex(receipt['transactionHash']) in fulfillment_hashes:
+            # The fulfillment was mined before the cancellation
+            self.counters["confirmed"] += 1
+            print(f"Fulfilled ADCS request {pending.request_id} in block {receipt['blockNumber']} after it was given up")
+            if self.result_store:
+                self.result_store.mark_confirmed(pending.request_id, Web3.to_hex(receipt['transactionHash']))
+        else:
+            self.counters["cancelled"] += 1
+
+    async def _track_receipts(self) -> None:
+        while True:
+            try:
+                await self.check_pending()
+            except Exception as e:
+                print(f"Error tracking fulfillment receipts: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.counters,
+            "pending": len(self._pending),
+            "next_nonce": self._next_nonce,
+            "gas_cache_size": len(self._gas_cache),
+        }
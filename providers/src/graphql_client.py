@@ -0,0 +1,329 @@
+import json
+import os
+import time
+import zlib
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+
+try:
+    import brotli
+except ImportError:  # optional, only gzip is accepted without it
+    brotli = None
+
+try:
+    import ijson
+except ImportError:  # optional, pages are parsed once fully received without it
+    ijson = None
+
+UNISWAP_GRAPHQL_URL = "https://interface.gateway.uniswap.org/v1/graphql"
+
+UNISWAP_GRAPHQL_HEADERS = {
+    "accept": "*/*",
+    "accept-language": "en-US,en;q=0.9,vi;q=0.8",
+    "content-type": "application/json",
+    "origin": "https://app.uniswap.org",
+    "referer": "https://app.uniswap.org/",
+    "user-agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36",
+}
+
+ACCEPT_ENCODING = "gzip, br" if brotli is not None else "gzip"
+
+# Pool fields selected by each query variant
+POOL_FIELDS = {
+    # Everything the gateway offers, the former TOP_V3_POOLS_QUERY
+    'full': """
+                id
+                protocolVersion
+                address
+                totalLiquidity { value }
+                feeTier
+                token0 { id symbol name address chain __typename }
+                token1 { id symbol name address chain __typename }
+                txCount
+                volume24h: cumulativeVolume(duration: DAY) { value }
+                volume30d: cumulativeVolume(duration: MONTH) { value }""",
+    # What PoolSnapshot.from_graphql reads
+    'snapshot': """
+                address
+                totalLiquidity { value }
+                feeTier
+                token0 { symbol address }
+                token1 { symbol address }
+                txCount
+                volume24h: cumulativeVolume(duration: DAY) { value }
+                volume30d: cumulativeVolume(duration: MONTH) { value }""",
+    # Pool graph and TVL only, without the volume aggregates
+    'tvl': """
+                address
+                totalLiquidity { value }
+                feeTier
+                token0 { symbol address }
+                token1 { symbol address }""",
+}
+
+
+def top_v3_pools_query(fields: str) -> str:
+    return f"""
+        query TopV3Pools($chain: Chain!, $first: Int!, $cursor: Float, $tokenAddress: String) {{
+            topV3Pools(first: $first, chain: $chain, tokenFilter: $tokenAddress, tvlCursor: $cursor) {{{fields}
+            }}
+        }}
+    """
+
+
+QUERY_VARIANTS = {variant: top_v3_pools_query(fields) for variant, fields in POOL_FIELDS.items()}
+
+
+class PageDecoder:
+    """
+    Decompress and parse a TopV3Pools response body chunk by chunk
+
+    With ijson installed pools are decoded while the page is still arriving
+    and the body is never held in memory as a whole; otherwise the decoded
+    body is parsed once complete.
+    """
+
+    _POOL_PREFIX = 'data.topV3Pools.item'
+
+    def __init__(self, content_encoding: Optional[str]):
+        encoding = (content_encoding or 'identity').strip().lower()
+        if encoding == 'gzip':
+            self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            self._decompress = self._decompressor.decompress
+        elif encoding == 'deflate':
+            self._decompressor = zlib.decompressobj()
+            self._decompress = self._decompressor.decompress
+        elif encoding == 'br' and brotli is not None:
+            self._decompress = brotli.Decompressor().process
+        elif encoding == 'identity':
+            self._decompress = None
+        else:
+            raise ValueError(f"Unsupported content encoding: {content_encoding}")
+
+        self.wire_bytes = 0
+        self.decoded_bytes = 0
+        self.parse_seconds = 0.0
+        self.pools: List[Dict[str, Any]] = []
+        self.errors: List[str] = []
+        self._chunks: List[bytes] = []
+        self._builder = None
+        if ijson is not None:
+            self._events = ijson.sendable_list()
+            self._parser = ijson.parse_coro(self._events, use_float=True)
+
+    def feed(self, chunk: bytes) -> None:
+        started = time.perf_counter()
+        self.wire_bytes += len(chunk)
+        if self._decompress is not None:
+            chunk = self._decompress(chunk)
+        self.decoded_bytes += len(chunk)
+        if ijson is None:
+            self._chunks.append(chunk)
+        elif chunk:
+            self._parser.send(chunk)
+            self._consume_events()
+        self.parse_seconds += time.perf_counter() - started
+
+    def _consume_events(self) -> None:
+        for prefix, event, value in self._events:
+            if self._builder is not None:
+                self._builder.event(event, value)
+                if prefix == self._POOL_PREFIX and event == 'end_map':
+                    self.pools.append(self._builder.value)
+                    self._builder = None
+            elif prefix == self._POOL_PREFIX and event == 'start_map':
+                self._builder = ijson.ObjectBuilder()
+                self._builder.event(event, value)
+            elif prefix == 'errors.item.message':
+                self.errors.append(value)
+        del self._events[:]
+
+    def close(self) -> List[Dict[str, Any]]:
+        """
+        Finish the page
+
+        Returns:
+            The topV3Pools list
+
+        Raises:
+            ValueError: The response carries GraphQL errors
+        """
+        started = time.perf_counter()
+        if ijson is None:
+            body = json.loads(b''.join(self._chunks) or b'null') or {}
+            self._chunks = []
+            self.errors = [error.get('message', str(error)) for error in body.get('errors') or []]
+            self.pools = ((body.get('data') or {}).get('topV3Pools')) or []
+        else:
+            self._parser.close()
+            self._consume_events()
+        self.parse_seconds += time.perf_counter() - started
+        if self.errors:
+            raise ValueError(f"GraphQL errors: {'; '.join(self.errors)}")
+        return self.pools
+
+
+class VariantStats:
+    """Transfer and parse totals of a query variant"""
+
+    def __init__(self):
+        self.pages = 0
+        self.pools = 0
+        self.wire_bytes = 0
+        self.decoded_bytes = 0
+        self.parse_seconds = 0.0
+        self.fetch_seconds = 0.0
+        self.last_page: Optional[Dict[str, Any]] = None
+
+    def record(self, decoder: PageDecoder, content_encoding: Optional[str], elapsed: float) -> None:
+        self.pages += 1
+        self.pools += len(decoder.pools)
+        self.wire_bytes += decoder.wire_bytes
+        self.decoded_bytes += decoder.decoded_bytes
+        self.parse_seconds += decoder.parse_seconds
+        self.fetch_seconds += elapsed
+        self.last_page = {
+            "pools": len(decoder.pools),
+            "content_encoding": content_encoding or 'identity',
+            "wire_bytes": decoder.wire_bytes,
+            "decoded_bytes": decoder.decoded_bytes,
+            "parse_ms": decoder.parse_seconds * 1000,
+            "fetch_ms": elapsed * 1000,
+        }
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "pages": self.pages,
+            "pools": self.pools,
+            "wire_bytes": self.wire_bytes,
+            "decoded_bytes": self.decoded_bytes,
+            "compression_ratio": self.decoded_bytes / self.wire_bytes if self.wire_bytes else None,
+            "avg_wire_bytes": self.wire_bytes / self.pages if self.pages else None,
+            "avg_parse_ms": self.parse_seconds / self.pages * 1000 if self.pages else None,
+            "avg_fetch_ms": self.fetch_seconds / self.pages * 1000 if self.pages else None,
+            "last_page": self.last_page,
+        }
+
+
+class GraphQLPoolClient:
+    """
+    TopV3Pools client of the Uniswap interface gateway
+
+    Keeps one keep-alive connection pool for all pages, asks for gzip (and br
+    when brotli is installed) and decompresses and parses pages as they stream
+    in. Callers pick the query variant with the fields they need (POOL_FIELDS).
+
+    Args:
+        url: GraphQL endpoint
+        page_size: Pools per page (the query's `first`)
+        keepalive_timeout: Seconds an idle connection is kept open
+        timeout: Total seconds of a page request
+        chunk_size: Bytes read from the socket at a time
+    """
+
+    def __init__(
+        self,
+        url: str = UNISWAP_GRAPHQL_URL,
+        page_size: int = 100,
+        keepalive_timeout: float = 60.0,
+        timeout: float = 30.0,
+        chunk_size: int = 64 * 1024
+    ):
+        self.url = url
+        self.page_size = page_size
+        self.keepalive_timeout = keepalive_timeout
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+        self.session: Optional[aiohttp.ClientSession] = None
+        self._stats: Dict[str, VariantStats] = {}
+
+    @classmethod
+    def from_env(cls) -> 'GraphQLPoolClient':
+        return cls(
+            url=os.getenv('UNISWAP_GRAPHQL_URL', UNISWAP_GRAPHQL_URL),
+            page_size=int(os.getenv('GRAPHQL_PAGE_SIZE', '100')),
+            keepalive_timeout=float(os.getenv('GRAPHQL_KEEPALIVE', '60')),
+            timeout=float(os.getenv('GRAPHQL_TIMEOUT', '30'))
+        )
+
+    def _session(self) -> aiohttp.ClientSession:
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(keepalive_timeout=self.keepalive_timeout, ttl_dns_cache=300),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers={**UNISWAP_GRAPHQL_HEADERS, "accept-encoding": ACCEPT_ENCODING},
+                # Bodies are decompressed by PageDecoder, which also counts the bytes on the wire
+                auto_decompress=False
+            )
+        return self.session
+
+    async def fetch_pools(
+        self,
+        chain: str,
+        variant: str = 'snapshot',
+        token_address: Optional[str] = None,
+        first: Optional[int] = None,
+        cursor: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        One page of top V3 pools by TVL
+
+        Args:
+            chain: Gateway chain name (BASE, ARBITRUM, ...)
+            variant: Key of POOL_FIELDS
+            token_address: Only pools containing this token
+            first: Page size, defaults to page_size
+            cursor: TVL of the last pool of the previous page
+
+        Returns:
+            Pools in GraphQL shape
+        """
+        payload = {
+            "operationName": "TopV3Pools",
+            "variables": {
+                "chain": chain,
+                "first": first or self.page_size,
+                "cursor": cursor,
+                "tokenAddress": token_address,
+            },
+            "query": QUERY_VARIANTS[variant],
+        }
+        started = time.perf_counter()
+        try:
+            async with self._session().post(self.url, json=payload) as response:
+                response.raise_for_status()
+                content_encoding = response.headers.get('Content-Encoding')
+                decoder = PageDecoder(content_encoding)
+                async for chunk in response.content.iter_chunked(self.chunk_size):
+                    decoder.feed(chunk)
+                pools = decoder.close()
+        except Exception as error:
+            print(f"Error fetching top V3 pools: {error}")
+            raise
+        self._stats.setdefault(variant, VariantStats()).record(decoder, content_encoding, time.perf_counter() - started)
+        return pools
+
+    async def fetch_top_v3_pools(self, chain: str, variant: str = 'snapshot', token_address: Optional[str] = None) -> Dict[str, Any]:
+        """fetch_pools wrapped in the GraphQL response shape ({"data": {"topV3Pools": [...]}})"""
+        return {"data": {"topV3Pools": await self.fetch_pools(chain, variant, token_address)}}
+
+    async def close(self) -> None:
+        if self.session and not self.session.closed:
+            await self.session.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "accept_encoding": ACCEPT_ENCODING,
+            "streaming_parser": ijson is not None,
+            "variants": {variant: stats.summary() for variant, stats in self._stats.items()},
+        }
+
+
+async def fetch_pools_once(chain: str, variant: str = 'snapshot', token_address: Optional[str] = None) -> List[Dict[str, Any]]:
+    """One page of pools with a short-lived client, for scripts"""
+    client = GraphQLPoolClient.from_env()
+    try:
+        return await client.fetch_pools(chain, variant, token_address)
+    finally:
+        await client.close()
@@ -0,0 +1,241 @@
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, NamedTuple, Optional
+
+from langchain.prompts import PromptTemplate
+from langchain_openai import ChatOpenAI
+
+DEFAULT_MODEL = "openai/gpt-4o-mini"
+
+# Stages of the UniswapPoolAgent pipeline that call the LLM
+LLM_STAGES = ('intent', 'swap_params', 'pool_info', 'rag', 'format')
+
+
+def strip_code_fence(content: str) -> str:
+    content = content.strip()
+    if content.startswith('```json\n'):
+        content = content[8:]
+    if content.endswith('\n```'):
+        content = content[:-4]
+    return content.replace('```', '').strip()
+
+
+def is_json_answer(content: str) -> bool:
+    try:
+        json.loads(strip_code_fence(content))
+        return True
+    except ValueError:
+        return False
+
+
+# What counts as a usable answer for each stage; a hedge keeps waiting past invalid ones
+STAGE_VALIDATORS: Dict[str, Callable[[str], bool]] = {
+    'intent': lambda content: content.strip().lower() in ('swap_path', 'pool_info', 'other'),
+    'swap_params': is_json_answer,
+    'format': is_json_answer,
+}
+
+
+class StageModels(NamedTuple):
+    """Model of a stage and the alternate model its hedged call goes to"""
+    model: str
+    hedge_model: str
+    temperature: float
+
+
+class LatencyStats:
+    """
+    Rolling latency windows of a stage
+
+    `samples` holds the end-to-end latency of every call (the winning answer
+    when hedged), `primary_samples` the latency of the primary model alone,
+    i.e. what the stage would take without hedging.
+    """
+
+    def __init__(self, window: int = 500):
+        self.samples: Deque[float] = deque(maxlen=window)
+        self.primary_samples: Deque[float] = deque(maxlen=window)
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.invalid = 0
+
+    def record(self, seconds: float) -> None:
+        self.samples.append(seconds)
+        self.calls += 1
+
+    def record_primary(self, seconds: float) -> None:
+        self.primary_samples.append(seconds)
+
+    def percentile(self, q: float, primary: bool = False) -> Optional[float]:
+        samples = self.primary_samples if primary else self.samples
+        if not samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "p50": self.percentile(0.50),
+            "p95": self.percentile(0.95),
+            "p99": self.percentile(0.99),
+            "primary_p50": self.percentile(0.50, primary=True),
+            "primary_p95": self.percentile(0.95, primary=True),
+            "primary_p99": self.percentile(0.99, primary=True),
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "invalid": self.invalid,
+        }
+
+
+class HedgedLLMRouter:
+    """
+    Per-stage model selection with hedged calls
+
+    Every stage has its own model (LLM_MODEL_<STAGE>, default LLM_MODEL). If the
+    primary call has not produced a valid answer after the stage's p95 latency,
+    a second call goes to the hedge model (LLM_HEDGE_MODEL_<STAGE>, default the
+    same model on another request) and the first valid answer wins; the other
+    call is cancelled. A primary call beaten by its hedge is left to finish so
+    its latency is still recorded. The hedge delay is the p95 of the primary
+    model alone (end-to-end latencies are cut short by hedging) and falls back
+    to LLM_HEDGE_DELAY until a stage has `min_samples` primary latencies.
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str],
+        api_base: Optional[str],
+        stage_models: Dict[str, StageModels],
+        default_models: StageModels,
+        hedging: bool = True,
+        default_delay: float = 3.0,
+        min_delay: float = 0.5,
+        min_samples: int = 20
+    ):
+        self.api_key = api_key
+        self.api_base = api_base
+        self.stage_models = stage_models
+        self.default_models = default_models
+        self.hedging = hedging
+        self.default_delay = default_delay
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self._clients: Dict[tuple, ChatOpenAI] = {}
+        self.latency: Dict[str, LatencyStats] = {}
+
+    @classmethod
+    def from_env(cls) -> 'HedgedLLMRouter':
+        model = os.getenv('LLM_MODEL', DEFAULT_MODEL)
+        default_models = StageModels(
+            model=model,
+            hedge_model=os.getenv('LLM_HEDGE_MODEL', model),
+            temperature=float(os.getenv('LLM_TEMPERATURE', '0.7'))
+        )
+        stage_models = {}
+        for stage in LLM_STAGES:
+            stage_model = os.getenv(f"LLM_MODEL_{stage.upper()}", default_models.model)
+            stage_models[stage] = StageModels(
+                model=stage_model,
+                hedge_model=os.getenv(f"LLM_HEDGE_MODEL_{stage.upper()}", os.getenv('LLM_HEDGE_MODEL', stage_model)),
+                temperature=float(os.getenv(f"LLM_TEMPERATURE_{stage.upper()}", default_models.temperature))
+            )
+        return cls(
+            api_key=os.getenv('OPENROUTER_API_KEY'),
+            api_base=os.getenv('OPENROUTER_API_BASE'),
+            stage_models=stage_models,
+            default_models=default_models,
+            hedging=os.getenv('LLM_HEDGING', '1') == '1',
+            default_delay=float(os.getenv('LLM_HEDGE_DELAY', '3.0'))
+        )
+
+    def _client(self, model: str, temperature: float) -> ChatOpenAI:
+        key = (model, temperature)
+        client = self._clients.get(key)
+        if client is None:
+            client = self._clients[key] = ChatOpenAI(
+                model_name=model,
+                openai_api_key=self.api_key,
+                openai_api_base=self.api_base,
+                temperature=temperature,
+            )
+        return client
+
+    def hedge_delay(self, stage: str) -> float:
+        stats = self.latency.get(stage)
+        if stats is None or len(stats.primary_samples) < self.min_samples:
+            return self.default_delay
+        return max(self.min_delay, stats.percentile(0.95, primary=True))
+
+    async def invoke(self, stage: str, prompt: PromptTemplate, variables: Dict[str, Any]) -> str:
+        """Run a stage prompt and return the response content"""
+        models = self.stage_models.get(stage, self.default_models)
+        validate = STAGE_VALIDATORS.get(stage, lambda content: bool(content.strip()))
+        stats = self.latency.setdefault(stage, LatencyStats())
+
+        async def call(model: str) -> str:
+            response = await (prompt | self._client(model, models.temperature)).ainvoke(variables)
+            return response.content
+
+        started = time.perf_counter()
+
+        def record_primary(task: asyncio.Task) -> None:
+            if not task.cancelled() and task.exception() is None:
+                stats.record_primary(time.perf_counter() - started)
+
+        primary = asyncio.create_task(call(models.model))
+        primary.add_done_callback(record_primary)
+        tasks: List[asyncio.Task] = [primary]
+        hedge_won = False
+        fallback: Optional[str] = None
+        error: Optional[BaseException] = None
+        try:
+            pending = set(tasks)
+            timeout = self.hedge_delay(stage) if self.hedging else None
+            while pending:
+                done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                        continue
+                    content = task.result()
+                    if validate(content):
+                        stats.record(time.perf_counter() - started)
+                        if task is not primary:
+                            stats.hedge_wins += 1
+                            hedge_won = True
+                        return content
+                    stats.invalid += 1
+                    fallback = content if fallback is None else fallback
+                # Hedge once: after the delay, or as soon as the primary failed
+                if len(tasks) == 1 and self.hedging:
+                    stats.hedged += 1
+                    hedge = asyncio.create_task(call(models.hedge_model))
+                    tasks.append(hedge)
+                    pending.add(hedge)
+                timeout = None
+        finally:
+            for task in tasks:
+                # The primary beaten by a hedge only runs on for its latency
+                if not task.done() and not (task is primary and hedge_won):
+                    task.cancel()
+
+        stats.record(time.perf_counter() - started)
+        if fallback is not None:
+            return fallback  # no valid answer, let the caller's parsing report it
+        raise error
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            stage: {
+                **stats.summary(),
+                "model": self.stage_models.get(stage, self.default_models).model,
+                "hedge_model": self.stage_models.get(stage, self.default_models).hedge_model,
+                "hedge_delay": self.hedge_delay(stage),
+            }
+            for stage, stats in self.latency.items()
+        }
@@ -0,0 +1,91 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Tuple
+
+import numpy as np
+from pool_snapshot import PoolSnapshot
+from risk_scoring import PoolRiskScores
+
+# Network name of requests that compare every supported network
+ALL_NETWORKS = 'ALL'
+
+
+class NetworkPoolScore(NamedTuple):
+    """A scored pool with metrics comparable across networks"""
+    network: str
+    address: str
+    pair: str
+    fee_tier: int
+    tvl: float
+    volume_24h: float
+    apr_bps: int
+    risk_bps: int
+    score_bps: int
+    tvl_share: float       # share of the network's total TVL
+    tvl_percentile: float  # 1.0 for the deepest pool of its network
+
+
+async def fan_out(calls: Dict[str, Callable[[], Awaitable[Any]]], timeout: float) -> Dict[str, Any]:
+    """
+    Run one call per network concurrently
+
+    Networks that fail or are still running after `timeout` seconds are left
+    out, so the fan-out takes as long as the slowest network within the timeout.
+
+    Returns:
+        Results by network, for the calls that succeeded
+    """
+    tasks = {network: asyncio.ensure_future(call()) for network, call in calls.items()}
+    if not tasks:
+        return {}
+    done, pending = await asyncio.wait(tasks.values(), timeout=timeout)
+    for task in pending:
+        task.cancel()
+
+    results = {}
+    for network, task in tasks.items():
+        if task in pending:
+            print(f"Skipping {network}: no answer within {timeout}s")
+        elif task.exception() is not None:
+            print(f"Skipping {network}: {task.exception()}")
+        else:
+            results[network] = task.result()
+    return results
+
+
+def merge_network_scores(scored: Dict[str, Tuple[PoolSnapshot, PoolRiskScores]], per_network: int = 50, min_tvl: float = 0.0) -> List[NetworkPoolScore]:
+    """
+    Best pools of every network in one ranking
+
+    Takes the `per_network` best risk-adjusted pools of each network, adds
+    their TVL share and TVL percentile within their own network, and ranks
+    them all by risk-adjusted return (basis points, comparable across chains).
+    """
+    merged = []
+    for network, (snapshot, scores) in scored.items():
+        tvl = np.frombuffer(snapshot.tvl, dtype=np.float64)
+        if len(tvl) == 0:
+            continue
+        total_tvl = tvl.sum()
+        # Percentile of every pool by TVL within the network
+        percentile = np.empty(len(tvl))
+        percentile[np.argsort(tvl, kind='stable')] = np.arange(1, len(tvl) + 1) / len(tvl)
+
+        candidates = np.flatnonzero(tvl >= min_tvl)
+        best = candidates[np.argsort(-scores.score_bps[candidates], kind='stable')][:per_network]
+        for index in best:
+            row = snapshot.row(int(index))
+            merged.append(NetworkPoolScore(
+                network=network,
+                address=row.address,
+                pair=f"{row.token0_symbol}/{row.token1_symbol}",
+                fee_tier=row.fee_tier,
+                tvl=row.tvl,
+                volume_24h=row.volume_24h,
+                apr_bps=int(scores.apr_bps[index]),
+                risk_bps=int(scores.risk_bps[index]),
+                score_bps=int(scores.score_bps[index]),
+                tvl_share=float(row.tvl / total_tvl) if total_tvl > 0 else 0.0,
+                tvl_percentile=float(percentile[index]),
+            ))
+    merged.sort(key=lambda pool: (-pool.score_bps, -pool.tvl))
+    return merged
@@ -0,0 +1,215 @@
+import asyncio
+import os
+import time
+from array import array
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from concurrency import run_blocking
+from pool_snapshot import PoolSnapshot
+from web3 import Web3
+
+# Same address on every chain the provider supports (deployed with a presigned tx)
+MULTICALL3_ADDRESS = "0xcA11bde05977b3631167028862bE2a173976CA11"
+
+MULTICALL3_ABI = [
+    {
+        "name": "aggregate3",
+        "type": "function",
+        "stateMutability": "payable",
+        "inputs": [{
+            "name": "calls",
+            "type": "tuple[]",
+            "components": [
+                {"name": "target", "type": "address"},
+                {"name": "allowFailure", "type": "bool"},
+                {"name": "callData", "type": "bytes"},
+            ],
+        }],
+        "outputs": [{
+            "name": "returnData",
+            "type": "tuple[]",
+            "components": [
+                {"name": "success", "type": "bool"},
+                {"name": "returnData", "type": "bytes"},
+            ],
+        }],
+    },
+]
+
+# IUniswapV3PoolState selectors
+SLOT0_SELECTOR = Web3.keccak(text="slot0()")[:4]
+LIQUIDITY_SELECTOR = Web3.keccak(text="liquidity()")[:4]
+TICKS_SELECTOR = Web3.keccak(text="ticks(int24)")[:4]
+
+Q96 = 2 ** 96
+
+
+def _word(data: bytes, index: int, signed: bool = False) -> int:
+    return int.from_bytes(data[index * 32:(index + 1) * 32], 'big', signed=signed)
+
+
+def encode_int_argument(value: int) -> bytes:
+    """ABI encode a (possibly negative) integer argument as one 32-byte word"""
+    return (value % (1 << 256)).to_bytes(32, 'big')
+
+
+class PoolState:
+    """
+    On-chain state of the pools of a snapshot, read at a single block
+
+    Columns are aligned with the snapshot rows; `ok` is 0 where a pool's
+    calls failed (its other columns are then 0).
+    """
+
+    __slots__ = ('chain', 'snapshot_version', 'block_number', 'read_at', 'sqrt_price', 'tick', 'liquidity', 'ok')
+
+    def __init__(self, chain: str, snapshot_version: int, block_number: int, size: int):
+        self.chain = chain
+        self.snapshot_version = snapshot_version
+        self.block_number = block_number
+        self.read_at = time.time()
+        self.sqrt_price = array('d', bytes(8 * size))    # sqrtPriceX96 / 2**96
+        self.tick = array('i', bytes(4 * size))
+        self.liquidity = array('d', bytes(8 * size))     # uint128 in-range liquidity
+        self.ok = array('b', bytes(size))
+
+    def __len__(self) -> int:
+        return len(self.ok)
+
+    def price(self, index: int) -> float:
+        """token1 per token0 in raw (undecimalized) units"""
+        return self.sqrt_price[index] ** 2
+
+
+class MulticallClient:
+    """
+    Batch eth_calls through Multicall3 aggregate3
+
+    Calls are split in chunks of `chunk_size` sent concurrently (at most
+    `max_parallel` at a time), all pinned to the same block. A chunk the node
+    rejects for its size (gas or response size limits) is split in half and
+    retried; any other error (node down, rate limited) fails the read.
+    """
+
+    def __init__(self, rpc_url: str, multicall_address: str = MULTICALL3_ADDRESS, chunk_size: int = 1000, max_parallel: int = 4):
+        self.web3 = Web3(Web3.HTTPProvider(rpc_url))
+        self.contract = self.web3.eth.contract(address=Web3.to_checksum_address(multicall_address), abi=MULTICALL3_ABI)
+        self.chunk_size = chunk_size
+        self._semaphore = asyncio.Semaphore(max_parallel)
+
+    async def block_number(self, confirmations: int = 0) -> int:
+        return await run_blocking(lambda: self.web3.eth.block_number) - confirmations
+
+    @staticmethod
+    def _is_size_error(error: Exception) -> bool:
+        message = str(error).lower()
+        if 'rate' in message or 'too many requests' in message:
+            return False
+        return any(hint in message for hint in ('gas', 'too large', 'response size', 'size exceed', 'content length', 'payload'))
+
+    async def _call_chunk(self, calls: Sequence[Tuple[str, bool, bytes]], block: int) -> List[Tuple[bool, bytes]]:
+        async with self._semaphore:
+            try:
+                return await run_blocking(self.contract.functions.aggregate3(list(calls)).call, {}, block)
+            except Exception as e:
+                if len(calls) == 1 or not self._is_size_error(e):
+                    raise
+        middle = len(calls) // 2
+        first, second = await asyncio.gather(
+            self._call_chunk(calls[:middle], block),
+            self._call_chunk(calls[middle:], block)
+        )
+        return first + second
+
+    async def aggregate(self, calls: Sequence[Tuple[str, bytes]], block: int) -> List[Tuple[bool, bytes]]:
+        """
+        Run (target, calldata) calls at a block
+
+        Returns:
+            (success, return data) per call, in call order
+        """
+        prepared = [(Web3.to_checksum_address(target), True, data) for target, data in calls]
+        chunks = [prepared[i:i + self.chunk_size] for i in range(0, len(prepared), self.chunk_size)]
+        results = await asyncio.gather(*(self._call_chunk(chunk, block) for chunk in chunks))
+        return [tuple(item) for chunk in results for item in chunk]
+
+
+class PoolStateReader:
+    """
+    Read slot0 / liquidity / tick data of Uniswap V3 pools in bulk
+
+    Two calls per pool, so the default chunk of 1000 calls covers 500 pools.
+
+    Against a local dev chain without Multicall3 (plain anvil / hardhat),
+    deploy it and point MULTICALL3_ADDRESS at the deployment; forked chains
+    already have it at the canonical address.
+    """
+
+    def __init__(self, client: MulticallClient, confirmations: int = 0):
+        self.client = client
+        self.confirmations = confirmations
+
+    @classmethod
+    def from_env(cls, network: str) -> Optional['PoolStateReader']:
+        """Reader for a network from <NETWORK>_RPC_URL, None when not configured"""
+        rpc_url = os.getenv(f"{network.upper()}_RPC_URL")
+        if not rpc_url:
+            return None
+        client = MulticallClient(
+            rpc_url,
+            multicall_address=os.getenv('MULTICALL3_ADDRESS', MULTICALL3_ADDRESS),
+            chunk_size=int(os.getenv('MULTICALL_CHUNK_SIZE', '1000')),
+            max_parallel=int(os.getenv('MULTICALL_MAX_PARALLEL', '4'))
+        )
+        return cls(client, confirmations=int(os.getenv('MULTICALL_CONFIRMATIONS', '0')))
+
+    async def read(self, snapshot: PoolSnapshot, block: Optional[int] = None) -> PoolState:
+        """
+        Read slot0 and liquidity of every pool of a snapshot at one block
+
+        Args:
+            snapshot: Pools to read
+            block: Block to pin the reads to (default: head - confirmations)
+        """
+        if block is None:
+            block = await self.client.block_number(self.confirmations)
+
+        calls = []
+        for address in snapshot.pool_addresses:
+            calls.append((address, SLOT0_SELECTOR))
+            calls.append((address, LIQUIDITY_SELECTOR))
+        results = await self.client.aggregate(calls, block)
+
+        state = PoolState(snapshot.chain, snapshot.version, block, len(snapshot))
+        for index in range(len(snapshot)):
+            (slot0_ok, slot0), (liquidity_ok, liquidity) = results[2 * index], results[2 * index + 1]
+            if not (slot0_ok and liquidity_ok and len(slot0) >= 64 and len(liquidity) >= 32):
+                continue
+            state.sqrt_price[index] = _word(slot0, 0) / Q96
+            state.tick[index] = _word(slot0, 1, signed=True)
+            state.liquidity[index] = float(_word(liquidity, 0))
+            state.ok[index] = 1
+        return state
+
+    async def read_ticks(self, pool_ticks: Dict[str, Iterable[int]], block: int) -> Dict[Tuple[str, int], Tuple[int, int]]:
+        """
+        Read initialized tick data around the current price
+
+        Args:
+            pool_ticks: Ticks to read per pool address
+            block: Block to read at (use the PoolState block for a consistent view)
+
+        Returns:
+            {(pool address, tick): (liquidityGross, liquidityNet)} for initialized ticks
+        """
+        keys = [(address, tick) for address, ticks in pool_ticks.items() for tick in ticks]
+        results = await self.client.aggregate(
+            [(address, TICKS_SELECTOR + encode_int_argument(tick)) for address, tick in keys],
+            block
+        )
+        ticks = {}
+        for key, (success, data) in zip(keys, results):
+            # ticks() returns 8 words, the last one is `initialized`
+            if success and len(data) >= 256 and _word(data, 7):
+                ticks[key] = (_word(data, 0), _word(data, 1, signed=True))
+        return ticks
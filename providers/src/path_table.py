@@ -0,0 +1,131 @@
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from pool_snapshot import PoolSnapshot
+
+# Swap legs of SmartFarming start or end in USDC
+USDC_ADDRESSES = {
+    'BASE': '0x833589fcd6edb6e08f4c7c32d4f71b54bda02913',
+    'ARBITRUM': '0xaf88d065e77c8cc2239327c5edb3a432268e5831',
+}
+
+
+def encode_path(tokens: List[str], fees: List[int]) -> bytes:
+    """Uniswap V3 path: token (20 bytes) | fee (3 bytes) | token | ..."""
+    path = bytes.fromhex(tokens[0][2:])
+    for fee, token in zip(fees, tokens[1:]):
+        path += fee.to_bytes(3, 'big') + bytes.fromhex(token[2:])
+    return path
+
+
+class PathTable:
+    """
+    Best swap path between USDC and every token of a snapshot, in both directions
+
+    Paths maximize the bottleneck TVL along the route discounted by the fee of
+    every hop, with at most `max_hops` pools. Built once per snapshot so a path
+    lookup on the request path is a dictionary hit.
+    """
+
+    __slots__ = ('chain', 'snapshot_version', 'usdc', 'from_usdc', 'to_usdc', 'pools', 'bottleneck_tvl', 'built_in')
+
+    def __init__(self, chain: str, snapshot_version: int, usdc: str):
+        self.chain = chain
+        self.snapshot_version = snapshot_version
+        self.usdc = usdc.lower()
+        self.from_usdc: Dict[str, bytes] = {self.usdc: b''}
+        self.to_usdc: Dict[str, bytes] = {self.usdc: b''}
+        self.pools: Dict[str, Tuple[str, ...]] = {self.usdc: ()}
+        self.bottleneck_tvl: Dict[str, float] = {}
+        self.built_in = 0.0
+
+    def path_from_usdc(self, token: str) -> Optional[bytes]:
+        """Encoded exactInput path USDC -> token (b'' for USDC itself)"""
+        return self.from_usdc.get(token.lower())
+
+    def path_to_usdc(self, token: str) -> Optional[bytes]:
+        """Encoded exactInput path token -> USDC (b'' for USDC itself)"""
+        return self.to_usdc.get(token.lower())
+
+    def __len__(self) -> int:
+        return len(self.from_usdc)
+
+    @classmethod
+    def build(cls, snapshot: PoolSnapshot, usdc: str, max_hops: int = 3, min_tvl: float = 0.0) -> 'PathTable':
+        """
+        Layered widest-path search from USDC over the snapshot pools
+
+        Layer h holds the best path of at most h hops to every token; each layer
+        is one vectorized relaxation of all pools in both directions.
+        """
+        started = time.perf_counter()
+        table = cls(snapshot.chain, snapshot.version, usdc)
+        source = snapshot.tokens.index_of(usdc)
+        if source is None:
+            return table
+
+        token0 = np.frombuffer(snapshot.token0, dtype=np.uint32).astype(np.int64)
+        token1 = np.frombuffer(snapshot.token1, dtype=np.uint32).astype(np.int64)
+        tvl = np.frombuffer(snapshot.tvl, dtype=np.float64)
+        fee_tier = np.frombuffer(snapshot.fee_tier, dtype=np.uint32)
+        usable = np.flatnonzero((tvl > 0) & (tvl >= min_tvl))
+
+        # Directed edges: every usable pool once per direction
+        edge_pool = np.concatenate([usable, usable])
+        edge_from = np.concatenate([token0[usable], token1[usable]])
+        edge_to = np.concatenate([token1[usable], token0[usable]])
+        edge_tvl = tvl[edge_pool]
+        edge_keep = 1.0 - fee_tier[edge_pool] / 1e6
+
+        tokens = len(snapshot.tokens)
+        bottleneck = np.zeros(tokens)
+        keep = np.ones(tokens)
+        bottleneck[source] = np.inf
+        layers = []
+        for _ in range(max_hops):
+            candidate_bottleneck = np.minimum(bottleneck[edge_from], edge_tvl)
+            candidate_keep = keep[edge_from] * edge_keep
+            candidate_score = candidate_bottleneck * candidate_keep
+
+            # Best candidate edge per destination token
+            order = np.lexsort((candidate_score, edge_to))
+            last = np.append(edge_to[order][1:] != edge_to[order][:-1], True)
+            best = order[last]
+            improves = best[candidate_score[best] > bottleneck[edge_to[best]] * keep[edge_to[best]]]
+
+            layer = np.full(tokens, -1, dtype=np.int64)
+            if len(improves) == 0:
+                break
+            destinations = edge_to[improves]
+            layer[destinations] = improves
+            bottleneck = bottleneck.copy()
+            keep = keep.copy()
+            bottleneck[destinations] = candidate_bottleneck[improves]
+            keep[destinations] = candidate_keep[improves]
+            layers.append(layer)
+
+        addresses = snapshot.tokens.addresses
+        pool_addresses = snapshot.pool_addresses
+        for token in np.flatnonzero(np.isfinite(bottleneck) & (bottleneck > 0)):
+            hops = []
+            current, depth = int(token), len(layers) - 1
+            while current != source:
+                while layers[depth][current] < 0:
+                    depth -= 1
+                edge = int(layers[depth][current])
+                hops.append(edge)
+                current = int(edge_from[edge])
+                depth -= 1
+            hops.reverse()
+
+            route = [addresses[source]] + [addresses[int(edge_to[edge])] for edge in hops]
+            fees = [int(fee_tier[edge_pool[edge]]) for edge in hops]
+            address = addresses[int(token)]
+            table.from_usdc[address] = encode_path(route, fees)
+            table.to_usdc[address] = encode_path(route[::-1], fees[::-1])
+            table.pools[address] = tuple(pool_addresses[int(edge_pool[edge])] for edge in hops)
+            table.bottleneck_tvl[address] = float(bottleneck[token])
+
+        table.built_in = time.perf_counter() - started
+        return table
@@ -0,0 +1,238 @@
+import struct
+import sys
+import time
+from array import array
+from typing import Any, Dict, Iterator, List, Optional
+
+# Binary layout: header, chain name, string tables, then the numeric columns
+_MAGIC = b'PSNP'
+_FORMAT_VERSION = 1
+_HEADER = struct.Struct('<4sHqdII')  # magic, format, version, fetched_at, pools, tokens
+
+# Numeric columns in serialization order: (attribute, array typecode)
+_COLUMNS = (
+    ('token0', 'I'),
+    ('token1', 'I'),
+    ('fee_tier', 'I'),
+    ('tx_count', 'q'),
+    ('tvl', 'd'),
+    ('volume_24h', 'd'),
+    ('volume_30d', 'd'),
+)
+
+
+def _pack_strings(values: List[str]) -> bytes:
+    blob = '\x00'.join(values).encode('utf-8')
+    return struct.pack('<I', len(blob)) + blob
+
+
+def _unpack_strings(buffer: memoryview, offset: int, count: int):
+    (length,) = struct.unpack_from('<I', buffer, offset)
+    offset += 4
+    values = bytes(buffer[offset:offset + length]).decode('utf-8').split('\x00') if count else []
+    return [sys.intern(value) for value in values], offset + length
+
+
+def _value(field: Optional[Dict[str, Any]]) -> float:
+    """Read a {"value": x} GraphQL amount, missing values count as 0"""
+    if not field or field.get('value') is None:
+        return 0.0
+    return float(field['value'])
+
+
+class TokenTable:
+    """Interned token addresses and symbols, referenced by index from the snapshot columns"""
+
+    __slots__ = ('addresses', 'symbols', '_index')
+
+    def __init__(self):
+        self.addresses: List[str] = []
+        self.symbols: List[str] = []
+        self._index: Dict[str, int] = {}
+
+    def intern(self, address: Optional[str], symbol: Optional[str]) -> int:
+        address = sys.intern((address or '').lower())
+        index = self._index.get(address)
+        if index is None:
+            index = len(self.addresses)
+            self._index[address] = index
+            self.addresses.append(address)
+            self.symbols.append(sys.intern(symbol or ''))
+        return index
+
+    def index_of(self, address: str) -> Optional[int]:
+        return self._index.get(address.lower())
+
+    def __len__(self) -> int:
+        return len(self.addresses)
+
+
+class PoolRow:
+    """Lightweight view on one pool of a PoolSnapshot"""
+
+    __slots__ = ('snapshot', 'index')
+
+    def __init__(self, snapshot: 'PoolSnapshot', index: int):
+        self.snapshot = snapshot
+        self.index = index
+
+    @property
+    def address(self) -> str:
+        return self.snapshot.pool_addresses[self.index]
+
+    @property
+    def token0_address(self) -> str:
+        return self.snapshot.tokens.addresses[self.snapshot.token0[self.index]]
+
+    @property
+    def token0_symbol(self) -> str:
+        return self.snapshot.tokens.symbols[self.snapshot.token0[self.index]]
+
+    @property
+    def token1_address(self) -> str:
+        return self.snapshot.tokens.addresses[self.snapshot.token1[self.index]]
+
+    @property
+    def token1_symbol(self) -> str:
+        return self.snapshot.tokens.symbols[self.snapshot.token1[self.index]]
+
+    @property
+    def fee_tier(self) -> int:
+        return self.snapshot.fee_tier[self.index]
+
+    @property
+    def tx_count(self) -> int:
+        return self.snapshot.tx_count[self.index]
+
+    @property
+    def tvl(self) -> float:
+        return self.snapshot.tvl[self.index]
+
+    @property
+    def volume_24h(self) -> float:
+        return self.snapshot.volume_24h[self.index]
+
+    @property
+    def volume_30d(self) -> float:
+        return self.snapshot.volume_30d[self.index]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "address": self.address,
+            "token0": {"symbol": self.token0_symbol, "address": self.token0_address},
+            "token1": {"symbol": self.token1_symbol, "address": self.token1_address},
+            "feeTier": self.fee_tier,
+            "tvl": self.tvl,
+            "volume24h": self.volume_24h,
+            "volume30d": self.volume_30d,
+            "txCount": self.tx_count,
+        }
+
+    def __repr__(self) -> str:
+        return f"PoolRow({self.address}, {self.token0_symbol}-{self.token1_symbol}, fee={self.fee_tier}, tvl={self.tvl:.2f})"
+
+
+class PoolSnapshot:
+    """
+    Columnar snapshot of the top V3 pools of one chain
+
+    Numeric fields live in contiguous typed arrays (zero-copy for numpy via
+    np.frombuffer), token addresses and symbols are interned once in a
+    TokenTable and referenced by index.
+    """
+
+    __slots__ = (
+        'chain', 'version', 'fetched_at', 'pool_addresses', 'tokens', '_pool_index',
+        'token0', 'token1', 'fee_tier', 'tx_count', 'tvl', 'volume_24h', 'volume_30d',
+    )
+
+    def __init__(self, chain: str, version: Optional[int] = None, fetched_at: Optional[float] = None):
+        self.chain = chain
+        self.fetched_at = fetched_at if fetched_at is not None else time.time()
+        self.version = version if version is not None else int(self.fetched_at * 1000)
+        self.pool_addresses: List[str] = []
+        self.tokens = TokenTable()
+        self._pool_index: Dict[str, int] = {}
+        for name, typecode in _COLUMNS:
+            setattr(self, name, array(typecode))
+
+    @classmethod
+    def from_graphql(cls, pools: List[Dict[str, Any]], chain: str, version: Optional[int] = None) -> 'PoolSnapshot':
+        """Build a snapshot from the topV3Pools list of a TopV3Pools GraphQL response"""
+        snapshot = cls(chain, version=version)
+        for pool in pools:
+            snapshot.append(pool)
+        return snapshot
+
+    def append(self, pool: Dict[str, Any]) -> int:
+        """Add one pool in GraphQL shape, returns its row index"""
+        index = len(self.pool_addresses)
+        address = sys.intern(pool['address'].lower())
+        self.pool_addresses.append(address)
+        self._pool_index[address] = index
+        self.token0.append(self.tokens.intern(pool['token0'].get('address'), pool['token0'].get('symbol')))
+        self.token1.append(self.tokens.intern(pool['token1'].get('address'), pool['token1'].get('symbol')))
+        self.fee_tier.append(int(pool.get('feeTier') or 0))
+        self.tx_count.append(int(pool.get('txCount') or 0))
+        self.tvl.append(_value(pool.get('totalLiquidity')))
+        self.volume_24h.append(_value(pool.get('volume24h')))
+        self.volume_30d.append(_value(pool.get('volume30d')))
+        return index
+
+    def __len__(self) -> int:
+        return len(self.pool_addresses)
+
+    def row(self, index: int) -> PoolRow:
+        return PoolRow(self, index)
+
+    def __iter__(self) -> Iterator[PoolRow]:
+        return (PoolRow(self, index) for index in range(len(self)))
+
+    def index_of(self, pool_address: str) -> Optional[int]:
+        return self._pool_index.get(pool_address.lower())
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        return [row.to_dict() for row in self]
+
+    def to_bytes(self) -> bytes:
+        """Compact binary serialization for disk and IPC"""
+        parts = [
+            _HEADER.pack(_MAGIC, _FORMAT_VERSION, self.version, self.fetched_at, len(self), len(self.tokens)),
+            _pack_strings([self.chain]),
+            _pack_strings(self.pool_addresses),
+            _pack_strings(self.tokens.addresses),
+            _pack_strings(self.tokens.symbols),
+        ]
+        for name, _ in _COLUMNS:
+            column = getattr(self, name)
+            if sys.byteorder == 'big':
+                column = array(column.typecode, column)
+                column.byteswap()
+            parts.append(column.tobytes())
+        return b''.join(parts)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'PoolSnapshot':
+        buffer = memoryview(data)
+        magic, format_version, version, fetched_at, pool_count, token_count = _HEADER.unpack_from(buffer, 0)
+        if magic != _MAGIC or format_version != _FORMAT_VERSION:
+            raise ValueError(f"Not a pool snapshot (magic={magic!r}, format={format_version})")
+
+        offset = _HEADER.size
+        (chain,), offset = _unpack_strings(buffer, offset, 1)
+        snapshot = cls(chain, version=version, fetched_at=fetched_at)
+        snapshot.pool_addresses, offset = _unpack_strings(buffer, offset, pool_count)
+        snapshot.tokens.addresses, offset = _unpack_strings(buffer, offset, token_count)
+        snapshot.tokens.symbols, offset = _unpack_strings(buffer, offset, token_count)
+        snapshot.tokens._index = {address: index for index, address in enumerate(snapshot.tokens.addresses)}
+        snapshot._pool_index = {address: index for index, address in enumerate(snapshot.pool_addresses)}
+
+        for name, typecode in _COLUMNS:
+            column = array(typecode)
+            size = column.itemsize * pool_count
+            column.frombytes(buffer[offset:offset + size])
+            if sys.byteorder == 'big':
+                column.byteswap()
+            setattr(snapshot, name, column)
+            offset += size
+        return snapshot
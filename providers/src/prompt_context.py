@@ -0,0 +1,214 @@
+import json
+import os
+from typing import Any, Dict, List, Optional, Sequence
+
+from pool_snapshot import PoolSnapshot
+
+try:
+    import tiktoken
+except ImportError:  # optional, token counts fall back to an estimate
+    tiktoken = None
+
+# Default token budget of the context inserted by each prompt stage
+DEFAULT_BUDGETS = {
+    'pool_info': 3000,
+    'format': 1500,
+}
+
+
+class TokenCounter:
+    """Token count with tiktoken when installed, ~4 characters per token otherwise"""
+
+    def __init__(self, encoding: str = 'o200k_base'):
+        self.encoding = None
+        if tiktoken is not None:
+            try:
+                self.encoding = tiktoken.get_encoding(encoding)
+            except Exception as e:
+                print(f"Error loading tokenizer {encoding}, estimating token counts: {e}")
+
+    @property
+    def exact(self) -> bool:
+        return self.encoding is not None
+
+    def count(self, text: str) -> int:
+        if self.encoding is not None:
+            return len(self.encoding.encode(text, disallowed_special=()))
+        return (len(text) + 3) // 4
+
+
+def compact_number(value: Any) -> str:
+    """3 significant digits with a K/M/B suffix: 1234567.8 -> 1.23M"""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return str(value)
+    magnitude = abs(number)
+    for threshold, suffix in ((1e9, 'B'), (1e6, 'M'), (1e3, 'K')):
+        if magnitude >= threshold:
+            return f"{number / threshold:.3g}{suffix}"
+    return f"{number:.3g}"
+
+
+def render_table(columns: Sequence[str], rows: List[Sequence[Any]]) -> str:
+    """Pipe separated table, header first"""
+    lines = ['|'.join(columns)]
+    lines.extend('|'.join(str(cell) for cell in row) for row in rows)
+    return '\n'.join(lines)
+
+
+class ContextSerializer:
+    """
+    Render the data a prompt stage needs in as few tokens as possible
+
+    Only the fields a stage uses are projected, numbers are rounded to three
+    significant digits and rows are rendered as a compact table, cut at the
+    stage's token budget (largest pools first). Every `savings_sample`-th call
+    also measures the tokens of the former JSON context to report savings.
+    """
+
+    def __init__(self, budgets: Optional[Dict[str, int]] = None, counter: Optional[TokenCounter] = None, savings_sample: int = 10):
+        self.budgets = {**DEFAULT_BUDGETS, **(budgets or {})}
+        self.counter = counter or TokenCounter()
+        self.savings_sample = savings_sample
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    @classmethod
+    def from_env(cls) -> 'ContextSerializer':
+        budgets = {stage: int(os.getenv(f"PROMPT_BUDGET_{stage.upper()}", budget)) for stage, budget in DEFAULT_BUDGETS.items()}
+        return cls(
+            budgets,
+            TokenCounter(os.getenv('PROMPT_TOKENIZER', 'o200k_base')),
+            savings_sample=int(os.getenv('PROMPT_SAVINGS_SAMPLE', '10'))
+        )
+
+    def _record(self, stage: str, text: str, legacy: Any) -> str:
+        stats = self._stats.setdefault(stage, {"calls": 0, "tokens": 0, "sampled": 0, "sampled_tokens": 0, "sampled_legacy_tokens": 0})
+        tokens = self.counter.count(text)
+        stats["calls"] += 1
+        stats["tokens"] += tokens
+        if self.savings_sample and stats["calls"] % self.savings_sample == 1 % self.savings_sample:
+            stats["sampled"] += 1
+            stats["sampled_tokens"] += tokens
+            stats["sampled_legacy_tokens"] += self.counter.count(legacy() if callable(legacy) else legacy)
+        return text
+
+    def _fit_rows(self, stage: str, columns: Sequence[str], rows: List[Sequence[Any]]) -> str:
+        budget = self.budgets.get(stage)
+        if budget is None:
+            return render_table(columns, rows)
+        used = self.counter.count('|'.join(columns))
+        kept = []
+        for row in rows:
+            line = '|'.join(str(cell) for cell in row)
+            used += self.counter.count(line) + 1
+            if used > budget:
+                break
+            kept.append(row)
+        return render_table(columns, kept)
+
+    def _fit_text(self, stage: str, text: str) -> str:
+        budget = self.budgets.get(stage)
+        if budget is None or self.counter.count(text) <= budget:
+            return text
+        if self.counter.exact:
+            return self.counter.encoding.decode(self.counter.encoding.encode(text, disallowed_special=())[:budget])
+        return text[:budget * 4]
+
+    def pools(self, snapshot: PoolSnapshot, stage: str = 'pool_info') -> str:
+        """Pools of a snapshot by TVL: address, pair, fee, TVL, volumes, fee APR, tx count"""
+        order = sorted(range(len(snapshot)), key=lambda index: -snapshot.tvl[index])
+        rows = []
+        for index in order:
+            pool = snapshot.row(index)
+            apr = pool.volume_24h * pool.fee_tier / 1e6 * 365 / pool.tvl if pool.tvl > 0 else 0.0
+            rows.append((
+                pool.address,
+                f"{pool.token0_symbol}/{pool.token1_symbol}",
+                f"{pool.fee_tier / 10000:g}%",
+                compact_number(pool.tvl),
+                compact_number(pool.volume_24h),
+                compact_number(pool.volume_30d),
+                f"{apr * 100:.3g}%",
+                pool.tx_count,
+            ))
+        text = self._fit_rows(stage, ('pool', 'pair', 'fee', 'tvl_usd', 'vol24h_usd', 'vol30d_usd', 'fee_apr', 'txs'), rows)
+        return self._record(stage, text, lambda: json.dumps(snapshot.to_records()))
+
+    def network_pools(self, ranked: Sequence[Any], stage: str = 'pool_info') -> str:
+        """Merged NetworkPoolScore ranking of several networks, best first"""
+        rows = [
+            (
+                pool.network,
+                pool.address,
+                pool.pair,
+                f"{pool.fee_tier / 10000:g}%",
+                compact_number(pool.tvl),
+                f"{pool.tvl_share * 100:.2g}%",
+                f"{pool.tvl_percentile * 100:.0f}",
+                compact_number(pool.volume_24h),
+                pool.apr_bps,
+                pool.risk_bps,
+                pool.score_bps,
+            )
+            for pool in ranked
+        ]
+        text = self._fit_rows(stage, ('chain', 'pool', 'pair', 'fee', 'tvl_usd', 'tvl_share', 'tvl_pct', 'vol24h_usd', 'apr_bps', 'risk_bps', 'score_bps'), rows)
+        return self._record(f"{stage}_all_networks", text, lambda: json.dumps([pool._asdict() for pool in ranked]))
+
+    @staticmethod
+    def _project_quote(data: Dict[str, Any]) -> Dict[str, Any]:
+        """Swap handler response without gas strategies, calldata and per-pool internals"""
+        quote = (data.get('api_response') or {}).get('quote') or {}
+        projected = {"request": data.get('request')}
+        for side in ('input', 'output'):
+            if isinstance(quote.get(side), dict):
+                projected[side] = {"amount": quote[side].get('amount'), "token": quote[side].get('token')}
+        if quote.get('gasFeeUSD') is not None:
+            projected["gas_usd"] = compact_number(quote['gasFeeUSD'])
+
+        routes = []
+        for route in quote.get('route') or []:
+            hops = []
+            for hop in route or []:
+                token_in, token_out = hop.get('tokenIn') or {}, hop.get('tokenOut') or {}
+                hops.append(
+                    f"{token_in.get('symbol')}({token_in.get('address')})"
+                    f" -{hop.get('fee')}-> "
+                    f"{token_out.get('symbol')}({token_out.get('address')}) pool {hop.get('address')}"
+                )
+            routes.append(hops)
+        projected["routes"] = routes
+        for key in ('usdc_path', 'direct_pools', 'split_route', 'networks'):
+            if key in data:
+                projected[key] = data[key]
+        return projected
+
+    def response(self, raw_response: Any, stage: str = 'format') -> str:
+        """Handler output for the format prompt"""
+        if isinstance(raw_response, dict) and isinstance(raw_response.get('data'), dict):
+            projected = {
+                "success": raw_response.get('success'),
+                "error": raw_response.get('error'),
+                **self._project_quote(raw_response['data']),
+            }
+            text = json.dumps(projected, separators=(',', ':'), default=str)
+        elif isinstance(raw_response, str):
+            text = raw_response
+        else:
+            text = json.dumps(raw_response, separators=(',', ':'), default=str)
+        text = self._fit_text(stage, text)
+        return self._record(stage, text, lambda: json.dumps(raw_response, indent=2, default=str))
+
+    def stats(self) -> Dict[str, Any]:
+        """Tokens per stage and savings measured on the sampled calls"""
+        report = {"exact_token_counts": self.counter.exact}
+        for stage, stats in self._stats.items():
+            legacy = stats["sampled_legacy_tokens"]
+            report[stage] = {
+                "calls": stats["calls"],
+                "avg_tokens": stats["tokens"] / stats["calls"],
+                "avg_legacy_tokens": legacy / stats["sampled"] if stats["sampled"] else None,
+                "saved_pct": round(100 * (1 - stats["sampled_tokens"] / legacy), 1) if legacy else None,
+            }
+        return report
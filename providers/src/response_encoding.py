@@ -0,0 +1,165 @@
+import json
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+try:
+    import orjson
+except ImportError:  # optional, falls back to the standard library encoder
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # optional, MessagePack is only offered when installed
+    msgpack = None
+
+JSON_MEDIA_TYPE = 'application/json'
+OCTET_STREAM_MEDIA_TYPE = 'application/octet-stream'
+MSGPACK_MEDIA_TYPES = ('application/msgpack', 'application/x-msgpack')
+
+
+def _default(value: Any) -> Any:
+    """Types the JSON encoders do not handle natively"""
+    if isinstance(value, (bytes, bytearray)):
+        return "0x" + bytes(value).hex()
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    if hasattr(value, 'tolist'):  # numpy scalars and arrays
+        return value.tolist()
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+# Integers orjson and MessagePack encode natively (int64 and uint64)
+_MIN_NATIVE_INT = -2 ** 63
+_MAX_NATIVE_INT = 2 ** 64 - 1
+
+
+def wide_ints_to_str(content: Any) -> Any:
+    """Copy of `content` with integers outside int64/uint64 (UINT256 wei amounts) as decimal strings"""
+    if isinstance(content, bool):
+        return content
+    if isinstance(content, int):
+        return str(content) if not _MIN_NATIVE_INT <= content <= _MAX_NATIVE_INT else content
+    if isinstance(content, dict):
+        return {key: wide_ints_to_str(value) for key, value in content.items()}
+    if isinstance(content, (list, tuple)):
+        return [wide_ints_to_str(value) for value in content]
+    return content
+
+
+def _dumps_stdlib(content: Any) -> bytes:
+    return json.dumps(content, default=_default, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+    def dumps_json(content: Any) -> bytes:
+        try:
+            return orjson.dumps(content, default=_default, option=_ORJSON_OPTIONS)
+        except TypeError:
+            # orjson rejects integers beyond 64 bits without calling `default`;
+            # the standard library writes them as JSON numbers
+            return _dumps_stdlib(content)
+else:
+    dumps_json = _dumps_stdlib
+
+
+def dumps_msgpack(content: Any) -> bytes:
+    """MessagePack encoding, bytes values stay binary and integers beyond 64 bits become decimal strings"""
+    try:
+        return msgpack.packb(content, default=_default, use_bin_type=True)
+    except (OverflowError, TypeError):
+        return msgpack.packb(wide_ints_to_str(content), default=_default, use_bin_type=True)
+
+
+def to_payload(result: Any) -> Dict[str, Any]:
+    """Response body of a pipeline result, bytes values are left for the encoder"""
+    if isinstance(result, dict):
+        return result
+    # Legacy results of handlers that do not return {"explanation", "value"} yet
+    if isinstance(result, tuple):
+        return {"result": {"message": result[0], "success": result[1]}}
+    return {"result": result}
+
+
+def _parse_accept(accept: str) -> List[Tuple[str, float]]:
+    """Media types of an Accept header with their quality, best first"""
+    ranges = []
+    for position, part in enumerate(accept.split(',')):
+        media_type, _, params = part.strip().partition(';')
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if media_type and quality > 0:
+            ranges.append((media_type.strip().lower(), quality, position))
+    ranges.sort(key=lambda entry: (-entry[1], entry[2]))
+    return [(media_type, quality) for media_type, quality, _ in ranges]
+
+
+def offered_media_types(binary: bool = False) -> Sequence[str]:
+    offered = [JSON_MEDIA_TYPE]
+    if msgpack is not None:
+        offered.extend(MSGPACK_MEDIA_TYPES)
+    if binary:
+        offered.append(OCTET_STREAM_MEDIA_TYPE)
+    return offered
+
+
+def negotiate(accept: Optional[str], binary: bool = False) -> str:
+    """
+    Best media type of the Accept header we can produce, JSON when none matches
+
+    Args:
+        accept: Accept header of the request
+        binary: The result is a BYTES value, which can be sent as application/octet-stream
+    """
+    if not accept:
+        return JSON_MEDIA_TYPE
+    offered = offered_media_types(binary)
+    for media_type, _ in _parse_accept(accept):
+        if media_type in offered:
+            return media_type
+        if media_type in ('*/*', 'application/*'):
+            return JSON_MEDIA_TYPE
+    return JSON_MEDIA_TYPE
+
+
+def raw_bytes(value: Any) -> Optional[bytes]:
+    """BYTES value as raw bytes, None when it is not a byte string"""
+    if isinstance(value, (bytes, bytearray)):
+        return bytes(value)
+    if isinstance(value, str):
+        hex_value = value[2:] if value[:2] in ('0x', '0X') else value
+        try:
+            return bytes.fromhex(hex_value)
+        except ValueError:
+            return None
+    return None
+
+
+def encode(result: Any, media_type: str) -> Tuple[bytes, str]:
+    """
+    Render a pipeline result in the negotiated media type
+
+    application/octet-stream returns the BYTES value alone; a value that is
+    not a byte string falls back to JSON.
+
+    Returns:
+        Body and its media type
+    """
+    if media_type == OCTET_STREAM_MEDIA_TYPE:
+        value = raw_bytes(result.get('value') if isinstance(result, dict) else result)
+        if value is not None:
+            return value, OCTET_STREAM_MEDIA_TYPE
+        media_type = JSON_MEDIA_TYPE
+    payload = to_payload(result)
+    if media_type in MSGPACK_MEDIA_TYPES and msgpack is not None:
+        return dumps_msgpack(payload), media_type
+    return dumps_json(payload), JSON_MEDIA_TYPE
@@ -0,0 +1,213 @@
+import json
+import os
+import sqlite3
+import time
+from typing import Any, Dict, Iterator, NamedTuple, Optional
+
+# Submission states of a stored result
+COMPUTED = 'computed'
+SUBMITTED = 'submitted'
+CONFIRMED = 'confirmed'
+FAILED = 'failed'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    request_id TEXT PRIMARY KEY,
+    block_number INTEGER NOT NULL,
+    request TEXT NOT NULL,
+    output_type_id INTEGER NOT NULL,
+    response BLOB NOT NULL,
+    snapshot_version INTEGER,
+    status TEXT NOT NULL,
+    tx_hash TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_status ON results (status, updated_at);
+"""
+
+
+def _encode(value: Any) -> Any:
+    if isinstance(value, (bytes, bytearray)):
+        return {"__bytes__": bytes(value).hex()}
+    if isinstance(value, dict):
+        return {key: _encode(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_encode(item) for item in value]
+    return value
+
+
+def _decode(value: Any) -> Any:
+    if isinstance(value, dict):
+        if set(value) == {"__bytes__"}:
+            return bytes.fromhex(value["__bytes__"])
+        return {key: _decode(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_decode(item) for item in value]
+    return value
+
+
+class StoredResult(NamedTuple):
+    """A computed response and where its fulfillment stands"""
+    request_id: int
+    request: Dict[str, Any]      # DataRequest fields
+    output_type_id: int
+    result: Any                  # provider result as returned by handle_request
+    snapshot_version: Optional[int]
+    status: str
+    tx_hash: Optional[str]
+    attempts: int
+    error: Optional[str]
+    updated_at: float
+
+
+class ResultStore:
+    """
+    Durable record of computed ADCS responses keyed by requestId
+
+    Lets a restarted oracle resubmit what it already computed instead of
+    running the LLM / GraphQL / quote pipeline again. Backed by SQLite in WAL
+    mode; every write is a single short transaction so it runs inline on the
+    event loop. Rows older than the retention window are dropped by compact().
+    """
+
+    def __init__(self, path: str = './adcs_results.sqlite3', retention_seconds: float = 7 * 86400, compact_interval: float = 3600.0):
+        self.path = path
+        self.retention_seconds = retention_seconds
+        self.compact_interval = compact_interval
+        self._compacted_at = 0.0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(path, isolation_level=None)
+        self.connection.row_factory = sqlite3.Row
+        # auto_vacuum only applies if set before the first table is created
+        self.connection.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute("PRAGMA synchronous = NORMAL")
+        self.connection.executescript(_SCHEMA)
+
+    @classmethod
+    def from_env(cls) -> 'ResultStore':
+        return cls(
+            path=os.getenv('ADCS_RESULT_STORE_PATH', './adcs_results.sqlite3'),
+            retention_seconds=float(os.getenv('ADCS_RESULT_RETENTION_DAYS', '7')) * 86400
+        )
+
+    @staticmethod
+    def _row_to_result(row: sqlite3.Row) -> StoredResult:
+        return StoredResult(
+            request_id=int(row['request_id']),
+            request=_decode(json.loads(row['request'])),
+            output_type_id=row['output_type_id'],
+            result=_decode(json.loads(row['response'])),
+            snapshot_version=row['snapshot_version'],
+            status=row['status'],
+            tx_hash=row['tx_hash'],
+            attempts=row['attempts'],
+            error=row['error'],
+            updated_at=row['updated_at']
+        )
+
+    def save(self, request: NamedTuple, output_type_id: int, result: Any, snapshot_version: Optional[int] = None) -> None:
+        """
+        Store the computed result of a request (status COMPUTED)
+
+        Args:
+            request: DataRequest the result answers
+            output_type_id: OutputType value the result was formatted for
+            result: Value returned by handle_request
+            snapshot_version: Version of the pool snapshot the answer was computed from
+        """
+        now = time.time()
+        self.connection.execute(
+            "INSERT OR REPLACE INTO results (request_id, block_number, request, output_type_id, response, "
+            "snapshot_version, status, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                str(request.request_id), request.block_number,
+                json.dumps(_encode(request._asdict())), output_type_id,
+                json.dumps(_encode(result)).encode('utf-8'),
+                snapshot_version, COMPUTED, now, now
+            )
+        )
+
+    def get(self, request_id: int) -> Optional[StoredResult]:
+        row = self.connection.execute("SELECT * FROM results WHERE request_id = ?", (str(request_id),)).fetchone()
+        return self._row_to_result(row) if row else None
+
+    def _set_status(self, request_id: int, status: str, **fields) -> None:
+        assignments = ''.join(f", {name} = :{name}" for name in fields)
+        self.connection.execute(
+            f"UPDATE results SET status = :status, updated_at = :now{assignments} WHERE request_id = :request_id",
+            {"status": status, "now": time.time(), "request_id": str(request_id), **fields}
+        )
+
+    def mark_submitted(self, request_id: int, tx_hash: Optional[str] = None) -> None:
+        """Count a submission attempt; tx_hash is the sent transaction, checked before any resubmission"""
+        self.connection.execute(
+            "UPDATE results SET status = ?, tx_hash = ?, error = NULL, attempts = attempts + 1, updated_at = ? WHERE request_id = ?",
+            (SUBMITTED, tx_hash, time.time(), str(request_id))
+        )
+
+    def record_tx_hash(self, request_id: int, tx_hash: str) -> None:
+        """Hash of a replacement transaction of the current attempt"""
+        self.connection.execute(
+            "UPDATE results SET tx_hash = ?, updated_at = ? WHERE request_id = ?",
+            (tx_hash, time.time(), str(request_id))
+        )
+
+    def mark_confirmed(self, request_id: int, tx_hash: Optional[str]) -> None:
+        self._set_status(request_id, CONFIRMED, tx_hash=tx_hash, error=None)
+
+    def mark_failed(self, request_id: int, error: str, attempted: bool = False) -> None:
+        """
+        Record a failed fulfillment
+
+        Args:
+            attempted: The failure happened before mark_submitted counted the attempt
+        """
+        if attempted:
+            self.connection.execute(
+                "UPDATE results SET status = ?, error = ?, attempts = attempts + 1, updated_at = ? WHERE request_id = ?",
+                (FAILED, error, time.time(), str(request_id))
+            )
+        else:
+            self._set_status(request_id, FAILED, error=error)
+
+    def unfinished(self, max_attempts: int = 3) -> Iterator[StoredResult]:
+        """Results not confirmed yet (computed, sent or failed) with attempts left, oldest request first"""
+        rows = self.connection.execute(
+            "SELECT * FROM results WHERE status IN (?, ?, ?) AND attempts < ? ORDER BY block_number",
+            (COMPUTED, SUBMITTED, FAILED, max_attempts)
+        ).fetchall()
+        for row in rows:
+            yield self._row_to_result(row)
+
+    def compact(self) -> int:
+        """
+        Drop rows older than the retention window and give the space back
+
+        Returns:
+            Number of rows removed
+        """
+        cutoff = time.time() - self.retention_seconds
+        removed = self.connection.execute("DELETE FROM results WHERE updated_at < ?", (cutoff,)).rowcount
+        self.connection.execute("PRAGMA incremental_vacuum")
+        self.connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        self._compacted_at = time.monotonic()
+        return removed
+
+    def maybe_compact(self) -> int:
+        if time.monotonic() - self._compacted_at < self.compact_interval:
+            return 0
+        return self.compact()
+
+    def stats(self) -> Dict[str, int]:
+        rows = self.connection.execute("SELECT status, COUNT(*) FROM results GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    def close(self) -> None:
+        self.connection.close()
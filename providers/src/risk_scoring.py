@@ -0,0 +1,176 @@
+from typing import Any, Dict, List, NamedTuple, Optional
+
+import numpy as np
+from pool_snapshot import PoolSnapshot
+
+SECONDS_PER_YEAR = 365 * 86400
+BPS = 10000
+
+# Annualized volatility assumed for pools without enough history, by fee tier
+DEFAULT_VOLATILITY = {100: 0.03, 500: 0.5, 3000: 0.8, 10000: 1.2}
+
+# Typical position range width of each fee tier expressed as IL amplification
+# of a concentrated position over a full-range one
+RANGE_AMPLIFICATION = {100: 4.0, 500: 3.0, 3000: 2.0, 10000: 1.5}
+
+# Pools shallower than this start paying a depth penalty (exit slippage)
+REFERENCE_TVL = 1_000_000.0
+DEPTH_PENALTY_BPS_PER_DECADE = 250.0
+
+# Gauss-Hermite nodes for the expectation of IL over a lognormal price move
+_HERMITE_NODES, _HERMITE_WEIGHTS = np.polynomial.hermite_e.hermegauss(24)
+_HERMITE_WEIGHTS = _HERMITE_WEIGHTS / _HERMITE_WEIGHTS.sum()
+
+
+class PoolRiskScores(NamedTuple):
+    """Per-pool risk metrics, every array aligned with the snapshot rows"""
+    volatility: np.ndarray       # annualized price volatility
+    expected_il: np.ndarray      # expected impermanent loss over one year, fraction
+    apr_bps: np.ndarray          # fee APR in basis points
+    risk_bps: np.ndarray         # risk score in basis points (uint16 range)
+    score_bps: np.ndarray        # risk-adjusted return, apr_bps - risk_bps
+
+
+def realized_volatility(prices: np.ndarray, sample_interval: float) -> np.ndarray:
+    """
+    Annualized volatility of every column of a (time x pool) price matrix
+
+    Missing samples (NaN) are skipped, columns with fewer than two returns
+    give NaN.
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = np.diff(np.log(prices), axis=0)
+    valid = np.isfinite(returns)
+    counts = valid.sum(axis=0)
+    returns = np.where(valid, returns, 0.0)
+    mean = returns.sum(axis=0) / np.maximum(counts, 1)
+    variance = (np.where(valid, returns - mean, 0.0) ** 2).sum(axis=0) / np.maximum(counts - 1, 1)
+    volatility = np.sqrt(variance * SECONDS_PER_YEAR / sample_interval)
+    return np.where(counts >= 2, volatility, np.nan)
+
+
+def expected_impermanent_loss(volatility: np.ndarray, horizon_years: float = 1.0) -> np.ndarray:
+    """
+    Expected IL of a full-range 50/50 position for lognormal prices
+
+    IL(k) = 2 sqrt(k) / (1 + k) - 1 for a price ratio k, averaged over
+    k = exp(sigma sqrt(T) z - sigma^2 T / 2) with z standard normal.
+    """
+    sigma_t = np.asarray(volatility)[..., None] * np.sqrt(horizon_years)
+    ratio = np.exp(sigma_t * _HERMITE_NODES - sigma_t ** 2 / 2)
+    loss = 1 - 2 * np.sqrt(ratio) / (1 + ratio)
+    return loss @ _HERMITE_WEIGHTS
+
+
+def _by_fee_tier(fee_tier: np.ndarray, table: Dict[int, float], default: float) -> np.ndarray:
+    tiers = np.array(sorted(table))
+    values = np.array([table[tier] for tier in tiers])
+    position = np.searchsorted(tiers, fee_tier)
+    exact = (position < len(tiers)) & (tiers[np.minimum(position, len(tiers) - 1)] == fee_tier)
+    return np.where(exact, values[np.minimum(position, len(tiers) - 1)], default)
+
+
+def compute_risk_scores(
+    fee_tier: np.ndarray,
+    tvl: np.ndarray,
+    volume_24h: np.ndarray,
+    volatility: Optional[np.ndarray] = None,
+) -> PoolRiskScores:
+    """
+    Score every pool in one vectorized pass
+
+    Args:
+        fee_tier: Fee tier in hundredths of a bip (500 = 0.05%)
+        tvl: Pool TVL in USD
+        volume_24h: 24h volume in USD
+        volatility: Annualized price volatility, NaN where unknown
+
+    Returns:
+        PoolRiskScores aligned with the inputs
+    """
+    fee_tier = np.asarray(fee_tier, dtype=np.int64)
+    tvl = np.asarray(tvl, dtype=np.float64)
+    volume_24h = np.asarray(volume_24h, dtype=np.float64)
+
+    fallback = _by_fee_tier(fee_tier, DEFAULT_VOLATILITY, DEFAULT_VOLATILITY[3000])
+    if volatility is None:
+        volatility = fallback
+    else:
+        volatility = np.where(np.isfinite(volatility), volatility, fallback)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        apr = np.where(tvl > 0, volume_24h * fee_tier / 1e6 * 365 / tvl, 0.0)
+        depth_penalty = np.clip(np.log10(REFERENCE_TVL / np.maximum(tvl, 1.0)), 0, None) * DEPTH_PENALTY_BPS_PER_DECADE
+
+    expected_il = expected_impermanent_loss(volatility) * _by_fee_tier(fee_tier, RANGE_AMPLIFICATION, 1.0)
+    apr_bps = np.clip(np.round(apr * BPS), 0, np.iinfo(np.uint16).max)
+    risk_bps = np.clip(np.round(expected_il * BPS + depth_penalty), 0, BPS)
+
+    return PoolRiskScores(
+        volatility=volatility,
+        expected_il=expected_il,
+        apr_bps=apr_bps.astype(np.uint16),
+        risk_bps=risk_bps.astype(np.uint16),
+        score_bps=apr_bps - risk_bps,
+    )
+
+
+def score_snapshot(snapshot: PoolSnapshot, volatility: Optional[np.ndarray] = None) -> PoolRiskScores:
+    """compute_risk_scores over the columns of a snapshot (zero-copy views)"""
+    return compute_risk_scores(
+        np.frombuffer(snapshot.fee_tier, dtype=np.uint32),
+        np.frombuffer(snapshot.tvl, dtype=np.float64),
+        np.frombuffer(snapshot.volume_24h, dtype=np.float64),
+        volatility
+    )
+
+
+def snapshot_volatility(
+    snapshot: PoolSnapshot,
+    timestamps: np.ndarray,
+    addresses: List[str],
+    prices: np.ndarray
+) -> np.ndarray:
+    """
+    Realized volatility aligned with the rows of a snapshot
+
+    Prices must be pool prices (the 'price' metric, from the on-chain tick),
+    not USD TVL: liquidity deposits and withdrawals would count as price moves.
+
+    Args:
+        snapshot: Snapshot whose rows the result is aligned with
+        timestamps, addresses, prices: Output of PoolTimeSeriesStore.read_matrix(..., 'price')
+    """
+    volatility = np.full(len(snapshot), np.nan)
+    if len(timestamps) < 3:
+        return volatility
+
+    sample_interval = float(np.median(np.diff(timestamps)))
+    history_volatility = realized_volatility(prices, sample_interval)
+    for column, address in enumerate(addresses):
+        row = snapshot.index_of(address)
+        if row is not None:
+            volatility[row] = history_volatility[column]
+    return volatility
+
+
+def rank_farming_suggestions(snapshot: PoolSnapshot, scores: PoolRiskScores, top_n: int = 5, min_tvl: float = 0.0) -> List[Dict[str, Any]]:
+    """
+    Best pools by risk-adjusted return, in InfoSuggestPool field names
+
+    Returns:
+        [{"name", "addr", "apr", "risk", "score"}] ordered best first
+    """
+    eligible = np.flatnonzero(np.frombuffer(snapshot.tvl, dtype=np.float64) >= min_tvl)
+    order = eligible[np.argsort(-scores.score_bps[eligible], kind='stable')][:top_n]
+    suggestions = []
+    for index in order:
+        row = snapshot.row(int(index))
+        suggestions.append({
+            "name": f"{row.token0_symbol}-{row.token1_symbol} {row.fee_tier / 10000:g}%",
+            "addr": row.address,
+            "apr": int(scores.apr_bps[index]),
+            "risk": int(scores.risk_bps[index]),
+            "score": int(scores.score_bps[index]),
+        })
+    return suggestions
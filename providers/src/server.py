@@ -1,21 +1,47 @@
 import asyncio
+import os
+import secrets
+import time
 from typing import Any, Dict, Optional, Union
 
 import uvicorn
 from adapter_interface import AdapterInterface, AdapterRequest
-from fastapi import FastAPI, HTTPException
+from admission import ORACLE, QUERY, AdmissionController, AdmissionRejected
+from concurrency import EventLoopLagMonitor
+from fastapi import FastAPI, Header, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
+from profiler import SamplingProfiler, format_server_timing, start_stage_profile
 from pydantic import BaseModel
+from response_encoding import dumps_json, encode, negotiate
 from uniswap_provider import OutputType
 
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered with orjson when installed"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps_json(content)
+
+
 app = FastAPI(
     title="Uniswap Provider API",
     description="API for interacting with Uniswap pools and swaps",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=FastJSONResponse
 )
 
 # Store the adapter interface instance
 adapter: Optional[AdapterInterface] = None
 
+# Shared sampling profiler for the admin endpoint
+profiler = SamplingProfiler()
+
+# Report event loop stalls longer than LOOP_LAG_THRESHOLD_MS
+loop_monitor = EventLoopLagMonitor(threshold=float(os.getenv('LOOP_LAG_THRESHOLD_MS', '100')) / 1000)
+
+# Priority admission of /query, oracle requests ahead of ad-hoc queries
+admission = AdmissionController.from_env()
+
 class QueryRequest(BaseModel):
     network: str
     output_type_id: int
@@ -29,6 +55,7 @@ class QueryRequest(BaseModel):
 async def startup_event():
     """Initialize the adapter when the server starts"""
     global adapter
+    loop_monitor.start()
     adapter = await AdapterInterface().initialize()
 
 @app.on_event("shutdown")
@@ -37,6 +64,35 @@ async def shutdown_event():
     global adapter
     if adapter:
         await adapter.close()
+    await loop_monitor.stop()
+
+@app.middleware("http")
+async def stage_profile_middleware(request: Request, call_next):
+    """Attach a Server-Timing stage breakdown when the client sends X-Profile: 1"""
+    if request.headers.get("x-profile") != "1":
+        return await call_next(request)
+
+    timings = start_stage_profile()
+    start = time.perf_counter()
+    response = await call_next(request)
+    timings["total"] = (time.perf_counter() - start) * 1000
+    response.headers["Server-Timing"] = format_server_timing(timings)
+    return response
+
+def require_admin(token: Optional[str]):
+    """Check the admin token, admin endpoints are disabled when ADMIN_API_TOKEN is unset"""
+    expected = os.getenv('ADMIN_API_TOKEN')
+    if not expected:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not token or not secrets.compare_digest(token, expected):
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+def request_class(oracle_token: Optional[str]) -> str:
+    """Oracle nodes identify themselves with ORACLE_API_TOKEN, everything else is an ad-hoc query"""
+    expected = os.getenv('ORACLE_API_TOKEN')
+    if expected and oracle_token and secrets.compare_digest(oracle_token, expected):
+        return ORACLE
+    return QUERY
 
 @app.get("/")
 async def root():
@@ -44,16 +100,36 @@ async def root():
     return {"status": "ok", "service": "Uniswap Provider API"}
 
 @app.post("/query")
-async def query(request: QueryRequest):
+async def query(
+    request: QueryRequest,
+    accept: Optional[str] = Header(None),
+    x_oracle_token: Optional[str] = Header(None)
+):
     """
     Process a query request
     
     Args:
         request: QueryRequest object containing the query parameters
+        accept: application/json (default), application/msgpack when msgpack is
+            installed, or application/octet-stream for the raw value of BYTES results
+        x_oracle_token: Puts the request in the oracle priority class when it matches ORACLE_API_TOKEN
         
     Returns:
         The processed result based on the output type
     """
+    priority_class = request_class(x_oracle_token)
+    try:
+        async with admission.slot(priority_class):
+            result = await process_query(request)
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail, headers={"Retry-After": str(e.retry_after)})
+
+    # Encoded directly, bytes values become 0x-prefixed hex in JSON and stay binary otherwise
+    body, media_type = encode(result, negotiate(accept, binary=request.output_type_id == OutputType.BYTES.value))
+    return Response(body, media_type=media_type)
+
+async def process_query(request: QueryRequest) -> Any:
+    """Run an admitted query through the adapter"""
     try:
         if not adapter:
             raise HTTPException(status_code=503, detail="Service not initialized")
@@ -70,25 +146,13 @@ async def query(request: QueryRequest):
         )
 
         # Process the request
+        started_at = time.time()
+        start = time.perf_counter()
         result = await adapter.process_request(adapter_request)
-        
-        # Format the response based on the result type
-        if isinstance(result, dict):
-            # Handle the new format with explanation and value
-            if isinstance(result["value"], bytes):
-                # Convert bytes to hex string with 0x prefix
-                result["value"] = "0x" + result["value"].hex()
-            return result
-        else:
-            # Handle legacy format (should be removed once all code is updated)
-            if isinstance(result, bytes):
-                return {"result": "0x" + result.hex()}
-            elif isinstance(result, (bool, int)):
-                return {"result": result}
-            elif isinstance(result, tuple):
-                return {"result": {"message": result[0], "success": result[1]}}
-            else:
-                return {"result": result}
+        adapter.agent.traffic.record_inbound(
+            request.dict(), result, started_at, time.perf_counter() - start
+        )
+        return result
 
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -122,6 +186,71 @@ async def get_output_types():
         ]
     }
 
+@app.get("/admin/profile", response_class=PlainTextResponse)
+async def admin_profile(
+    seconds: float = Query(10.0, gt=0, le=300),
+    interval_ms: float = Query(5.0, ge=1, le=1000),
+    x_admin_token: Optional[str] = Header(None)
+):
+    """
+    Sample every thread for the given duration
+    
+    Returns:
+        Collapsed stacks ("frame;frame;frame count" per line) for flamegraph tools
+    """
+    require_admin(x_admin_token)
+    try:
+        # Sample from a worker thread so in-flight requests keep running on the loop;
+        # the session is claimed inside sample(), so concurrent calls cannot both start
+        stacks = await asyncio.to_thread(profiler.sample, seconds, interval_ms / 1000)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return profiler.collapse(stacks)
+
+@app.get("/admin/event_loop")
+async def admin_event_loop(x_admin_token: Optional[str] = Header(None)):
+    """Event loop stall statistics"""
+    require_admin(x_admin_token)
+    return loop_monitor.stats()
+
+@app.get("/admin/admission")
+async def admin_admission(x_admin_token: Optional[str] = Header(None)):
+    """Queue depth, in-flight requests, rejections and queue wait percentiles per priority class"""
+    require_admin(x_admin_token)
+    return admission.stats()
+
+@app.get("/admin/graphql")
+async def admin_graphql(x_admin_token: Optional[str] = Header(None)):
+    """Bytes on the wire, decoded bytes and parse time per GraphQL query variant"""
+    require_admin(x_admin_token)
+    if not adapter:
+        raise HTTPException(status_code=503, detail="Service not initialized")
+    return adapter.agent.graphql.stats()
+
+@app.get("/admin/llm")
+async def admin_llm(x_admin_token: Optional[str] = Header(None)):
+    """LLM latency percentiles, hedges and models per pipeline stage"""
+    require_admin(x_admin_token)
+    if not adapter:
+        raise HTTPException(status_code=503, detail="Service not initialized")
+    return adapter.agent.llm_router.stats()
+
+@app.get("/admin/speculation")
+async def admin_speculation(x_admin_token: Optional[str] = Header(None)):
+    """Speculative stage execution: claimed vs wasted work, deadline misses"""
+    require_admin(x_admin_token)
+    if not adapter:
+        raise HTTPException(status_code=503, detail="Service not initialized")
+    return adapter.agent.speculation.stats()
+
+@app.get("/admin/prompt_context")
+async def admin_prompt_context(x_admin_token: Optional[str] = Header(None)):
+    """Prompt context tokens per stage and savings over the former JSON context"""
+    require_admin(x_admin_token)
+    if not adapter:
+        raise HTTPException(status_code=503, detail="Service not initialized")
+    return adapter.agent.context_serializer.stats()
+
 def start_server():
     """Start the FastAPI server"""
     uvicorn.run(
@@ -0,0 +1,118 @@
+import asyncio
+import os
+import time
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+# Speculative tasks of the request being handled, by name
+_scope: ContextVar[Optional[Dict[str, 'SpeculativeTask']]] = ContextVar('_speculation_scope', default=None)
+
+DEFAULT_DEADLINES = {
+    'intent': 15.0,
+    'handler': 45.0,
+    'format': 30.0,
+}
+
+
+class SpeculativeTask:
+    """A stage started before the intent is known"""
+
+    __slots__ = ('name', 'task', 'started_at', 'finished_at', 'claimed')
+
+    def __init__(self, name: str, task: asyncio.Task):
+        self.name = name
+        self.task = task
+        self.started_at = time.perf_counter()
+        self.finished_at: Optional[float] = None
+        self.claimed = False
+        task.add_done_callback(self._finished)
+
+    def _finished(self, _) -> None:
+        self.finished_at = time.perf_counter()
+
+
+class SpeculativeExecutor:
+    """
+    Run likely stages concurrently with intent classification
+
+    A request opens a scope, starts the work its most likely handlers will
+    need (start) and classifies the intent meanwhile. The handler that runs
+    claims the results it needs (claim), awaiting a speculative task when
+    there is one and running the work itself otherwise. Closing the scope
+    cancels what nobody claimed and accounts it as wasted work.
+
+    Every stage also gets a deadline (STAGE_DEADLINE_<STAGE> seconds).
+    """
+
+    def __init__(self, deadlines: Optional[Dict[str, float]] = None):
+        self.deadlines = {**DEFAULT_DEADLINES, **(deadlines or {})}
+        self.counters = {
+            "started": 0, "claimed": 0, "wasted": 0, "cancelled": 0,
+            "head_start_seconds": 0.0, "wasted_seconds": 0.0, "deadline_exceeded": 0,
+        }
+        self.wasted_by_name: Dict[str, int] = {}
+
+    @classmethod
+    def from_env(cls) -> 'SpeculativeExecutor':
+        return cls({
+            stage: float(os.getenv(f"STAGE_DEADLINE_{stage.upper()}", deadline))
+            for stage, deadline in DEFAULT_DEADLINES.items()
+        })
+
+    def open_scope(self):
+        """Start a request scope, returns the token for close_scope"""
+        return _scope.set({})
+
+    def start(self, name: str, work: Callable[[], Awaitable[Any]]) -> None:
+        """Start speculative work in the current scope"""
+        scope = _scope.get()
+        if scope is None or name in scope:
+            return
+        scope[name] = SpeculativeTask(name, asyncio.create_task(work()))
+        self.counters["started"] += 1
+
+    async def claim(self, name: str, work: Callable[[], Awaitable[Any]]) -> Any:
+        """Result of the speculative task `name`, or of work() when there is none"""
+        scope = _scope.get()
+        speculative = scope.get(name) if scope else None
+        if speculative is None or speculative.claimed:
+            return await work()
+        speculative.claimed = True
+        self.counters["claimed"] += 1
+        # How long the work ran before anyone needed it
+        self.counters["head_start_seconds"] += time.perf_counter() - speculative.started_at
+        return await speculative.task
+
+    async def run_stage(self, stage: str, work: Awaitable[Any]) -> Any:
+        """Await a stage under its deadline"""
+        try:
+            return await asyncio.wait_for(work, timeout=self.deadlines.get(stage))
+        except asyncio.TimeoutError:
+            self.counters["deadline_exceeded"] += 1
+            raise TimeoutError(f"Stage '{stage}' exceeded its {self.deadlines.get(stage)}s deadline")
+
+    def close_scope(self, token) -> None:
+        """Cancel unclaimed speculative work and account it as wasted"""
+        scope = _scope.get()
+        _scope.reset(token)
+        for speculative in (scope or {}).values():
+            if speculative.claimed:
+                continue
+            self.counters["wasted"] += 1
+            self.counters["wasted_seconds"] += (speculative.finished_at or time.perf_counter()) - speculative.started_at
+            self.wasted_by_name[speculative.name] = self.wasted_by_name.get(speculative.name, 0) + 1
+            if not speculative.task.done():
+                speculative.task.cancel()
+                self.counters["cancelled"] += 1
+            elif not speculative.task.cancelled():
+                # Retrieve the outcome so a failed speculation is not reported as unhandled
+                speculative.task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        started = self.counters["started"]
+        return {
+            **self.counters,
+            "waste_ratio": self.counters["wasted"] / started if started else 0.0,
+            "wasted_by_name": dict(self.wasted_by_name),
+            "deadlines": dict(self.deadlines),
+        }
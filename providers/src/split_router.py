@@ -0,0 +1,165 @@
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from multicall_reader import PoolState
+from path_table import encode_path
+from pool_snapshot import PoolSnapshot
+
+# A hop through a pool: (snapshot row, zero_for_one)
+Hop = Tuple[int, bool]
+
+
+class RouteSplit(NamedTuple):
+    """Share of the input sent through one route"""
+    tokens: Tuple[str, ...]
+    pools: Tuple[str, ...]
+    path: bytes            # Uniswap V3 exactInput path
+    amount_in: int
+    amount_out: int
+    share: float
+
+
+class SplitQuote(NamedTuple):
+    """Best allocation of an input amount over candidate routes"""
+    amount_in: int
+    amount_out: int
+    splits: List[RouteSplit]
+    single_route_out: int  # output of the best route taking the whole amount
+    improvement_bps: float
+    solve_ms: float
+
+
+def _swap(reserves: Dict[int, List[float]], fees: Dict[int, float], hop: Hop, amount: float, commit: bool) -> float:
+    """Constant-product swap on the in-range virtual reserves of a pool"""
+    pool, zero_for_one = hop
+    reserve = reserves[pool]
+    reserve_in, reserve_out = (reserve[0], reserve[1]) if zero_for_one else (reserve[1], reserve[0])
+    amount_after_fee = amount * (1.0 - fees[pool])
+    amount_out = reserve_out * amount_after_fee / (reserve_in + amount_after_fee)
+    if commit:
+        if zero_for_one:
+            reserve[0], reserve[1] = reserve_in + amount_after_fee, reserve_out - amount_out
+        else:
+            reserve[1], reserve[0] = reserve_in + amount_after_fee, reserve_out - amount_out
+    return amount_out
+
+
+def _route_output(reserves: Dict[int, List[float]], fees: Dict[int, float], route: List[Hop], amount: float, commit: bool = False) -> float:
+    for hop in route:
+        amount = _swap(reserves, fees, hop, amount, commit)
+    return amount
+
+
+class SplitRouter:
+    """
+    Allocate a swap over several routes of the pool graph to maximize output
+
+    Every pool is modelled by the virtual reserves of its current in-range
+    liquidity (x = L / sqrtP, y = L * sqrtP), i.e. price impact until the next
+    initialized tick. The input is handed out in `steps` equal chunks, each to
+    the route with the best marginal output given the reserves already moved,
+    so routes sharing a pool are priced correctly. With concave route outputs
+    this converges to the equal-marginal-price optimum.
+    """
+
+    def __init__(self, snapshot: PoolSnapshot, state: PoolState, edges_per_token: int = 6):
+        if state.snapshot_version != snapshot.version:
+            raise ValueError("Pool state was read for a different snapshot")
+        self.snapshot = snapshot
+        self.reserves: Dict[int, List[float]] = {}
+        self.fees: Dict[int, float] = {}
+        self.adjacency: Dict[int, List[Tuple[int, bool, int]]] = {}
+
+        for index in range(len(snapshot)):
+            if not state.ok[index] or state.liquidity[index] <= 0 or state.sqrt_price[index] <= 0:
+                continue
+            liquidity, sqrt_price = state.liquidity[index], state.sqrt_price[index]
+            self.reserves[index] = [liquidity / sqrt_price, liquidity * sqrt_price]
+            self.fees[index] = snapshot.fee_tier[index] / 1e6
+            token0, token1 = snapshot.token0[index], snapshot.token1[index]
+            self.adjacency.setdefault(token0, []).append((index, True, token1))
+            self.adjacency.setdefault(token1, []).append((index, False, token0))
+
+        # Deepest pools first, only those take part in candidate routes
+        for token, edges in self.adjacency.items():
+            edges.sort(key=lambda edge: -snapshot.tvl[edge[0]])
+            del edges[edges_per_token:]
+
+    def candidate_routes(self, token_in: str, token_out: str, probe_amount: float, max_hops: int = 3, max_routes: int = 8) -> List[List[Hop]]:
+        """Simple paths of up to max_hops pools, best `max_routes` by output for a small amount"""
+        source = self.snapshot.tokens.index_of(token_in)
+        target = self.snapshot.tokens.index_of(token_out)
+        if source is None or target is None:
+            return []
+
+        routes = []
+
+        def walk(token: int, route: List[Hop], visited: set) -> None:
+            if token == target:
+                routes.append(list(route))
+                return
+            if len(route) == max_hops:
+                return
+            for pool, zero_for_one, other in self.adjacency.get(token, ()):
+                if other not in visited:
+                    visited.add(other)
+                    route.append((pool, zero_for_one))
+                    walk(other, route, visited)
+                    route.pop()
+                    visited.discard(other)
+
+        walk(source, [], {source})
+        routes.sort(key=lambda route: -_route_output(self.reserves, self.fees, route, probe_amount))
+        return routes[:max_routes]
+
+    def _describe(self, route: List[Hop]) -> Tuple[Tuple[str, ...], Tuple[str, ...], bytes]:
+        tokens = self.snapshot.tokens.addresses
+        first_pool, zero_for_one = route[0]
+        path_tokens = [tokens[self.snapshot.token0[first_pool] if zero_for_one else self.snapshot.token1[first_pool]]]
+        for pool, zero_for_one in route:
+            path_tokens.append(tokens[self.snapshot.token1[pool] if zero_for_one else self.snapshot.token0[pool]])
+        fees = [self.snapshot.fee_tier[pool] for pool, _ in route]
+        pools = tuple(self.snapshot.pool_addresses[pool] for pool, _ in route)
+        return tuple(path_tokens), pools, encode_path(path_tokens, fees)
+
+    def optimize(self, token_in: str, token_out: str, amount_in: int, steps: int = 100, max_hops: int = 3, max_routes: int = 8) -> Optional[SplitQuote]:
+        """
+        Best split of amount_in (raw token units) from token_in to token_out
+
+        Returns:
+            SplitQuote, or None when no route connects the tokens
+        """
+        started = time.perf_counter()
+        chunk = amount_in / steps
+        routes = self.candidate_routes(token_in, token_out, chunk, max_hops, max_routes)
+        if not routes:
+            return None
+
+        single_route_out = max(_route_output(self.reserves, self.fees, route, amount_in) for route in routes)
+
+        # Work on a copy so the router can be reused for other amounts
+        reserves = {pool: list(self.reserves[pool]) for route in routes for pool, _ in route}
+        allocated = [0.0] * len(routes)
+        output = [0.0] * len(routes)
+        for _ in range(steps):
+            marginal = [_route_output(reserves, self.fees, route, chunk) for route in routes]
+            best = max(range(len(routes)), key=marginal.__getitem__)
+            output[best] += _route_output(reserves, self.fees, routes[best], chunk, commit=True)
+            allocated[best] += chunk
+
+        splits = []
+        for route, route_in, route_out in zip(routes, allocated, output):
+            if route_in > 0:
+                path_tokens, pools, path = self._describe(route)
+                splits.append(RouteSplit(path_tokens, pools, path, int(route_in), int(route_out), route_in / amount_in))
+        splits.sort(key=lambda split: -split.share)
+
+        amount_out = sum(output)
+        return SplitQuote(
+            amount_in=amount_in,
+            amount_out=int(amount_out),
+            splits=splits,
+            single_route_out=int(single_route_out),
+            improvement_bps=(amount_out / single_route_out - 1) * 10000 if single_route_out > 0 else 0.0,
+            solve_ms=(time.perf_counter() - started) * 1000
+        )
@@ -0,0 +1,543 @@
+import bisect
+import os
+import struct
+import threading
+from array import array
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # not on Windows, where a history directory must have a single writer
+    fcntl = None
+
+import numpy as np
+from pool_snapshot import PoolSnapshot
+
+if TYPE_CHECKING:  # multicall_reader needs web3, which reading the history does not
+    from multicall_reader import PoolState
+
+# Every chunk file covers CHUNK_SECONDS of history, named by its start time
+CHUNK_SECONDS = 86400
+_CHUNK_SUFFIX = '.tsc'
+_FRAME_HEADER = struct.Struct('<I')
+
+# Chunks starting with this marker also store the pool tick of every pool;
+# chunks written before it (no marker) only hold TVL, volume and txCount
+_TICKS_MAGIC = b'TSC2'
+
+# Values are stored as integers: USD amounts in cents, ticks shifted by
+# _TICK_OFFSET so that 0 marks a pool without on-chain state
+_CENTS = 100
+_TICK_OFFSET = 887273
+
+# A decoded frame: timestamp, pool ids, tvl cents, volume cents, tx counts, shifted ticks
+Frame = Tuple[float, array, array, array, array, array]
+
+# Frame position of every metric, and its scale back to float
+_METRICS = {'tvl': (2, _CENTS), 'volume_24h': (3, _CENTS), 'tx_count': (4, 1), 'price': (5, None)}
+
+
+def _tick_prices(ticks: np.ndarray) -> np.ndarray:
+    """Pool prices (token1 per token0, raw units) of shifted ticks, NaN where unknown"""
+    with np.errstate(over='ignore'):
+        return np.where(ticks != 0, 1.0001 ** (ticks - _TICK_OFFSET).astype(np.float64), np.nan)
+
+
+def _write_varint(out: bytearray, value: int) -> None:
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data: bytes, offset: int) -> Tuple[int, int]:
+    result = 0
+    shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, offset
+        shift += 7
+
+
+def _zigzag(value: int) -> int:
+    return (value << 1) if value >= 0 else ((-value << 1) - 1)
+
+
+def _unzigzag(value: int) -> int:
+    return (value >> 1) if not value & 1 else -((value + 1) >> 1)
+
+
+class PoolSeries:
+    """Metric history of one pool, one entry per stored snapshot (price is NaN where unknown)"""
+
+    __slots__ = ('timestamps', 'tvl', 'volume_24h', 'tx_count', 'price')
+
+    def __init__(self):
+        self.timestamps = array('d')
+        self.tvl = array('d')
+        self.volume_24h = array('d')
+        self.tx_count = array('q')
+        self.price = array('d')
+
+    def append(self, timestamp: float, tvl: float, volume_24h: float, tx_count: int, price: float = float('nan')) -> None:
+        self.timestamps.append(timestamp)
+        self.tvl.append(tvl)
+        self.volume_24h.append(volume_24h)
+        self.tx_count.append(tx_count)
+        self.price.append(price)
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def downsample(self, interval: float, how: str = 'last') -> 'PoolSeries':
+        """
+        Aggregate samples into buckets of `interval` seconds
+
+        Args:
+            interval: Bucket width in seconds
+            how: 'last' keeps the last sample of each bucket, 'mean' averages them
+        """
+        if how not in ('last', 'mean'):
+            raise ValueError(f"Unsupported downsampling: {how}")
+
+        result = PoolSeries()
+        bucket = None
+        rows = []
+
+        def flush():
+            if not rows:
+                return
+            if how == 'last':
+                result.append(bucket * interval, *rows[-1])
+            else:
+                count = len(rows)
+                result.append(
+                    bucket * interval,
+                    sum(row[0] for row in rows) / count,
+                    sum(row[1] for row in rows) / count,
+                    round(sum(row[2] for row in rows) / count),
+                    sum(row[3] for row in rows) / count
+                )
+
+        for timestamp, *row in zip(self.timestamps, self.tvl, self.volume_24h, self.tx_count, self.price):
+            current = int(timestamp // interval)
+            if current != bucket:
+                flush()
+                bucket = current
+                rows = []
+            rows.append(row)
+        flush()
+        return result
+
+
+class _ChainWriter:
+    """Delta state and decoded frames of the chunk currently being appended to"""
+
+    def __init__(self, chunk_start: int):
+        self.chunk_start = chunk_start
+        self.last_ms = chunk_start * 1000
+        self.previous: Dict[int, Tuple[int, int, int, int]] = {}
+        self.frames: List[Frame] = []
+        self.ticks = True  # False when resuming a chunk of the format without ticks
+        self.size = 0      # chunk file size after this writer's last frame
+
+
+class PoolTimeSeriesStore:
+    """
+    Append-only, delta-encoded history of pool TVL, 24h volume, txCount and price
+
+    Layout, per chain:
+        <root>/<chain>/pools.txt      pool address of every pool id, one per line
+        <root>/<chain>/<start>.tsc    frames of one CHUNK_SECONDS window
+
+    A frame holds one snapshot: the timestamp delta and, for every pool,
+    the pool id delta and the zigzag varint deltas of each metric against the
+    pool's previous value in the same chunk. The price is the pool tick read
+    on-chain (PoolState), recorded when the snapshot is appended with one.
+    Chunks are independent, so the chunk start times double as the time
+    index. Decoded chunks are kept in an LRU cache, keyed by their file size.
+
+    Several processes (server workers, bulk_runner shards) may share a
+    directory: appends hold an exclusive lock on <root>/<chain>/.lock and
+    first catch up with the pool ids and frames other processes wrote; reads
+    hold a shared lock.
+    """
+
+    def __init__(self, root: str, chunk_seconds: int = CHUNK_SECONDS, min_interval: float = 300.0, cache_chunks: int = 64):
+        self.root = root
+        self.chunk_seconds = chunk_seconds
+        self.min_interval = min_interval
+        self.cache_chunks = cache_chunks
+        self._lock = threading.Lock()
+        self._pool_ids: Dict[str, Dict[str, int]] = {}
+        self._pool_addresses: Dict[str, List[str]] = {}
+        self._pools_read: Dict[str, int] = {}
+        self._chunks: Dict[str, List[int]] = {}
+        self._writers: Dict[str, _ChainWriter] = {}
+        self._last_append: Dict[str, float] = {}
+        self._cache: 'OrderedDict[Tuple[str, int], Tuple[int, List[Frame]]]' = OrderedDict()
+
+    @classmethod
+    def from_env(cls) -> 'PoolTimeSeriesStore':
+        return cls(
+            os.getenv('POOL_HISTORY_DIR', './pool_history'),
+            min_interval=float(os.getenv('POOL_HISTORY_MIN_INTERVAL', '300'))
+        )
+
+    def _chain_dir(self, chain: str) -> str:
+        return os.path.join(self.root, chain.lower())
+
+    def _chunk_path(self, chain: str, chunk_start: int) -> str:
+        return os.path.join(self._chain_dir(chain), f"{chunk_start}{_CHUNK_SUFFIX}")
+
+    def _chunk_size(self, chain: str, chunk_start: int) -> int:
+        try:
+            return os.path.getsize(self._chunk_path(chain, chunk_start))
+        except FileNotFoundError:
+            return 0
+
+    @contextmanager
+    def _file_lock(self, chain: str, exclusive: bool) -> Iterator[None]:
+        """Lock the chain directory against the other processes using it"""
+        directory = self._chain_dir(chain)
+        os.makedirs(directory, exist_ok=True)
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(directory, '.lock'), 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _sync_chain(self, chain: str) -> None:
+        """Load the pool ids and chunks of a chain, or catch up with those other processes added"""
+        if chain not in self._pool_ids:
+            self._pool_addresses[chain] = []
+            self._pool_ids[chain] = {}
+            self._pools_read[chain] = 0
+        directory = self._chain_dir(chain)
+
+        pools_path = os.path.join(directory, 'pools.txt')
+        if os.path.exists(pools_path):
+            with open(pools_path, 'rb') as f:
+                f.seek(self._pools_read[chain])
+                data = f.read()
+            complete = data.rfind(b'\n') + 1
+            addresses, ids = self._pool_addresses[chain], self._pool_ids[chain]
+            for line in data[:complete].decode('utf-8').splitlines():
+                address = line.strip()
+                if address:
+                    ids[address] = len(addresses)
+                    addresses.append(address)
+            self._pools_read[chain] += complete
+        self._chunks[chain] = sorted(
+            int(name[:-len(_CHUNK_SUFFIX)]) for name in os.listdir(directory) if name.endswith(_CHUNK_SUFFIX)
+        )
+
+    def _pool_id(self, chain: str, address: str, new_addresses: List[str]) -> int:
+        ids = self._pool_ids[chain]
+        pool_id = ids.get(address)
+        if pool_id is None:
+            pool_id = len(self._pool_addresses[chain])
+            ids[address] = pool_id
+            self._pool_addresses[chain].append(address)
+            new_addresses.append(address)
+        return pool_id
+
+    def _decode_chunk(
+        self,
+        chain: str,
+        chunk_start: int,
+        state: Optional[Dict[int, Tuple[int, int, int, int]]] = None,
+        repair: bool = False
+    ) -> Tuple[List[Frame], bool]:
+        """
+        Decode a chunk into frames, leaving the last value of every pool in `state`
+
+        With repair=True a torn frame at the end of the file (crash during a
+        write) is truncated so that new frames can be appended after it.
+
+        Returns:
+            The frames, and whether the chunk stores ticks
+        """
+        path = self._chunk_path(chain, chunk_start)
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        frames = []
+        state = {} if state is None else state
+        last_ms = chunk_start * 1000
+        ticks = data[:len(_TICKS_MAGIC)] == _TICKS_MAGIC
+        offset = len(_TICKS_MAGIC) if ticks else 0
+        while offset + _FRAME_HEADER.size <= len(data):
+            (length,) = _FRAME_HEADER.unpack_from(data, offset)
+            offset += _FRAME_HEADER.size
+            end = offset + length
+            if end > len(data):
+                offset -= _FRAME_HEADER.size
+                break
+            delta_ms, offset = _read_varint(data, offset)
+            last_ms += delta_ms
+            count, offset = _read_varint(data, offset)
+            ids, tvls, volumes, tx_counts, tick_values = array('I'), array('q'), array('q'), array('q'), array('q')
+            pool_id = 0
+            for _ in range(count):
+                id_delta, offset = _read_varint(data, offset)
+                pool_id += id_delta
+                tvl, offset = _read_varint(data, offset)
+                volume, offset = _read_varint(data, offset)
+                tx_count, offset = _read_varint(data, offset)
+                tick = 0
+                if ticks:
+                    tick, offset = _read_varint(data, offset)
+                previous = state.get(pool_id, (0, 0, 0, 0))
+                current = (
+                    previous[0] + _unzigzag(tvl),
+                    previous[1] + _unzigzag(volume),
+                    previous[2] + _unzigzag(tx_count),
+                    previous[3] + _unzigzag(tick),
+                )
+                state[pool_id] = current
+                ids.append(pool_id)
+                tvls.append(current[0])
+                volumes.append(current[1])
+                tx_counts.append(current[2])
+                tick_values.append(current[3])
+            frames.append((last_ms / 1000, ids, tvls, volumes, tx_counts, tick_values))
+            offset = end
+
+        if repair and offset < len(data):
+            with open(path, 'r+b') as f:
+                f.truncate(offset)
+        return frames, ticks
+
+    def _cached_chunk(self, chain: str, chunk_start: int) -> List[Frame]:
+        size = self._chunk_size(chain, chunk_start)
+        writer = self._writers.get(chain)
+        if writer and writer.chunk_start == chunk_start and writer.size == size:
+            return writer.frames
+
+        # A chunk another process appended to since it was decoded has a new size
+        key = (chain, chunk_start)
+        cached = self._cache.get(key)
+        if cached is not None and cached[0] == size:
+            self._cache.move_to_end(key)
+            return cached[1]
+
+        frames, _ = self._decode_chunk(chain, chunk_start)
+        self._cache[key] = (size, frames)
+        if len(self._cache) > self.cache_chunks:
+            self._cache.popitem(last=False)
+        return frames
+
+    def append(self, snapshot: PoolSnapshot, state: Optional['PoolState'] = None) -> bool:
+        """
+        Append the TVL, 24h volume and txCount of every pool of a snapshot
+
+        Args:
+            snapshot: Pools to record
+            state: On-chain state read for this snapshot, whose ticks are
+                recorded as the pool prices
+
+        Returns:
+            False when the snapshot was skipped (older than, or closer than
+            min_interval to, the last stored one)
+        """
+        chain = snapshot.chain
+        timestamp = snapshot.fetched_at
+        with self._lock, self._file_lock(chain, exclusive=True):
+            last = self._last_append.get(chain)
+            if last is not None and timestamp - last < self.min_interval:
+                return False
+            self._sync_chain(chain)
+
+            chunk_start = int(timestamp // self.chunk_seconds) * self.chunk_seconds
+            writer = self._writers.get(chain)
+            if writer and writer.chunk_start == chunk_start and writer.size != self._chunk_size(chain, chunk_start):
+                # Another process appended to the chunk, resume its delta state from the file
+                writer = None
+            if not writer or writer.chunk_start != chunk_start:
+                writer = _ChainWriter(chunk_start)
+                chunks = self._chunks[chain]
+                if chunks and chunks[-1] > chunk_start:
+                    return False
+                if chunks and chunks[-1] == chunk_start:
+                    # Resume the delta state of an existing chunk after a restart
+                    writer.frames, writer.ticks = self._decode_chunk(chain, chunk_start, writer.previous, repair=True)
+                    writer.size = self._chunk_size(chain, chunk_start)
+                    if writer.frames:
+                        writer.last_ms = round(writer.frames[-1][0] * 1000)
+                        if timestamp - writer.frames[-1][0] < self.min_interval:
+                            return False
+                    self._cache.pop((chain, chunk_start), None)
+                else:
+                    bisect.insort(chunks, chunk_start)
+                self._writers[chain] = writer
+
+            timestamp_ms = round(timestamp * 1000)
+            if timestamp_ms < writer.last_ms:
+                return False
+
+            if state is not None and (state.snapshot_version != snapshot.version or len(state) != len(snapshot)):
+                state = None
+            new_addresses = []
+            rows = sorted(
+                (
+                    self._pool_id(chain, snapshot.pool_addresses[index], new_addresses),
+                    round(snapshot.tvl[index] * _CENTS),
+                    round(snapshot.volume_24h[index] * _CENTS),
+                    snapshot.tx_count[index],
+                    state.tick[index] + _TICK_OFFSET if writer.ticks and state is not None and state.ok[index] else 0,
+                )
+                for index in range(len(snapshot))
+            )
+
+            payload = bytearray()
+            _write_varint(payload, timestamp_ms - writer.last_ms)
+            _write_varint(payload, len(rows))
+            ids, tvls, volumes, tx_counts, ticks = array('I'), array('q'), array('q'), array('q'), array('q')
+            previous_id = 0
+            for pool_id, tvl, volume, tx_count, tick in rows:
+                previous = writer.previous.get(pool_id, (0, 0, 0, 0))
+                _write_varint(payload, pool_id - previous_id)
+                _write_varint(payload, _zigzag(tvl - previous[0]))
+                _write_varint(payload, _zigzag(volume - previous[1]))
+                _write_varint(payload, _zigzag(tx_count - previous[2]))
+                if writer.ticks:
+                    _write_varint(payload, _zigzag(tick - previous[3]))
+                writer.previous[pool_id] = (tvl, volume, tx_count, tick)
+                previous_id = pool_id
+                ids.append(pool_id)
+                tvls.append(tvl)
+                volumes.append(volume)
+                tx_counts.append(tx_count)
+                ticks.append(tick)
+
+            # Pool ids must be durable before the frames that reference them
+            if new_addresses:
+                lines = "".join(f"{address}\n" for address in new_addresses).encode('utf-8')
+                with open(os.path.join(self._chain_dir(chain), 'pools.txt'), 'ab') as f:
+                    f.write(lines)
+                self._pools_read[chain] += len(lines)
+            with open(self._chunk_path(chain, chunk_start), 'ab') as f:
+                if writer.ticks and f.tell() == 0:
+                    f.write(_TICKS_MAGIC)
+                f.write(_FRAME_HEADER.pack(len(payload)) + payload)
+                writer.size = f.tell()
+
+            writer.last_ms = timestamp_ms
+            writer.frames.append((timestamp_ms / 1000, ids, tvls, volumes, tx_counts, ticks))
+            self._last_append[chain] = timestamp
+            return True
+
+    def _frames_in_range(self, chain: str, start: float, end: float) -> Tuple[List[Frame], List[str]]:
+        with self._lock, self._file_lock(chain, exclusive=False):
+            self._sync_chain(chain)
+            chunks = self._chunks[chain]
+            first = max(0, bisect.bisect_right(chunks, start) - 1)
+            last = bisect.bisect_right(chunks, end)
+            frames = [
+                frame
+                for chunk_start in chunks[first:last]
+                for frame in self._cached_chunk(chain, chunk_start)
+                if start <= frame[0] <= end
+            ]
+            return frames, list(self._pool_addresses[chain])
+
+    def read_matrix(
+        self,
+        chain: str,
+        start: float,
+        end: float,
+        metric: str = 'tvl',
+        interval: Optional[float] = None
+    ) -> Tuple[np.ndarray, List[str], np.ndarray]:
+        """
+        Read one metric for every pool of a chain as a dense (time x pool) matrix
+
+        Args:
+            chain: Network name (BASE, ARBITRUM, ...)
+            start: Range start, unix seconds
+            end: Range end, unix seconds
+            metric: 'tvl', 'volume_24h', 'tx_count' or 'price' (token1 per token0
+                from the pool tick, raw units)
+            interval: Optional bucket width in seconds, keeps the last sample per bucket
+
+        Returns:
+            (timestamps, pool addresses, values) where values[t, p] is NaN when
+            pool p was not in the snapshot at timestamps[t]
+        """
+        if metric not in _METRICS:
+            raise ValueError(f"Unsupported metric: {metric}")
+        position, scale = _METRICS[metric]
+
+        frames, addresses = self._frames_in_range(chain, start, end)
+        if interval:
+            # Last frame of every bucket
+            buckets = {}
+            for frame in frames:
+                buckets[int(frame[0] // interval)] = frame
+            frames = [buckets[bucket] for bucket in sorted(buckets)]
+            timestamps = np.array(sorted(buckets), dtype=np.float64) * interval
+        else:
+            timestamps = np.array([frame[0] for frame in frames], dtype=np.float64)
+
+        values = np.full((len(frames), len(addresses)), np.nan)
+        for row, frame in enumerate(frames):
+            ids = np.frombuffer(frame[1], dtype=np.uint32)
+            raw = np.frombuffer(frame[position], dtype=np.int64)
+            values[row, ids] = _tick_prices(raw) if scale is None else raw / scale
+        return timestamps, addresses, values
+
+    def read_range(self, chain: str, start: float, end: float, pools: Optional[Iterable[str]] = None) -> Dict[str, PoolSeries]:
+        """
+        Read the history of a chain between two unix timestamps (inclusive)
+
+        Args:
+            chain: Network name (BASE, ARBITRUM, ...)
+            start: Range start, unix seconds
+            end: Range end, unix seconds
+            pools: Optional pool addresses to restrict the read to
+
+        Returns:
+            Dict of pool address to PoolSeries
+        """
+        frames, addresses = self._frames_in_range(chain, start, end)
+        wanted = None
+        if pools is not None:
+            index = {address: pool_id for pool_id, address in enumerate(addresses)}
+            wanted = {index[address.lower()] for address in pools if address.lower() in index}
+
+        series: Dict[int, PoolSeries] = {}
+        for timestamp, ids, tvls, volumes, tx_counts, ticks in frames:
+            for pool_id, tvl, volume, tx_count, tick in zip(ids, tvls, volumes, tx_counts, ticks):
+                if wanted is not None and pool_id not in wanted:
+                    continue
+                pool_series = series.get(pool_id)
+                if pool_series is None:
+                    pool_series = series[pool_id] = PoolSeries()
+                price = 1.0001 ** (tick - _TICK_OFFSET) if tick else float('nan')
+                pool_series.append(timestamp, tvl / _CENTS, volume / _CENTS, tx_count, price)
+        return {addresses[pool_id]: pool_series for pool_id, pool_series in series.items()}
+
+    def read_downsampled(
+        self,
+        chain: str,
+        start: float,
+        end: float,
+        interval: float,
+        pools: Optional[Iterable[str]] = None,
+        how: str = 'last'
+    ) -> Dict[str, PoolSeries]:
+        """read_range with every series downsampled to `interval` second buckets"""
+        return {
+            address: pool_series.downsample(interval, how)
+            for address, pool_series in self.read_range(chain, start, end, pools).items()
+        }
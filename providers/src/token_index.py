@@ -0,0 +1,106 @@
+import time
+from typing import List, NamedTuple, Optional
+
+import numpy as np
+from pool_snapshot import PoolSnapshot
+
+
+class TokenPool(NamedTuple):
+    """A pool containing a looked up token"""
+    address: str
+    token0: str
+    token1: str
+    token0_symbol: str
+    token1_symbol: str
+    fee_tier: int
+    tvl: float
+
+
+class TokenIndex:
+    """
+    Inverted index token -> pools of a snapshot, deepest pool first
+
+    Stored as CSR arrays: the rows of token t are rows[offsets[t]:offsets[t + 1]],
+    sorted by TVL. Built once per snapshot so "pools containing X" and
+    "pools of the pair X/Y" are answered locally instead of by a tokenFilter
+    query per token.
+    """
+
+    __slots__ = ('snapshot', 'offsets', 'rows', 'other', 'built_in')
+
+    def __init__(self, snapshot: PoolSnapshot, offsets: np.ndarray, rows: np.ndarray, other: np.ndarray):
+        self.snapshot = snapshot
+        self.offsets = offsets
+        self.rows = rows
+        self.other = other  # the other token of the pool, aligned with rows
+        self.built_in = 0.0
+
+    @property
+    def snapshot_version(self) -> int:
+        return self.snapshot.version
+
+    @classmethod
+    def build(cls, snapshot: PoolSnapshot) -> 'TokenIndex':
+        started = time.perf_counter()
+        token0 = np.frombuffer(snapshot.token0, dtype=np.uint32).astype(np.int64)
+        token1 = np.frombuffer(snapshot.token1, dtype=np.uint32).astype(np.int64)
+        tvl = np.frombuffer(snapshot.tvl, dtype=np.float64)
+        pools = np.arange(len(snapshot), dtype=np.int64)
+
+        # Every pool once under each of its tokens, grouped by token and by TVL within a token
+        token = np.concatenate([token0, token1])
+        rows = np.concatenate([pools, pools])
+        other = np.concatenate([token1, token0])
+        order = np.lexsort((-tvl[rows], token))
+        counts = np.bincount(token, minlength=len(snapshot.tokens))
+        offsets = np.zeros(len(snapshot.tokens) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+
+        index = cls(snapshot, offsets, rows[order], other[order])
+        index.built_in = time.perf_counter() - started
+        return index
+
+    def __contains__(self, token: str) -> bool:
+        return self.snapshot.tokens.index_of(token) is not None
+
+    def _pool(self, row: int) -> TokenPool:
+        snapshot = self.snapshot
+        token0, token1 = snapshot.token0[row], snapshot.token1[row]
+        return TokenPool(
+            address=snapshot.pool_addresses[row],
+            token0=snapshot.tokens.addresses[token0],
+            token1=snapshot.tokens.addresses[token1],
+            token0_symbol=snapshot.tokens.symbols[token0],
+            token1_symbol=snapshot.tokens.symbols[token1],
+            fee_tier=snapshot.fee_tier[row],
+            tvl=snapshot.tvl[row],
+        )
+
+    def pool_rows(self, token: str, pair_token: Optional[str] = None) -> Optional[np.ndarray]:
+        """
+        Snapshot rows of the pools of a token (or of a pair), deepest first
+
+        Returns:
+            None when a token is not in the snapshot
+        """
+        first = self.snapshot.tokens.index_of(token)
+        if first is None:
+            return None
+        start, end = self.offsets[first], self.offsets[first + 1]
+        if pair_token is None:
+            return self.rows[start:end]
+        second = self.snapshot.tokens.index_of(pair_token)
+        if second is None:
+            return None
+        # Scan the token with fewer pools
+        if self.offsets[second + 1] - self.offsets[second] < end - start:
+            start, end = self.offsets[second], self.offsets[second + 1]
+            second = first
+        return self.rows[start:end][self.other[start:end] == second]
+
+    def pools(self, token: str, pair_token: Optional[str] = None, limit: Optional[int] = None) -> Optional[List[TokenPool]]:
+        """Pools containing a token (and pair_token when given), None when a token is unknown"""
+        rows = self.pool_rows(token, pair_token)
+        if rows is None:
+            return None
+        return [self._pool(int(row)) for row in rows[:limit]]
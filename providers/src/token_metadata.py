@@ -0,0 +1,169 @@
+import asyncio
+import json
+import os
+import threading
+from typing import Dict, Iterable, NamedTuple, Optional
+
+from multicall_reader import MulticallClient
+from web3 import Web3
+
+DECIMALS_SELECTOR = Web3.keccak(text="decimals()")[:4]
+SYMBOL_SELECTOR = Web3.keccak(text="symbol()")[:4]
+NAME_SELECTOR = Web3.keccak(text="name()")[:4]
+
+
+class TokenMetadata(NamedTuple):
+    """Immutable ERC-20 fields of a token"""
+    address: str     # lowercase
+    decimals: int
+    symbol: str
+    name: str
+
+
+def decode_string_result(data: bytes) -> str:
+    """
+    Decode a symbol() / name() return value
+
+    Handles the standard ABI `string` and the bytes32 variant used by older
+    tokens (MKR, SAI, ...).
+    """
+    if len(data) >= 64:
+        offset = int.from_bytes(data[:32], 'big')
+        if offset + 32 <= len(data):
+            length = int.from_bytes(data[offset:offset + 32], 'big')
+            if offset + 32 + length <= len(data):
+                return data[offset + 32:offset + 32 + length].decode('utf-8', errors='replace')
+    if len(data) == 32:
+        return data.rstrip(b'\x00').decode('utf-8', errors='replace')
+    return ""
+
+
+class TokenMetadataCache:
+    """
+    Persistent token metadata per chain
+
+    Decimals, symbol and name never change once a token is deployed, so
+    entries never expire. Stored as JSON lines appended on every new token
+    and loaded once at startup.
+    """
+
+    def __init__(self, path: str = './token_metadata.jsonl'):
+        self.path = path
+        self._tokens: Dict[str, Dict[str, TokenMetadata]] = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # torn last line of an interrupted write
+                    chain = entry.pop('chain')
+                    self._tokens.setdefault(chain, {})[entry['address']] = TokenMetadata(**entry)
+
+    @classmethod
+    def from_env(cls) -> 'TokenMetadataCache':
+        return cls(os.getenv('TOKEN_METADATA_CACHE_PATH', './token_metadata.jsonl'))
+
+    def get(self, chain: str, address: str) -> Optional[TokenMetadata]:
+        return self._tokens.get(chain, {}).get(address.lower())
+
+    def add(self, chain: str, tokens: Iterable[TokenMetadata]) -> None:
+        lines = []
+        known = self._tokens.setdefault(chain, {})
+        for token in tokens:
+            if token.address not in known:
+                known[token.address] = token
+                lines.append(json.dumps({"chain": chain, **token._asdict()}) + '\n')
+        if lines:
+            with self._lock, open(self.path, 'a') as f:
+                f.writelines(lines)
+
+    def __len__(self) -> int:
+        return sum(len(tokens) for tokens in self._tokens.values())
+
+
+class TokenMetadataResolver:
+    """
+    Resolve token metadata, batching unknown addresses into Multicall3 reads
+
+    Every unknown token costs three calls inside one aggregate3 request
+    (decimals, symbol, name); concurrent lookups of the same token share the
+    pending read, which runs to completion even when its callers are cancelled. Addresses whose decimals() call fails are not ERC-20
+    tokens and are remembered in memory only.
+    """
+
+    def __init__(self, chain: str, client: MulticallClient, cache: TokenMetadataCache):
+        self.chain = chain
+        self.client = client
+        self.cache = cache
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._invalid = set()
+        self.rpc_batches = 0
+
+    async def resolve(self, addresses: Iterable[str]) -> Dict[str, TokenMetadata]:
+        """
+        Metadata of every address that is an ERC-20 token
+
+        Returns:
+            {lowercase address: TokenMetadata}
+        """
+        resolved = {}
+        waiting = {}
+        missing = []
+        for address in {address.lower() for address in addresses}:
+            token = self.cache.get(self.chain, address)
+            if token:
+                resolved[address] = token
+            elif address in self._pending:
+                waiting[address] = self._pending[address]
+            elif address not in self._invalid:
+                missing.append(address)
+
+        if missing:
+            fetch = asyncio.ensure_future(self._fetch(missing))
+            fetch.add_done_callback(lambda done: self._fetched(missing, done))
+            for address in missing:
+                self._pending[address] = waiting[address] = fetch
+
+        for address, fetch in waiting.items():
+            # Shielded: a cancelled caller (e.g. a stage deadline) must not
+            # cancel the read the other callers of these tokens wait on
+            token = (await asyncio.shield(fetch)).get(address)
+            if token:
+                resolved[address] = token
+        return resolved
+
+    def _fetched(self, addresses: list, fetch: asyncio.Future) -> None:
+        """Release the pending entries of a finished read, whoever still waits on it"""
+        for address in addresses:
+            if self._pending.get(address) is fetch:
+                del self._pending[address]
+        if not fetch.cancelled():
+            fetch.exception()  # retrieved here when every caller was cancelled
+
+    async def get(self, address: str) -> Optional[TokenMetadata]:
+        return (await self.resolve([address])).get(address.lower())
+
+    async def _fetch(self, addresses: list) -> Dict[str, TokenMetadata]:
+        calls = []
+        for address in addresses:
+            calls.extend([(address, DECIMALS_SELECTOR), (address, SYMBOL_SELECTOR), (address, NAME_SELECTOR)])
+        block = await self.client.block_number()
+        results = await self.client.aggregate(calls, block)
+        self.rpc_batches += 1
+
+        tokens = {}
+        for index, address in enumerate(addresses):
+            (decimals_ok, decimals), (symbol_ok, symbol), (name_ok, name) = results[3 * index:3 * index + 3]
+            if not decimals_ok or len(decimals) < 32:
+                self._invalid.add(address)
+                continue
+            tokens[address] = TokenMetadata(
+                address=address,
+                decimals=int.from_bytes(decimals[:32], 'big'),
+                symbol=decode_string_result(symbol) if symbol_ok else "",
+                name=decode_string_result(name) if name_ok else ""
+            )
+        self.cache.add(self.chain, tokens.values())
+        return tokens
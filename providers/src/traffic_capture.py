@@ -0,0 +1,307 @@
+import argparse
+import asyncio
+import gzip
+import hashlib
+import inspect
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Union
+
+# Kinds of exchanges stored in a cassette
+UPSTREAM_KINDS = ('graphql', 'quote', 'llm')
+INBOUND_KIND = 'query'
+
+
+def exchange_key(kind: str, request: Any) -> str:
+    """Stable key used to match a replayed request against a recorded one"""
+    body = json.dumps(request, sort_keys=True, default=str)
+    return hashlib.sha1(f"{kind}:{body}".encode()).hexdigest()
+
+
+def fallback_key(kind: str, request: Any) -> Optional[str]:
+    """
+    Key of the prompt template a request was built from, None when it has none
+
+    LLM requests carry their stage and template alongside the formatted
+    prompt, so a prompt that only differs by its volatile data (timestamps,
+    fresh pool data) can still be matched to a recording of the same stage.
+    """
+    if not isinstance(request, dict) or 'stage' not in request:
+        return None
+    return f"{kind}:{request['stage']}:{request.get('template')}"
+
+
+class CassetteRecorder:
+    """Append exchanges to a gzip compressed JSONL cassette file"""
+
+    def __init__(self, path: str, flush_every: int = 100):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.flush_every = flush_every
+        self._file = gzip.open(path, 'at', encoding='utf-8')
+        self._lock = threading.Lock()
+        self._pending = 0
+
+    def record(self, kind: str, request: Any, response: Any, started_at: float, elapsed: float, error: Optional[str] = None) -> None:
+        entry = {
+            "kind": kind,
+            "key": exchange_key(kind, request),
+            "started_at": started_at,
+            "elapsed": elapsed,
+            "request": request,
+            "response": response,
+            "error": error,
+        }
+        line = json.dumps(entry, default=str) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._pending += 1
+            if self._pending >= self.flush_every:
+                self._file.flush()
+                self._pending = 0
+
+    def close(self) -> None:
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+
+def load_cassette(path: str) -> List[Dict[str, Any]]:
+    """Read every entry of a cassette, ordered by start time"""
+    entries = []
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                entries.append(json.loads(line))
+    entries.sort(key=lambda entry: entry['started_at'])
+    return entries
+
+
+class CassettePlayer:
+    """
+    Serve recorded upstream responses back in recording order
+
+    Requests are matched on their exchange key first. Requests built from a
+    prompt template (see fallback_key) fall back to the next unplayed entry of
+    the same stage and template; every fallback is logged and counted in
+    `fallbacks`, so a replay shows where it diverged from the recording.
+    """
+
+    def __init__(self, path: str, speed: float = 1.0):
+        self.path = path
+        self.speed = speed
+        self._by_key = defaultdict(deque)
+        self._by_template = defaultdict(deque)
+        self._played = set()
+        self.fallbacks = 0
+        self._entries = load_cassette(path)
+        for index, entry in enumerate(self._entries):
+            if entry['kind'] == INBOUND_KIND:
+                continue
+            self._by_key[(entry['kind'], entry['key'])].append(index)
+            template = fallback_key(entry['kind'], entry['request'])
+            if template is not None:
+                self._by_template[template].append(index)
+
+    def _next_entry(self, kind: str, request: Any) -> Dict[str, Any]:
+        matches = self._by_key.get((kind, exchange_key(kind, request)))
+        while matches:
+            index = matches.popleft()
+            if index not in self._played:
+                self._played.add(index)
+                return self._entries[index]
+
+        template = fallback_key(kind, request)
+        queue = self._by_template.get(template) if template is not None else None
+        while queue:
+            index = queue.popleft()
+            if index not in self._played:
+                self._played.add(index)
+                self.fallbacks += 1
+                print(f"Replay diverged: no recorded {kind} exchange matches the request, "
+                      f"serving the next recording of {template} (fallback #{self.fallbacks})")
+                return self._entries[index]
+
+        raise LookupError(f"No recorded {kind} exchange matches the request in cassette {self.path}")
+
+    async def play(self, kind: str, request: Any) -> Any:
+        entry = self._next_entry(kind, request)
+        if self.speed > 0:
+            await asyncio.sleep(entry['elapsed'] / self.speed)
+        if entry.get('error'):
+            raise RuntimeError(entry['error'])
+        return entry['response']
+
+
+class TrafficTap:
+    """
+    Single choke point for upstream traffic of UniswapPoolAgent
+
+    Modes:
+        off: call upstream directly
+        capture: call upstream and record the exchange to a cassette
+        replay: never call upstream, serve the exchange from a cassette
+    """
+
+    def __init__(self, mode: str = 'off', path: Optional[str] = None, speed: float = 1.0):
+        if mode not in ('off', 'capture', 'replay'):
+            raise ValueError(f"Unsupported traffic mode: {mode}")
+        if mode != 'off' and not path:
+            raise ValueError(f"A cassette path is required for traffic mode: {mode}")
+
+        self.mode = mode
+        self.recorder = CassetteRecorder(path) if mode == 'capture' else None
+        self.player = CassettePlayer(path, speed=speed) if mode == 'replay' else None
+
+    @classmethod
+    def from_env(cls) -> 'TrafficTap':
+        """Build the tap from TRAFFIC_CAPTURE_PATH / TRAFFIC_REPLAY_PATH / TRAFFIC_REPLAY_SPEED"""
+        capture_path = os.getenv('TRAFFIC_CAPTURE_PATH')
+        replay_path = os.getenv('TRAFFIC_REPLAY_PATH')
+        if capture_path and replay_path:
+            raise ValueError("TRAFFIC_CAPTURE_PATH and TRAFFIC_REPLAY_PATH are mutually exclusive")
+        if capture_path:
+            return cls('capture', capture_path)
+        if replay_path:
+            return cls('replay', replay_path, speed=float(os.getenv('TRAFFIC_REPLAY_SPEED', '1.0')))
+        return cls()
+
+    async def exchange(self, kind: str, request: Any, call: Callable[[], Union[Any, Awaitable[Any]]]) -> Any:
+        """
+        Perform an upstream exchange through the tap
+
+        Args:
+            kind: One of UPSTREAM_KINDS
+            request: JSON serializable description of the request
+            call: Zero-argument callable doing the real upstream call
+
+        Returns:
+            The upstream (or recorded) response
+        """
+        if self.mode == 'replay':
+            return await self.player.play(kind, request)
+
+        started_at = time.time()
+        start = time.perf_counter()
+        try:
+            response = call()
+            if inspect.isawaitable(response):
+                response = await response
+        except Exception as e:
+            if self.recorder:
+                self.recorder.record(kind, request, None, started_at, time.perf_counter() - start, error=str(e))
+            raise
+
+        if self.recorder:
+            self.recorder.record(kind, request, response, started_at, time.perf_counter() - start)
+        return response
+
+    def record_inbound(self, body: Dict[str, Any], response: Any, started_at: float, elapsed: float) -> None:
+        """Record an incoming /query body with its timing (capture mode only)"""
+        if self.recorder:
+            self.recorder.record(INBOUND_KIND, body, response, started_at, elapsed)
+
+    def close(self) -> None:
+        if self.recorder:
+            self.recorder.close()
+
+
+async def replay_queries(
+    path: str,
+    send: Callable[[Dict[str, Any]], Awaitable[Any]],
+    speed: float = 1.0,
+) -> Dict[str, Any]:
+    """
+    Re-issue recorded /query bodies with their original arrival pattern
+
+    Args:
+        path: Cassette file recorded in capture mode
+        send: Coroutine function processing one /query body
+        speed: Time acceleration factor (0 sends everything at once)
+
+    Returns:
+        Dict with throughput and latency statistics of the run
+    """
+    queries = [entry for entry in load_cassette(path) if entry['kind'] == INBOUND_KIND]
+    if not queries:
+        return {"requests": 0}
+
+    first_arrival = queries[0]['started_at']
+    latencies = []
+    errors = 0
+    start = time.perf_counter()
+
+    async def fire(entry):
+        nonlocal errors
+        offset = entry['started_at'] - first_arrival
+        if speed > 0:
+            await asyncio.sleep(max(0.0, offset / speed - (time.perf_counter() - start)))
+        sent_at = time.perf_counter()
+        try:
+            await send(entry['request'])
+        except Exception as e:
+            print(f"Replayed query failed: {e}")
+            errors += 1
+        latencies.append((time.perf_counter() - sent_at, entry['elapsed']))
+
+    await asyncio.gather(*(fire(entry) for entry in queries))
+    wall_time = time.perf_counter() - start
+
+    replayed = sorted(latency for latency, _ in latencies)
+    recorded = sorted(latency for _, latency in latencies)
+
+    def percentile(values, q):
+        return values[min(len(values) - 1, int(q * len(values)))]
+
+    return {
+        "requests": len(queries),
+        "errors": errors,
+        "wall_time": wall_time,
+        "throughput": len(queries) / wall_time if wall_time else None,
+        "latency": {
+            "replayed": {"p50": percentile(replayed, 0.5), "p95": percentile(replayed, 0.95), "p99": percentile(replayed, 0.99)},
+            "recorded": {"p50": percentile(recorded, 0.5), "p95": percentile(recorded, 0.95), "p99": percentile(recorded, 0.99)},
+        },
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded day of /query traffic against the provider")
+    parser.add_argument('cassette', help="Cassette file recorded with TRAFFIC_CAPTURE_PATH")
+    parser.add_argument('--speed', type=float, default=1.0, help="Time acceleration factor, 0 for no delays")
+    args = parser.parse_args()
+
+    # Serve upstream exchanges from the same cassette
+    os.environ.pop('TRAFFIC_CAPTURE_PATH', None)
+    os.environ['TRAFFIC_REPLAY_PATH'] = args.cassette
+    os.environ['TRAFFIC_REPLAY_SPEED'] = str(args.speed)
+
+    from adapter_interface import AdapterInterface, AdapterRequest
+
+    adapter = await AdapterInterface().initialize()
+    try:
+        async def send(body):
+            return await adapter.process_request(AdapterRequest(
+                name=body.get('name') or "Uniswap Query",
+                network=body['network'],
+                description=body.get('description') or "",
+                variables=body.get('variables') or "",
+                category_id=body.get('category_id', 1),
+                output_type_id=body['output_type_id'],
+                prompt=body['prompt']
+            ))
+
+        report = await replay_queries(args.cassette, send, speed=args.speed)
+        report["fallbacks"] = adapter.agent.traffic.player.fallbacks
+        print(json.dumps(report, indent=2))
+    finally:
+        await adapter.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,65 +1,39 @@
 import asyncio
+import hashlib
 import json
+import inspect
 import os
+import re
+import time
+from decimal import Decimal
 from enum import Enum
-from typing import Any, Dict, List, Tuple, Union
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple, Union
 
 import aiohttp
 import chromadb
-import requests
 from chromadb.utils import embedding_functions
+from canonical_answers import MaterializedAnswers, fast_intent, is_materializing
+from concurrency import run_blocking
 from dotenv import load_dotenv
+from embedding_pool import EmbeddingProcessPool
+from graphql_client import GraphQLPoolClient
 from langchain.prompts import PromptTemplate
-from langchain_openai import ChatOpenAI
+from llm_router import HedgedLLMRouter
+from multi_network import ALL_NETWORKS, fan_out, merge_network_scores
+from multicall_reader import PoolState, PoolStateReader
+from path_table import USDC_ADDRESSES, PathTable
+from pool_snapshot import PoolSnapshot
+from profiler import profile_stage
+from prompt_context import ContextSerializer
+from risk_scoring import PoolRiskScores, rank_farming_suggestions, score_snapshot, snapshot_volatility
+from speculation import SpeculativeExecutor
+from split_router import SplitQuote, SplitRouter
+from timeseries_store import PoolTimeSeriesStore
+from token_index import TokenIndex, TokenPool
+from token_metadata import TokenMetadataCache, TokenMetadataResolver
+from traffic_capture import TrafficTap
 from web3 import Web3
 
-# Define the query for fetching top V3 pools
-TOP_V3_POOLS_QUERY = {
-    "operationName": "TopV3Pools",
-    "variables": {
-        "chain": "BASE",
-        "first": 100,
-        "cursor": None,
-        "tokenAddress": None,
-    },
-    "query": """
-        query TopV3Pools($chain: Chain!, $first: Int!, $cursor: Float, $tokenAddress: String) {
-            topV3Pools(first: $first, chain: $chain, tokenFilter: $tokenAddress, tvlCursor: $cursor) {
-                id
-                protocolVersion
-                address
-                totalLiquidity {
-                    value
-                }
-                feeTier
-                token0 {
-                    id
-                    symbol
-                    name
-                    address
-                    chain
-                    __typename
-                }
-                token1 {
-                    id
-                    symbol
-                    name
-                    address
-                    chain
-                    __typename
-                }
-                txCount
-                volume24h: cumulativeVolume(duration: DAY) {
-                    value
-                }
-                volume30d: cumulativeVolume(duration: MONTH) {
-                    value
-                }
-            }
-        }
-    """
-}
-
 SUPPORTED_NETWORKS = {
     'BASE': {'chain_id': 8453, 'name': 'Base'},
     'ARBITRUM': {'chain_id': 42161, 'name': 'Arbitrum'},
@@ -72,52 +46,14 @@ SUPPORTED_CHAIN_IDS = {
     1234: 'RIVALZ'
 }
 
-# Function to fetch top V3 pools TVL
-def fetch_top_v3_pools_tvl(chain='BASE', token_address=None):
-    try:
-        if chain not in SUPPORTED_NETWORKS:
-            raise ValueError(f"Unsupported chain: {chain}")
-            
-        # Update variables with chain and tokenAddress
-        variables = TOP_V3_POOLS_QUERY["variables"].copy()
-        variables["chain"] = chain
-        if token_address:
-            variables["tokenAddress"] = token_address
-        
-        # Prepare the GraphQL payload
-        payload = {
-            "operationName": TOP_V3_POOLS_QUERY["operationName"],
-            "variables": variables,
-            "query": TOP_V3_POOLS_QUERY["query"],
-        }
-        
-        # Set request headers
-        headers = {
-            "accept": "*/*",
-            "accept-language": "en-US,en;q=0.9,vi;q=0.8",
-            "content-type": "application/json",
-            "origin": "https://app.uniswap.org",
-            "referer": "https://app.uniswap.org/",
-            "user-agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36",
-        }
-
-        # Send the POST request to the Uniswap endpoint
-        url = "https://interface.gateway.uniswap.org/v1/graphql"
-        response = requests.post(url, headers=headers, data=json.dumps(payload))
-        response.raise_for_status()  # Raise an error for bad HTTP responses
-        
-        # Return the JSON response
-        return response.json()
-    except Exception as error:
-        print(f"Error fetching top V3 pools: {error}")
-        raise
-
 class OutputType(Enum):
     BOOL = 1
     BYTES = 2
     UINT256 = 3
     STRING_AND_BOOL = 4
 
+ADDRESS_PATTERN = re.compile(r"0x[0-9a-fA-F]{40}")
+
 # Add new constants for API endpoints
 UNISWAP_QUOTE_API = "https://trading-api-labs.interface.gateway.uniswap.org/v1/quote"
 UNISWAP_API_KEY = os.getenv('UNISWAP_API_KEY')
@@ -130,6 +66,8 @@ class UniswapPoolAgent:
         # Initialize ChromaDB
         self.chroma_client = chromadb.Client()
         self.embedding_function = embedding_functions.DefaultEmbeddingFunction()
+        # Bulk indexing embeds in worker processes (None = in-process)
+        self.embedding_pool = EmbeddingProcessPool.from_env()
         
         # Create collections for each supported network
         self.collections = {}
@@ -139,13 +77,8 @@ class UniswapPoolAgent:
                 embedding_function=self.embedding_function
             )
         
-        # Initialize LLM
-        self.llm = ChatOpenAI(
-            model_name="openai/gpt-4o-mini",
-            openai_api_key=os.getenv('OPENROUTER_API_KEY'),
-            openai_api_base=os.getenv('OPENROUTER_API_BASE'),
-            temperature=0.7,
-        )
+        # Initialize LLM: model per pipeline stage, hedged calls (see llm_router.py)
+        self.llm_router = HedgedLLMRouter.from_env()
         
         # Define RAG prompt template
         self.template = """
@@ -159,18 +92,97 @@ class UniswapPoolAgent:
         
         self.prompt = PromptTemplate(template=self.template, input_variables=["context", "question"])
         
+        # PromptTemplates are parsed once and reused (see _compiled_prompt)
+        self._prompts: Dict[str, PromptTemplate] = {"rag": self.prompt}
+        # Short hash of every compiled template, keys captured LLM exchanges
+        self._template_hashes: Dict[str, str] = {self.template: self._template_hash(self.template)}
+        
+        # Projects, rounds and budgets the data inserted into prompts
+        self.context_serializer = ContextSerializer.from_env()
+        
         self.web3 = Web3()
         self.session = None  # Will be initialized in async context
         
+        # TopV3Pools over a keep-alive, compressed connection (see graphql_client.py)
+        self.graphql = GraphQLPoolClient.from_env()
+        
+        # Latest PoolSnapshot per network, reused by handlers while younger than this
+        self.snapshots: Dict[str, PoolSnapshot] = {}
+        self.snapshot_max_age = float(os.getenv('SNAPSHOT_MAX_AGE', '60'))
+        self._snapshot_refreshes: Dict[str, asyncio.Future] = {}
+        
+        # Local history of pool TVL / volume / txCount
+        self.pool_history = PoolTimeSeriesStore.from_env()
+        
+        # Called with every new snapshot (sync or async callables), as background tasks
+        self.snapshot_listeners: List[Callable[[PoolSnapshot], Union[None, Awaitable[None]]]] = [
+            self._record_pool_history
+        ]
+        self._listener_tasks: Set[asyncio.Task] = set()
+        
+        # On-chain slot0 / liquidity per network, for networks with <NETWORK>_RPC_URL set
+        self.pool_state_readers: Dict[str, PoolStateReader] = {}
+        for network in SUPPORTED_NETWORKS:
+            reader = PoolStateReader.from_env(network)
+            if reader:
+                self.pool_state_readers[network] = reader
+        self.pool_states: Dict[str, PoolState] = {}
+        if self.pool_state_readers:
+            self.snapshot_listeners.append(self._refresh_pool_state)
+        
+        # USDC <-> token paths rebuilt with every snapshot
+        self.path_tables: Dict[str, PathTable] = {}
+        self.snapshot_listeners.append(self._build_path_table)
+        
+        # Token -> pools of the latest snapshot, plus tokenFilter results for tokens outside it
+        self.token_indexes: Dict[str, TokenIndex] = {}
+        self._token_index_misses: Dict[Tuple[str, str], TokenIndex] = {}
+        self.snapshot_listeners.append(self._build_token_index)
+        
+        # Split-route optimizers over the latest snapshot and pool state
+        self.split_routers: Dict[str, SplitRouter] = {}
+        
+        # Canonical questions answered once per snapshot in the background
+        self.canonical_answers = MaterializedAnswers(
+            self._canonical_response,
+            self._format_output,
+            lambda network: self.snapshots[network].version if network in self.snapshots else None,
+            [OutputType(int(value)) for value in os.getenv('CANONICAL_OUTPUT_TYPES', '1,2,3,4').split(',') if value]
+        )
+        if os.getenv('CANONICAL_ANSWERS', '1') == '1':
+            self.snapshot_listeners.append(self._schedule_canonical_answers)
+        
+        # ERC-20 decimals / symbol / name, resolved on-chain once per token
+        self.token_metadata_cache = TokenMetadataCache.from_env()
+        self.token_resolvers: Dict[str, TokenMetadataResolver] = {
+            network: TokenMetadataResolver(network, reader.client, self.token_metadata_cache)
+            for network, reader in self.pool_state_readers.items()
+        }
+        
+        # Capture or replay upstream traffic (see traffic_capture.py)
+        self.traffic = TrafficTap.from_env()
+        
+        # Stage deadlines and work started ahead of intent classification
+        self.speculation = SpeculativeExecutor.from_env()
+        
         # Add API handlers mapping
         self.api_handlers = {
             'swap_path': self._handle_swap_path_query,
             'pool_info': self.query_pools,
             'other': self.search_normal
         }
+        
+        # Handlers of network ALL, fanned out over every supported network
+        self.multi_network_handlers = {
+            'swap_path': self._handle_multi_network_swap,
+            'pool_info': self.query_pools_all_networks,
+            'other': self.search_normal
+        }
+        self.multi_network_timeout = float(os.getenv('MULTI_NETWORK_TIMEOUT', '20'))
 
-    async def process_pool_data(self, pools_data: List[Dict], symbol_chain_name: str) -> None:
+    async def process_pool_data(self, snapshot: PoolSnapshot) -> None:
         """Process and store pool data in the vector database"""
+        symbol_chain_name = snapshot.chain
         if symbol_chain_name not in SUPPORTED_NETWORKS:
             raise ValueError(f"Unsupported chain: {symbol_chain_name}")
             
@@ -180,35 +192,243 @@ class UniswapPoolAgent:
         
         network_info = SUPPORTED_NETWORKS[symbol_chain_name]
         
-        for pool in pools_data:
+        for pool in snapshot:
             # Create a readable description of the pool
             pool_description = (
-                f"Pool {pool['address']} between {pool['token0']['symbol']}-{pool['token1']['symbol']} "
-                f"with {pool['totalLiquidity']['value']:.2f} TVL, "
-                f"24h volume: {pool['volume24h']['value']:.2f}, "
-                f"30d volume: {pool['volume30d']['value']:.2f}, "
-                f"fee tier: {pool['feeTier']}, "
+                f"Pool {pool.address} between {pool.token0_symbol}-{pool.token1_symbol} "
+                f"with {pool.tvl:.2f} TVL, "
+                f"24h volume: {pool.volume_24h:.2f}, "
+                f"30d volume: {pool.volume_30d:.2f}, "
+                f"fee tier: {pool.fee_tier}, "
                 f"on {network_info['name']} network (chain ID: {network_info['chain_id']})"
             )
             
             documents.append(pool_description)
             metadatas.append({
-                "address": pool['address'],
-                "token0": pool['token0']['symbol'],
-                "token1": pool['token1']['symbol'],
-                "tvl": pool['totalLiquidity']['value'],
+                "address": pool.address,
+                "token0": pool.token0_symbol,
+                "token1": pool.token1_symbol,
+                "tvl": pool.tvl,
                 "chain_id": network_info['chain_id'],
                 "chain_name": network_info['name']
             })
-            ids.append(pool['address'])
+            ids.append(pool.address)
         
-        # Add to network-specific ChromaDB collection
-        self.collections[symbol_chain_name].add(
+        embeddings = None
+        if self.embedding_pool:
+            embeddings = (await self.embedding_pool.embed(documents)).tolist()
+        
+        # Add to network-specific ChromaDB collection (sync client, keep it off the event loop)
+        await run_blocking(
+            self.collections[symbol_chain_name].add,
             documents=documents,
+            embeddings=embeddings,
             metadatas=metadatas,
             ids=ids
         )
 
+    async def _fetch_pools(self, chain: str, token_address: str = None, variant: str = 'snapshot') -> Dict[str, Any]:
+        """Fetch top V3 pools for a chain with the fields of a query variant (see POOL_FIELDS)"""
+        if chain not in SUPPORTED_NETWORKS:
+            raise ValueError(f"Unsupported chain: {chain}")
+        await self.initialize()
+        with profile_stage('graphql'):
+            return await self.traffic.exchange(
+                'graphql',
+                {"chain": chain, "token_address": token_address, "variant": variant},
+                lambda: self.graphql.fetch_top_v3_pools(chain, variant, token_address)
+            )
+
+    async def refresh_snapshot(self, chain: str) -> PoolSnapshot:
+        """
+        Fetch the top pools of a chain and store them as the chain's latest snapshot
+        
+        The snapshot is published before its listeners run: they run as
+        background tasks, so the request that triggered the refresh does not
+        wait on the multicall read or the index builds. Their results (pool
+        state, path table, token index) are checked against the snapshot
+        version by their readers.
+        """
+        data = await self._fetch_pools(chain)
+        snapshot = PoolSnapshot.from_graphql(data['data']['topV3Pools'], chain)
+        self.snapshots[chain] = snapshot
+        
+        for listener in self.snapshot_listeners:
+            task = asyncio.create_task(self._run_snapshot_listener(listener, snapshot))
+            self._listener_tasks.add(task)
+            task.add_done_callback(self._listener_tasks.discard)
+        return snapshot
+
+    @staticmethod
+    async def _run_snapshot_listener(listener: Callable[[PoolSnapshot], Union[None, Awaitable[None]]], snapshot: PoolSnapshot) -> None:
+        try:
+            result = listener(snapshot)
+            if inspect.isawaitable(result):
+                await result
+        except Exception as e:
+            print(f"Error in snapshot listener for {snapshot.chain}: {e}")
+
+    async def get_snapshot(self, chain: str) -> PoolSnapshot:
+        """Latest snapshot of a chain, refreshed when older than snapshot_max_age"""
+        snapshot = self.snapshots.get(chain)
+        # Materialized answers must all come from the snapshot they are versioned with
+        if snapshot and (is_materializing() or time.time() - snapshot.fetched_at < self.snapshot_max_age):
+            return snapshot
+        
+        # Concurrent callers share one refresh; shielded so a cancelled caller does not abort it
+        pending = self._snapshot_refreshes.get(chain)
+        if pending is None:
+            pending = asyncio.ensure_future(self.refresh_snapshot(chain))
+            self._snapshot_refreshes[chain] = pending
+            pending.add_done_callback(lambda _: self._snapshot_refreshes.pop(chain, None))
+        return await asyncio.shield(pending)
+
+    def _schedule_canonical_answers(self, snapshot: PoolSnapshot) -> None:
+        if snapshot.chain in SUPPORTED_NETWORKS:
+            self.canonical_answers.schedule(snapshot.chain, snapshot.version)
+
+    async def _canonical_response(self, question: str, network: str) -> Dict[str, Any]:
+        """Handler response of a canonical question, formatted per output type by MaterializedAnswers"""
+        query_type = fast_intent(question) or await self._determine_query_type(question)
+        handler = self.api_handlers[query_type]
+        return await self.speculation.run_stage('handler', handler(question, chain_id=SUPPORTED_NETWORKS[network]['chain_id']))
+
+    async def _record_pool_history(self, snapshot: PoolSnapshot) -> None:
+        """Append the snapshot metrics to the local time-series store"""
+        if snapshot.chain in self.pool_state_readers:
+            return  # recorded with the pool prices once _refresh_pool_state has read them
+        await run_blocking(self.pool_history.append, snapshot)
+
+    async def _refresh_pool_state(self, snapshot: PoolSnapshot) -> None:
+        """Read the on-chain state of the snapshot pools in one pinned-block batch, then record the history"""
+        reader = self.pool_state_readers.get(snapshot.chain)
+        if reader:
+            state = None
+            try:
+                with profile_stage('multicall'):
+                    state = await reader.read(snapshot)
+                self.pool_states[snapshot.chain] = state
+            finally:
+                await run_blocking(self.pool_history.append, snapshot, state)
+
+    async def _build_path_table(self, snapshot: PoolSnapshot) -> None:
+        """Precompute USDC paths for every token of the snapshot"""
+        usdc = USDC_ADDRESSES.get(snapshot.chain)
+        if usdc:
+            self.path_tables[snapshot.chain] = await run_blocking(PathTable.build, snapshot, usdc)
+
+    async def _build_token_index(self, snapshot: PoolSnapshot) -> None:
+        """Index the snapshot pools by token"""
+        self.token_indexes[snapshot.chain] = await run_blocking(TokenIndex.build, snapshot)
+        # Fetched pools of formerly unknown tokens are refetched against the new snapshot
+        for key in [key for key in self._token_index_misses if key[0] == snapshot.chain]:
+            del self._token_index_misses[key]
+
+    async def find_pools(
+        self,
+        network: str,
+        token: str,
+        pair_token: Optional[str] = None,
+        limit: Optional[int] = None,
+        fetch: bool = True
+    ) -> List[TokenPool]:
+        """
+        Pools containing a token, or both tokens of a pair, deepest first
+        
+        Answered from the token index of the latest snapshot; a token the
+        snapshot does not know is looked up upstream with a tokenFilter query
+        once per snapshot.
+        
+        Args:
+            fetch: Refresh a stale snapshot and look unknown tokens up upstream;
+                when False only the loaded index is used, empty without one
+        """
+        index = self.token_indexes.get(network)
+        if fetch and (index is None or index.snapshot is not self.snapshots.get(network)):
+            await self.get_snapshot(network)
+            index = self.token_indexes.get(network)
+        if index is not None:
+            pools = index.pools(token, pair_token, limit)
+            if pools is not None:
+                return pools
+        if not fetch:
+            return []
+        
+        # Unknown token: every pool of a pair contains both tokens, so one filter is enough
+        unknown = token if index is None or token not in index else pair_token
+        key = (network, unknown.lower())
+        fetched = self._token_index_misses.get(key)
+        if fetched is None:
+            data = await self._fetch_pools(network, token_address=unknown, variant='tvl')
+            fetched = TokenIndex.build(PoolSnapshot.from_graphql(data['data']['topV3Pools'], network))
+            self._token_index_misses[key] = fetched
+        return fetched.pools(token, pair_token, limit) or []
+
+    def lookup_usdc_path(self, network: str, token: str, to_usdc: bool = False) -> Union[bytes, None]:
+        """Cached exactInput path USDC -> token (or token -> USDC), None when unknown"""
+        table = self.path_tables.get(network)
+        if table is None:
+            return None
+        return table.path_to_usdc(token) if to_usdc else table.path_from_usdc(token)
+
+    async def quote_split_route(self, network: str, token_in: str, token_out: str, amount_in: int) -> Union[SplitQuote, None]:
+        """
+        Split a swap over several routes of the local pool graph
+        
+        Needs on-chain pool state for the network (<NETWORK>_RPC_URL), returns
+        None without it or when no route connects the tokens.
+        """
+        snapshot = self.snapshots.get(network)
+        state = self.pool_states.get(network)
+        if snapshot is None or state is None or state.snapshot_version != snapshot.version:
+            return None
+        
+        router = self.split_routers.get(network)
+        if router is None or router.snapshot is not snapshot:
+            router = await run_blocking(SplitRouter, snapshot, state)
+            self.split_routers[network] = router
+        with profile_stage('split_route'):
+            return await run_blocking(router.optimize, token_in, token_out, int(amount_in))
+
+    async def score_network(self, network: str, lookback_days: float = 7, snapshot: Optional[PoolSnapshot] = None) -> Tuple[PoolSnapshot, PoolRiskScores]:
+        """Risk scores of the pools of a network (latest snapshot unless one is given)"""
+        snapshot = snapshot or await self.get_snapshot(network)
+        end = snapshot.fetched_at
+        timestamps, addresses, prices = await run_blocking(
+            self.pool_history.read_matrix, network, end - lookback_days * 86400, end, 'price'
+        )
+        # Pools without recorded on-chain prices get the fee tier's default volatility
+        volatility = snapshot_volatility(snapshot, timestamps, addresses, prices)
+        return snapshot, score_snapshot(snapshot, volatility)
+
+    async def _score_all_networks(self) -> Dict[str, Tuple[PoolSnapshot, PoolRiskScores]]:
+        """score_network on every supported network at once, networks without an answer in time are left out"""
+        return await fan_out(
+            {network: (lambda network=network: self.score_network(network)) for network in SUPPORTED_NETWORKS},
+            self.multi_network_timeout
+        )
+
+    async def suggest_farming_pools(self, network: str = 'BASE', top_n: int = 5, lookback_days: float = 7, min_tvl: float = 0.0) -> List[Dict[str, Any]]:
+        """
+        Rank the pools of a network by fee APR net of impermanent-loss and depth risk
+        
+        Pure local computation over the latest snapshot and the pool history.
+        
+        Returns:
+            [{"name", "addr", "apr", "risk", "score", "pathToken0", "pathToken1"}]
+            best first, apr/risk in basis points and paths (USDC -> token, hex,
+            None when unknown) as in SmartFarming.InfoSuggestPool
+        """
+        snapshot = self.snapshots.get(network) or await self.refresh_snapshot(network)
+        snapshot, scores = await self.score_network(network, lookback_days, snapshot)
+        suggestions = rank_farming_suggestions(snapshot, scores, top_n=top_n, min_tvl=min_tvl)
+        for suggestion in suggestions:
+            row = snapshot.row(snapshot.index_of(suggestion['addr']))
+            for key, token in (('pathToken0', row.token0_address), ('pathToken1', row.token1_address)):
+                path = self.lookup_usdc_path(network, token)
+                suggestion[key] = '0x' + path.hex() if path is not None else None
+        return suggestions
+
     async def query_pools(self, question: str, chain_id: int) -> str:
         """Query the vector database and get AI response for specific chain"""
         if chain_id not in SUPPORTED_CHAIN_IDS:
@@ -216,12 +436,13 @@ class UniswapPoolAgent:
         
         symbol_chain_name = SUPPORTED_CHAIN_IDS[chain_id]
 
-        pools_data = fetch_top_v3_pools_tvl(chain=symbol_chain_name)
+        snapshot = await self.speculation.claim('snapshot', lambda: self.get_snapshot(symbol_chain_name))
+        pools_data = self.context_serializer.pools(snapshot)
 
         template_prompt = """
             Given the following Uniswap V3 pool data and user question, provide a detailed analysis and answer:
 
-            Context about the pools:
+            Context about the pools (one pool per line, largest TVL first, USD amounts abbreviated with K/M/B):
             {pools_data}
 
             User Question: {question}
@@ -242,26 +463,78 @@ class UniswapPoolAgent:
             - Consider the specific chain context (BASE or Arbitrum)
         """
 
-        intent_prompt = PromptTemplate(template=template_prompt, input_variables=["pools_data", "question"])
+        intent_prompt = self._compiled_prompt('pool_info', template_prompt, ["pools_data", "question"])
 
-        # Create chain and get response
-        chain = intent_prompt | self.llm
-        response = chain.invoke({
+        # Get response from LLM
+        return await self._invoke_llm(intent_prompt, {
             "pools_data": pools_data,
-            "question": question,
-            "template_prompt": template_prompt
-        })
-        
-        return response.content
+            "question": question
+        }, stage='pool_info')
+
+    async def query_pools_all_networks(self, question: str, chain_id: Optional[int] = None) -> str:
+        """Answer a pool question over the merged, risk-ranked pools of every supported network"""
+        scored = await self.speculation.claim('network_scores', self._score_all_networks)
+        if not scored:
+            raise ValueError("No network returned pool data")
+        pools_data = self.context_serializer.network_pools(merge_network_scores(scored))
+
+        template_prompt = """
+            Given the following Uniswap V3 pools of several networks and user question, provide a detailed analysis and answer:
+
+            Pools of {networks}, one per line, best risk-adjusted return first (score = fee APR - risk, in bps).
+            tvl_share is the pool's share of its network's TVL and tvl_pct its TVL percentile within its network,
+            USD amounts abbreviated with K/M/B:
+            {pools_data}
+
+            User Question: {question}
+
+            Compare the networks on the same metrics and name the network of every pool you recommend.
+        """
+
+        intent_prompt = self._compiled_prompt('pool_info_all_networks', template_prompt, ["networks", "pools_data", "question"])
 
-    async def search_normal(self, question: str, chain_id: int) -> str:
-        chain = self.prompt | self.llm
-        response = chain.ainvoke({
-            "chain_id": chain_id,
+        return await self._invoke_llm(intent_prompt, {
+            "networks": ", ".join(scored),
+            "pools_data": pools_data,
+            "question": question
+        }, stage='pool_info')
+
+    async def search_normal(self, question: str, chain_id: Optional[int]) -> str:
+        chains = chain_id if chain_id is not None else ", ".join(str(info['chain_id']) for info in SUPPORTED_NETWORKS.values())
+        return await self._invoke_llm(self.prompt, {
+            "context": f"chain ID: {chains}",
             "question": question
         })
+
+    @staticmethod
+    def _template_hash(template: str) -> str:
+        return hashlib.sha1(template.encode()).hexdigest()[:12]
+
+    def _compiled_prompt(self, name: str, template: str, input_variables: List[str]) -> PromptTemplate:
+        """PromptTemplate of a stage, built on first use"""
+        prompt = self._prompts.get(name)
+        if prompt is None:
+            prompt = self._prompts[name] = PromptTemplate(template=template, input_variables=input_variables)
+            self._template_hashes[template] = self._template_hash(template)
+        return prompt
+
+    async def _invoke_llm(self, prompt: PromptTemplate, variables: Dict[str, Any], stage: str = 'rag') -> str:
+        """
+        Run a prompt through the LLM and return the response content
         
-        return response.content
+        All LLM calls go through here so they can be captured and replayed.
+        The stage selects the model and the hedging latency stats.
+        """
+        async def call():
+            return await self.llm_router.invoke(stage, prompt, variables)
+
+        with profile_stage('llm'):
+            if self.traffic.mode == 'off':
+                return await call()
+            # Capture record, only built when capturing or replaying
+            template = self._template_hashes.get(prompt.template) or self._template_hash(prompt.template)
+            request = {"stage": stage, "template": template, "prompt": prompt.format(**variables)}
+            return await self.traffic.exchange('llm', request, call)
 
     async def update_pool_data(self):
         """Fetch latest pool data and update the database for all supported networks"""
@@ -270,11 +543,10 @@ class UniswapPoolAgent:
             for chain in SUPPORTED_NETWORKS:
                 try:
                     # Fetch new data for each chain
-                    data = fetch_top_v3_pools_tvl(chain=chain)
-                    pools = data['data']['topV3Pools']
+                    snapshot = await self.refresh_snapshot(chain)
                     
                     # Process and store new data
-                    self.process_pool_data(pools, chain)
+                    await self.process_pool_data(snapshot)
                 except Exception as e:
                     print(f"Error updating pool data for {chain}: {e}")
                     success = False
@@ -411,6 +683,99 @@ class UniswapPoolAgent:
                 "details": str(e)
             }
 
+    async def _extract_swap_params(self, query: str, chain_id: int) -> Dict[str, Any]:
+        """
+        Extract token addresses, amount and chain of a swap question with the LLM
+        
+        Returns:
+            Dict with token_in, token_out, amount, decimals, amount_in_wei, chain_id
+        """
+        # Get chain name for prompt from chain_id
+        chain_name = next((name for name, info in SUPPORTED_NETWORKS.items() 
+                         if info['chain_id'] == chain_id), 'BASE')
+
+        # Define prompt template for extracting swap parameters
+        swap_template = """
+        Extract the following information from the query:
+        1. Input token address (format: 0x...)
+        2. Output token address (format: 0x...)
+        3. Input amount and decimals
+        4. Chain/Network (if specified, default to {chain})
+
+        Query: {query}
+
+        Consider:
+        - Token addresses are 42 characters long starting with '0x'
+        - Amount should be converted to wei based on token decimals
+        - If decimals are specified, use them for conversion
+        - If decimals aren't specified, assume:
+          * USDC, USDT, DAI = 6 decimals
+          * Most other tokens = 18 decimals
+        - If amount is not specified, use default of 1 token
+        - Supported networks: {networks}
+        - Convert network names to chain IDs:
+          {chain_mappings}
+
+        Return in JSON format:
+        {{
+            "token_in": "address",
+            "token_out": "address",
+            "amount": "number",
+            "decimals": "number",
+            "amount_in_wei": "amount converted to wei string",
+            "chain_id": "number"
+        }}
+
+        Example 1:
+        For "1 USDC (0x833... - decimals 6) to 1INCH on Base"
+        {{
+            "token_in": "0x833589fcd6edb6e08f4c7c32d4f71b54bda02913",
+            "token_out": "0xc5fecc3a29fb57b5024eec8a2239d4621e111cbe",
+            "amount": 1,
+            "decimals": 6,
+            "amount_in_wei": "1000000",
+            "chain_id": 8453
+        }}
+
+        Answer:"""
+
+        # Create chain mappings string for prompt
+        chain_mappings = "\n              ".join(
+            [f"{name}: {info['chain_id']}" for name, info in SUPPORTED_NETWORKS.items()]
+        )
+
+        swap_prompt = self._compiled_prompt('swap_params', swap_template, ["query", "chain", "networks", "chain_mappings"])
+
+        # Get response from LLM
+        content = await self._invoke_llm(swap_prompt, {
+            "query": query,
+            "chain": chain_name,
+            "networks": ", ".join(SUPPORTED_NETWORKS.keys()),
+            "chain_mappings": chain_mappings
+        }, stage='swap_params')
+
+        # Parse the JSON response
+        try:
+            # Clean up markdown formatting from AI response
+            content = content.strip()
+            # Remove markdown code block markers if present
+            if content.startswith('```json\n'):
+                content = content[8:]  # Remove ```json\n
+            if content.endswith('\n```'):
+                content = content[:-4]  # Remove \n```
+            # Remove any remaining ``` markers
+            content = content.replace('```', '')
+
+            # Parse the cleaned JSON
+            params = json.loads(content.strip())
+
+        except json.JSONDecodeError as e:
+            print(f"Failed to parse AI response: {content}")
+            print(f"JSON error: {e}")
+            raise ValueError("Failed to parse AI response as JSON")
+        
+        return params
+
     async def _handle_swap_path_query(self, query: str, chain_id: int = 8453) -> Dict[str, Any]:
         """
         Handle swap path query and return quote data
@@ -427,95 +792,69 @@ class UniswapPoolAgent:
             }
         """
         try:
-            # Get chain name for prompt from chain_id
-            chain_name = next((name for name, info in SUPPORTED_NETWORKS.items() 
-                             if info['chain_id'] == chain_id), 'BASE')
-            
-            # Define prompt template for extracting swap parameters
-            swap_template = """
-            Extract the following information from the query:
-            1. Input token address (format: 0x...)
-            2. Output token address (format: 0x...)
-            3. Input amount and decimals
-            4. Chain/Network (if specified, default to {chain})
-            
-            Query: {query}
-
-            Consider:
-            - Token addresses are 42 characters long starting with '0x'
-            - Amount should be converted to wei based on token decimals
-            - If decimals are specified, use them for conversion
-            - If decimals aren't specified, assume:
-              * USDC, USDT, DAI = 6 decimals
-              * Most other tokens = 18 decimals
-            - If amount is not specified, use default of 1 token
-            - Supported networks: {networks}
-            - Convert network names to chain IDs:
-              {chain_mappings}
-
-            Return in JSON format:
-            {{
-                "token_in": "address",
-                "token_out": "address",
-                "amount": "number",
-                "decimals": "number",
-                "amount_in_wei": "amount converted to wei string",
-                "chain_id": "number"
-            }}
-
-            Example 1:
-            For "1 USDC (0x833... - decimals 6) to 1INCH on Base"
-            {{
-                "token_in": "0x833589fcd6edb6e08f4c7c32d4f71b54bda02913",
-                "token_out": "0xc5fecc3a29fb57b5024eec8a2239d4621e111cbe",
-                "amount": 1,
-                "decimals": 6,
-                "amount_in_wei": "1000000",
-                "chain_id": 8453
-            }}
+            params = await self.speculation.claim('swap_params', lambda: self._extract_swap_params(query, chain_id))
+        except Exception as e:
+            return self._swap_error(query, chain_id, e)
+        return await self._quote_swap(query, params, chain_id)
 
-            Answer:"""
+    async def _handle_multi_network_swap(self, query: str, chain_id: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Quote a swap on every network that lists both tokens, concurrently
+        
+        Returns:
+            The _handle_swap_path_query response of the network with the largest
+            output, with every network's outcome under data.networks
+        """
+        try:
+            params = await self.speculation.claim('swap_params', lambda: self._extract_swap_params(query, chain_id))
+        except Exception as e:
+            return self._swap_error(query, chain_id, e)
+        
+        token_in, token_out = str(params.get('token_in', '')), str(params.get('token_out', ''))
+        networks = [
+            network for network, index in self.token_indexes.items()
+            if network in SUPPORTED_NETWORKS and token_in and token_out and token_in in index and token_out in index
+        ] or list(SUPPORTED_NETWORKS)
+        
+        def quote(network: str):
+            network_chain_id = SUPPORTED_NETWORKS[network]['chain_id']
+            return self._quote_swap(query, {**params, 'chain_id': network_chain_id}, network_chain_id)
+        
+        responses = await fan_out({network: (lambda network=network: quote(network)) for network in networks}, self.multi_network_timeout)
+        if not responses:
+            return self._swap_error(query, chain_id, ValueError(f"No quote from {', '.join(networks)}"))
+        
+        def output_amount(response: Dict[str, Any]) -> int:
+            return int(response['data'].get('response', {}).get('output_amount') or 0) if response.get('success') else -1
+        
+        best_network = max(responses, key=lambda network: output_amount(responses[network]))
+        best = responses[best_network]
+        best["data"]["networks"] = [
+            {
+                "network": network,
+                "success": response.get('success', False),
+                "output_amount": response['data'].get('response', {}).get('output_amount'),
+                "error": response.get('error')
+            }
+            for network, response in responses.items()
+        ]
+        return best
 
-            # Create chain mappings string for prompt
-            chain_mappings = "\n              ".join(
-                [f"{name}: {info['chain_id']}" for name, info in SUPPORTED_NETWORKS.items()]
-            )
+    def _swap_error(self, query: str, chain_id: int, error: Exception) -> Dict[str, Any]:
+        return {
+            "success": False,
+            "data": {
+                "request": {
+                    "query": query,
+                    "chain_id": chain_id
+                }
+            },
+            "error": str(error)
+        }
 
-            swap_prompt = PromptTemplate(
-                template=swap_template, 
-                input_variables=["query", "chain", "networks", "chain_mappings"]
-            )
-            
-            # Create chain and get response
-            chain = swap_prompt | self.llm
-            response = await chain.ainvoke({
-                "query": query,
-                "chain": chain_name,
-                "networks": ", ".join(SUPPORTED_NETWORKS.keys()),
-                "chain_mappings": chain_mappings
-            })
-            
-            # Parse the JSON response
-            import json
-            try:
-                # Clean up markdown formatting from AI response
-                content = response.content.strip()
-                # Remove markdown code block markers if present
-                if content.startswith('```json\n'):
-                    content = content[8:]  # Remove ```json\n
-                if content.endswith('\n```'):
-                    content = content[:-4]  # Remove \n```
-                # Remove any remaining ``` markers
-                content = content.replace('```', '')
-                
-                # Parse the cleaned JSON
-                params = json.loads(content.strip())
-                
-            except json.JSONDecodeError as e:
-                print(f"Failed to parse AI response: {response.content}")
-                print(f"JSON error: {e}")
-                raise ValueError("Failed to parse AI response as JSON")
-            
+    async def _quote_swap(self, query: str, params: Dict[str, Any], chain_id: int) -> Dict[str, Any]:
+        """Validate extracted swap parameters and quote the swap, same result shape as _handle_swap_path_query"""
+        try:
             # Validate token addresses
             for key in ['token_in', 'token_out']:
                 if not params.get(key) or not Web3.is_address(params[key]):
@@ -529,13 +868,32 @@ class UniswapPoolAgent:
             # Use the amount_in_wei directly from AI response
             amount_in = params.get('amount_in_wei', '1000000000000000000')  # Default to 1 token with 18 decimals
             
+            # Prefer on-chain decimals over the LLM's guess when the chain has an RPC configured
+            resolver = self.token_resolvers.get(SUPPORTED_CHAIN_IDS.get(detected_chain_id))
+            if resolver and params.get('amount') is not None:
+                try:
+                    token_in = await resolver.get(params['token_in'])
+                except Exception as e:
+                    # Keep the LLM's amount_in_wei rather than failing the quote
+                    print(f"Error resolving decimals of {params['token_in']}: {e}")
+                    token_in = None
+                if token_in:
+                    params['decimals'] = token_in.decimals
+                    amount_in = str(int(Decimal(str(params['amount'])) * 10 ** token_in.decimals))
+            
             # Get quote from Uniswap API
-            quote_response = await self._get_quote(
-                token_in=params['token_in'],
-                token_out=params['token_out'],
-                amount_in=amount_in,
-                chain_id=detected_chain_id
-            )
+            quote_request = {
+                "token_in": params['token_in'],
+                "token_out": params['token_out'],
+                "amount_in": amount_in,
+                "chain_id": detected_chain_id
+            }
+            with profile_stage('quote'):
+                quote_response = await self.traffic.exchange(
+                    'quote',
+                    quote_request,
+                    lambda: self._get_quote(**quote_request)
+                )
             
             # Prepare base response with input parameters
             response = {
@@ -561,6 +919,44 @@ class UniswapPoolAgent:
             # Add the complete API response
             response["data"]["api_response"] = quote_response
             
+            # Precomputed USDC path when one side of the swap is USDC
+            network = SUPPORTED_CHAIN_IDS.get(detected_chain_id)
+            usdc = USDC_ADDRESSES.get(network, '')
+            if params['token_in'].lower() == usdc:
+                path = self.lookup_usdc_path(network, params['token_out'])
+            elif params['token_out'].lower() == usdc:
+                path = self.lookup_usdc_path(network, params['token_in'], to_usdc=True)
+            else:
+                path = None
+            if path:
+                response["data"]["usdc_path"] = '0x' + path.hex()
+            
+            # Pools pairing the two tokens directly, from whatever token index is
+            # loaded: the quote must not wait on a snapshot refresh or a lookup
+            try:
+                direct_pools = await self.find_pools(network, params['token_in'], params['token_out'], limit=3, fetch=False)
+            except Exception as e:
+                print(f"Error looking up pools of {params['token_in']}/{params['token_out']}: {e}")
+                direct_pools = []
+            if direct_pools:
+                response["data"]["direct_pools"] = [
+                    {"address": pool.address, "fee_tier": pool.fee_tier, "tvl": round(pool.tvl, 2)}
+                    for pool in direct_pools
+                ]
+            
+            # Split over several routes when the local pool graph has the state for it
+            split = await self.quote_split_route(network, params['token_in'], params['token_out'], int(amount_in))
+            if split and len(split.splits) > 1:
+                response["data"]["split_route"] = {
+                    "amount_out": str(split.amount_out),
+                    "single_route_out": str(split.single_route_out),
+                    "improvement_bps": round(split.improvement_bps, 2),
+                    "routes": [
+                        {"path": '0x' + route.path.hex(), "share": round(route.share, 4), "amount_in": str(route.amount_in)}
+                        for route in split.splits
+                    ]
+                }
+            
             # Check if we have a valid quote with route
             if 'quote' not in quote_response:
                 response["error"] = "No quote data in response"
@@ -587,16 +983,7 @@ class UniswapPoolAgent:
             return response
             
         except Exception as e:
-            return {
-                "success": False,
-                "data": {
-                    "request": {
-                        "query": query,
-                        "chain_id": chain_id
-                    }
-                },
-                "error": str(e)
-            }
+            return self._swap_error(query, chain_id, e)
 
     async def _determine_query_type(self, query: str) -> str:
         """
@@ -625,15 +1012,19 @@ class UniswapPoolAgent:
 
         Answer:"""
 
-        intent_prompt = PromptTemplate(template=intent_template, input_variables=["query"])
+        # Unambiguous prompts skip the LLM
+        intent = fast_intent(query)
+        if intent:
+            return intent
+        
+        intent_prompt = self._compiled_prompt('intent', intent_template, ["query"])
         
         try:
-            chain = intent_prompt | self.llm
-            response = await chain.ainvoke({
+            content = await self._invoke_llm(intent_prompt, {
                 "query": query
-            })
+            }, stage='intent')
             
-            intent = response.content.strip().lower()
+            intent = content.strip().lower()
             
             if intent not in ['swap_path', 'pool_info', 'other']:
                 return ''
@@ -734,21 +1125,20 @@ class UniswapPoolAgent:
 
         try:
             # Create prompt with required variables
-            format_prompt = PromptTemplate(
-                template=format_template,
-                input_variables=["question", "response", "output_type"]
-            )
+            format_prompt = self._compiled_prompt('format', format_template, ["question", "response", "output_type"])
             
+            with profile_stage('serialize'):
+                response_json = self.context_serializer.response(raw_response)
+
             # Get AI response
-            chain = format_prompt | self.llm
-            ai_response = await chain.ainvoke({
+            content = await self._invoke_llm(format_prompt, {
                 "question": question,
-                "response": json.dumps(raw_response, indent=2),
+                "response": response_json,
                 "output_type": output_type
-            })
+            }, stage='format')
             
             # Parse AI response
-            content = ai_response.content.strip()
+            content = content.strip()
             if content.startswith('```json\n'):
                 content = content[8:]
             if content.endswith('\n```'):
@@ -767,7 +1157,7 @@ class UniswapPoolAgent:
             elif output_type == OutputType.BYTES:
                 value = formatted['value']
                 result["value"] = value
-            if output_type == OutputType.UINT256:
+            elif output_type == OutputType.UINT256:
                 result["value"] = int(formatted['value'])
             elif output_type == OutputType.STRING_AND_BOOL:
                 value = formatted['value']
@@ -826,25 +1216,43 @@ class UniswapPoolAgent:
         """
         # Normalize network name and validate
         network = network.upper()
-        if network not in SUPPORTED_NETWORKS:
+        multi_network = network == ALL_NETWORKS
+        if not multi_network and network not in SUPPORTED_NETWORKS:
             raise ValueError(f"Unsupported network: {network}")
         
-        # Get chain_id from network name
-        chain_id = SUPPORTED_NETWORKS[network]['chain_id']
+        # Get chain_id from network name (None when comparing every network)
+        chain_id = None if multi_network else SUPPORTED_NETWORKS[network]['chain_id']
+        handlers = self.multi_network_handlers if multi_network else self.api_handlers
         
+        # Canonical questions are answered from memory for the current snapshot
+        materialized = None if multi_network else self.canonical_answers.lookup(question, network, output_type)
+        if materialized is not None:
+            return materialized
+        
+        scope = self.speculation.open_scope()
         try:
+            # Without a keyword match, start the likely handlers' independent work
+            # while the intent LLM runs; close_scope cancels what goes unused
+            query_type = fast_intent(question)
+            if query_type is None:
+                self._speculate(question, network, chain_id)
+            
             # Determine query type using AI
-            query_type = await self._determine_query_type(question)
+            with profile_stage('intent'):
+                if query_type is None:
+                    query_type = await self.speculation.run_stage('intent', self._determine_query_type(question))
             
             # Get appropriate handler
-            handler = self.api_handlers.get(query_type)
+            handler = handlers.get(query_type)
             if not handler:
                 raise ValueError(f"No handler found for query type: {query_type}")
             
-            raw_response = await handler(question, chain_id=chain_id)
+            with profile_stage('handler'):
+                raw_response = await self.speculation.run_stage('handler', handler(question, chain_id=chain_id))
             
             # Use AI to format the response according to output_type and original question
-            return await self._format_output(raw_response, output_type, question)
+            with profile_stage('format'):
+                return await self.speculation.run_stage('format', self._format_output(raw_response, output_type, question))
             
         except Exception as e:
             print(f"Error processing request: {e}")
@@ -858,11 +1266,32 @@ class UniswapPoolAgent:
             elif output_type == OutputType.STRING_AND_BOOL:
                 return ("Error processing request", False)
             raise
+        finally:
+            self.speculation.close_scope(scope)
+
+    def _speculate(self, question: str, network: str, chain_id: Optional[int]) -> None:
+        """Start the work of the handlers a question may need before its intent is known"""
+        # Cheap when the snapshots are fresh, needed by pool_info
+        if network == ALL_NETWORKS:
+            self.speculation.start('network_scores', self._score_all_networks)
+        else:
+            self.speculation.start('snapshot', lambda: self.get_snapshot(network))
+        # An LLM call, only worth it when the question names token addresses
+        if ADDRESS_PATTERN.search(question):
+            self.speculation.start('swap_params', lambda: self._extract_swap_params(question, chain_id))
 
     async def close(self):
         """Close the API client session"""
         if self.session and not self.session.closed:
             await self.session.close()
+        for task in self._listener_tasks:
+            task.cancel()
+        await asyncio.gather(*self._listener_tasks, return_exceptions=True)
+        await self.graphql.close()
+        await self.canonical_answers.close()
+        self.traffic.close()
+        if self.embedding_pool:
+            self.embedding_pool.shutdown()
 
     def __del__(self):
         """Cleanup when object is destroyed"""
@@ -873,4 +1302,6 @@ class UniswapPoolAgent:
         """Initialize async components"""
         if self.session is None:
             self.session = aiohttp.ClientSession()
+            if self.embedding_pool:
+                await self.embedding_pool.start()
         return self
@@ -0,0 +1,249 @@
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from adcs_listener import DataRequestListener, JobRegistry
+from fulfillment_submitter import FulfillmentSubmitter
+from multicall_reader import LIQUIDITY_SELECTOR, SLOT0_SELECTOR, MulticallClient, PoolStateReader
+from pool_snapshot import PoolSnapshot
+from result_store import CONFIRMED, FAILED, ResultStore
+from uniswap_provider import OutputType
+from web3 import Web3
+
+# End-to-end run of the ADCS listener, fulfillment submitter and multicall
+# reader against a local dev chain.
+#
+#   anvil --fork-url $BASE_PROVIDER     Base fork: every check, pool reads included
+#   anvil                               plain chain: pool reads are skipped
+#   (cd ../../adcs && forge build)      ADCSCoordinator artifact
+#   python adcs_devchain.py
+#
+# Deploys ADCSCoordinator, emits DataRequested events from a requester account
+# and asserts that requests are fulfilled on-chain, that a result computed
+# before a crash is resubmitted by a restarted listener without recomputing it,
+# that a failed submission is retried by the running listener, that error
+# results are never submitted, and that batched pool reads match direct calls.
+
+RPC_URL = os.getenv('DEVCHAIN_RPC_URL', 'http://127.0.0.1:8545')
+ARTIFACTS = os.getenv('ADCS_ARTIFACTS', os.path.join(os.path.dirname(__file__), '..', '..', 'adcs', 'out'))
+# First two default anvil / hardhat accounts: coordinator owner and oracle, requester
+ORACLE_KEY = '0xac0974bec39a17e36ba4a6b4d238ff944bacb478cbed5efcae784d7bf4f2ff80'
+REQUESTER_KEY = '0x59c6995e998f97a5a0044966f0945389dc9e86dae88c7a8412f4603b6b78690d'
+CALLBACK_GAS_LIMIT = 500_000
+TIMEOUT = 30.0
+
+JOB_ANSWER = b'devchain-answer'.ljust(32, b'\x00')
+JOB_ERROR = b'devchain-error'.ljust(32, b'\x00')
+
+# Base Uniswap V3 factory and the USDC / WETH pair of its fee tiers
+BASE_CHAIN_ID = 8453
+BASE_FACTORY = '0x33128a8fC17869897dcE68Ed026d694621f6FDfD'
+BASE_USDC = '0x833589fCD6eDb6E08f4c7C32D4f71b54bdA02913'
+BASE_WETH = '0x4200000000000000000000000000000000000006'
+FACTORY_ABI = [{
+    "name": "getPool",
+    "type": "function",
+    "stateMutability": "view",
+    "inputs": [{"name": "tokenA", "type": "address"}, {"name": "tokenB", "type": "address"}, {"name": "fee", "type": "uint24"}],
+    "outputs": [{"name": "", "type": "address"}],
+}]
+
+
+class FixedAnswerAdapter:
+    """AdapterInterface stand-in answering every request with a fixed value, counting calls"""
+
+    class _Agent:
+        snapshots = {}
+
+    def __init__(self, answer: int):
+        self.answer = answer
+        self.agent = self._Agent()
+        self.calls = 0
+
+    async def process_request(self, request):
+        self.calls += 1
+        if request.prompt == 'error':
+            return 0  # handle_request's fallback value
+        return {"explanation": "devchain answer", "value": self.answer}
+
+
+def load_artifact(name: str):
+    with open(os.path.join(ARTIFACTS, f"{name}.sol", f"{name}.json"), 'r') as f:
+        artifact = json.load(f)
+    return artifact['abi'], artifact['bytecode']['object']
+
+
+def transact(web3: Web3, key: str, function=None, deploy=None):
+    account = web3.eth.account.from_key(key)
+    builder = function or deploy
+    transaction = builder.build_transaction({"from": account.address, "nonce": web3.eth.get_transaction_count(account.address)})
+    signed = account.sign_transaction(transaction)
+    raw = getattr(signed, 'raw_transaction', None) or signed.rawTransaction
+    receipt = web3.eth.wait_for_transaction_receipt(web3.eth.send_raw_transaction(raw))
+    assert receipt['status'] == 1, receipt
+    return receipt
+
+
+def deploy_coordinator(web3: Web3):
+    abi, bytecode = load_artifact('ADCSCoordinator')
+    receipt = transact(web3, ORACLE_KEY, deploy=web3.eth.contract(abi=abi, bytecode=bytecode).constructor())
+    coordinator = web3.eth.contract(address=receipt['contractAddress'], abi=abi)
+    transact(web3, ORACLE_KEY, coordinator.functions.setConfig(2_500_000, 0))
+    transact(web3, ORACLE_KEY, coordinator.functions.registerOracle(web3.eth.account.from_key(ORACLE_KEY).address))
+    return coordinator
+
+
+def request_data(web3: Web3, coordinator, job_id: bytes) -> int:
+    """Emit a DataRequested event without CBOR data, so the job's defaults apply"""
+    request = (job_id, web3.eth.account.from_key(REQUESTER_KEY).address, b'\x00' * 4, 0, (b'', 0))
+    receipt = transact(web3, REQUESTER_KEY, coordinator.functions.requestData(CALLBACK_GAS_LIMIT, request))
+    return coordinator.events.DataRequested().process_receipt(receipt)[0]['args']['requestId']
+
+
+async def wait_for_status(store: ResultStore, request_id: int, status: str) -> None:
+    deadline = time.monotonic() + TIMEOUT
+    while time.monotonic() < deadline:
+        stored = store.get(request_id)
+        if stored is not None and stored.status == status:
+            return
+        await asyncio.sleep(0.2)
+    raise AssertionError(f"Request {request_id} is {store.get(request_id)}, expected {status}")
+
+
+def fulfilled(coordinator, request_id: int) -> bool:
+    return not any(coordinator.functions.getCommitment(request_id).call())
+
+
+async def check_fulfillment(web3, coordinator, workdir):
+    adapter = FixedAnswerAdapter(42)
+    store = ResultStore(os.path.join(workdir, 'results.sqlite3'))
+    submitter = await FulfillmentSubmitter(
+        RPC_URL, coordinator.address, ORACLE_KEY, poll_interval=0.2, result_store=store
+    ).start()
+    jobs = JobRegistry({
+        '0x' + JOB_ANSWER.hex(): {"network": "BASE", "output_type_id": OutputType.UINT256.value, "prompt": "answer"},
+        '0x' + JOB_ERROR.hex(): {"network": "BASE", "output_type_id": OutputType.UINT256.value, "prompt": "error"},
+    })
+    start_block = web3.eth.block_number + 1
+
+    def make_listener(on_result):
+        return DataRequestListener(
+            adapter, RPC_URL, coordinator.address, jobs,
+            checkpoint_path=os.path.join(workdir, 'checkpoint.json'),
+            start_block=start_block,
+            poll_interval=0.2,
+            on_result=on_result,
+            result_store=store,
+            resubmit_interval=0.5
+        )
+
+    # Fulfillment
+    listener = make_listener(submitter.on_result)
+    running = asyncio.create_task(listener.run())
+    answered = request_data(web3, coordinator, JOB_ANSWER)
+    await wait_for_status(store, answered, CONFIRMED)
+    assert fulfilled(coordinator, answered)
+    print(f"fulfilled request {answered}")
+
+    # Error results are stored as failed and never submitted
+    errored = request_data(web3, coordinator, JOB_ERROR)
+    await wait_for_status(store, errored, FAILED)
+    assert not fulfilled(coordinator, errored)
+    print(f"error result of request {errored} not submitted")
+
+    # A failed submission is retried by the running listener
+    failures = []
+
+    async def fail_once(request, adapter_request, result):
+        if not failures:
+            failures.append(request.request_id)
+            raise RuntimeError("simulated RPC failure")
+        return await submitter.on_result(request, adapter_request, result)
+
+    listener.on_result = fail_once
+    retried = request_data(web3, coordinator, JOB_ANSWER)
+    await wait_for_status(store, retried, CONFIRMED)
+    assert failures == [retried] and fulfilled(coordinator, retried)
+    print(f"failed submission of request {retried} retried")
+    listener.stop()
+    await running
+
+    # Crash between computing a result and submitting it
+    async def hang(request, adapter_request, result):
+        await asyncio.Event().wait()
+
+    crashed = make_listener(hang)
+    running = asyncio.create_task(crashed.run())
+    resumed = request_data(web3, coordinator, JOB_ANSWER)
+    deadline = time.monotonic() + TIMEOUT
+    while store.get(resumed) is None and time.monotonic() < deadline:
+        await asyncio.sleep(0.2)
+    running.cancel()
+    await asyncio.gather(running, return_exceptions=True)
+    calls = adapter.calls
+
+    restarted = make_listener(submitter.on_result)
+    running = asyncio.create_task(restarted.run())
+    await wait_for_status(store, resumed, CONFIRMED)
+    restarted.stop()
+    await running
+    assert fulfilled(coordinator, resumed)
+    assert adapter.calls == calls, "the stored result must be reused after a restart"
+    print(f"request {resumed} resubmitted after restart without recomputing")
+
+    await submitter.stop()
+    stats = submitter.stats()
+    assert stats["reverted"] == 0 and stats["dropped"] == 0, stats
+    print(json.dumps(stats))
+    store.close()
+
+
+async def check_pool_reads(web3):
+    if web3.eth.chain_id != BASE_CHAIN_ID:
+        print("not a Base fork, skipping batched pool reads")
+        return
+    factory = web3.eth.contract(address=BASE_FACTORY, abi=FACTORY_ABI)
+    pools = []
+    for fee in (100, 500, 3000, 10000):
+        address = factory.functions.getPool(BASE_USDC, BASE_WETH, fee).call()
+        if int(address, 16):
+            pools.append({
+                "address": address, "feeTier": fee,
+                "token0": {"address": BASE_USDC, "symbol": "USDC"}, "token1": {"address": BASE_WETH, "symbol": "WETH"},
+            })
+    # Not a pool: its calls fail and only its row is marked unreadable
+    pools.append({"address": BASE_USDC, "token0": {}, "token1": {}})
+    snapshot = PoolSnapshot.from_graphql(pools, 'BASE')
+
+    # Chunks of three calls split every read over several aggregate3 requests
+    reader = PoolStateReader(MulticallClient(RPC_URL, chunk_size=3))
+    block = web3.eth.block_number
+    state = await reader.read(snapshot, block)
+    for index, address in enumerate(snapshot.pool_addresses[:-1]):
+        target = Web3.to_checksum_address(address)
+        slot0 = web3.eth.call({"to": target, "data": Web3.to_hex(SLOT0_SELECTOR)}, block)
+        liquidity = web3.eth.call({"to": target, "data": Web3.to_hex(LIQUIDITY_SELECTOR)}, block)
+        assert state.ok[index] == 1
+        assert state.tick[index] == int.from_bytes(slot0[32:64], 'big', signed=True)
+        assert state.liquidity[index] == float(int.from_bytes(liquidity[:32], 'big'))
+    assert state.ok[len(snapshot) - 1] == 0
+    print(f"batched reads of {len(snapshot)} pools at block {block} match direct calls")
+
+
+async def main():
+    web3 = Web3(Web3.HTTPProvider(RPC_URL))
+    if not web3.is_connected():
+        raise SystemExit(f"No dev chain at {RPC_URL}, start one with `anvil` or `anvil --fork-url $BASE_PROVIDER`")
+    coordinator = deploy_coordinator(web3)
+    print(f"ADCSCoordinator deployed at {coordinator.address}")
+    with tempfile.TemporaryDirectory() as workdir:
+        await check_fulfillment(web3, coordinator, workdir)
+    await check_pool_reads(web3)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,53 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from backtester import BacktestData, make_policy_grid, simulate
+
+# Backtests over histories shorter than the volatility lookback.
+#
+#   python backtester_short_history.py
+#
+# A 7 day run at an hourly interval has fewer steps than the 168 and 336 step
+# lookbacks of the CLI grid; the rolling volatility must still cover it.
+
+
+def synthetic_history(steps: int, pools: int = 5, interval: float = 3600.0, seed: int = 3) -> BacktestData:
+    rng = np.random.default_rng(seed)
+    tvl = rng.uniform(1e5, 1e7, pools) * np.exp(np.cumsum(rng.normal(0, 0.01, (steps, pools)), axis=0))
+    volume = tvl * rng.uniform(0.05, 0.5, pools)
+    price = np.exp(np.cumsum(rng.normal(0, 0.02, (steps, pools)), axis=0))
+    return BacktestData(
+        timestamps=np.arange(steps) * interval,
+        addresses=['0x%040x' % (i + 1) for i in range(pools)],
+        fee_tier=rng.choice([500, 3000, 10000], pools).astype(np.int64),
+        tvl=tvl,
+        volume_24h=volume,
+        price=price,
+    )
+
+
+def main():
+    grid = make_policy_grid(
+        rebalance_steps=(6, 24),
+        lookback_steps=(24, 168, 336),
+        risk_weight=(0.0, 1.0),
+    )
+    for steps in (2, 24, 100, 168, 169):
+        result = simulate(synthetic_history(steps), grid)
+        assert result.final_value.shape == (len(grid.risk_weight),)
+        assert np.all(np.isfinite(result.final_value)), steps
+        print(f"{steps:4d} steps: final value {result.final_value.min():.4f} .. {result.final_value.max():.4f}")
+
+    try:
+        simulate(synthetic_history(24), make_policy_grid(rebalance_steps=(0,)))
+    except ValueError as e:
+        print(f"rebalance_steps=0 rejected: {e}")
+    else:
+        raise AssertionError("rebalance_steps=0 was accepted")
+
+if __name__ == "__main__":
+    main()
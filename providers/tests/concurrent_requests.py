@@ -0,0 +1,67 @@
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from canonical_answers import match_canonical
+from concurrency import EventLoopLagMonitor
+from uniswap_provider import OutputType, UniswapPoolAgent
+
+# N parallel requests should take about as long as the slowest one, not the sum
+#
+# Every pass starts from a fresh agent (cold snapshot cache) and none of the
+# questions is canonical, so both passes go through the full handler path.
+
+QUESTIONS = [
+    "Which WETH pool has the highest TVL and APR on BASE?",
+    "Which pool with more than 1M TVL has the highest 24h volume on BASE?",
+    "What is the best path to swap amount 1 USDC ( 0x833589fcd6edb6e08f4c7c32d4f71b54bda02913 ) to ZRX ( 0x3bB4445D30AC020a84c1b5A8A2C6248ebC9779D0) on BASE?",
+    "Which USDC pool has the lowest fee tier and the most liquidity on BASE?",
+]
+assert not any(match_canonical(question) for question in QUESTIONS), "canonical questions are answered from memory"
+
+
+async def timed(agent, question):
+    start = time.perf_counter()
+    await agent.handle_request(question, OutputType.STRING_AND_BOOL, network='BASE')
+    return time.perf_counter() - start
+
+
+async def sequential_pass():
+    agent = await UniswapPoolAgent().initialize()
+    try:
+        return [await timed(agent, question) for question in QUESTIONS]
+    finally:
+        await agent.close()
+
+
+async def parallel_pass():
+    agent = await UniswapPoolAgent().initialize()
+    try:
+        start = time.perf_counter()
+        await asyncio.gather(*(timed(agent, question) for question in QUESTIONS))
+        return time.perf_counter() - start
+    finally:
+        await agent.close()
+
+
+async def main():
+    monitor = EventLoopLagMonitor(threshold=0.1)
+    monitor.start()
+    try:
+        sequential = await sequential_pass()
+        parallel = await parallel_pass()
+
+        print(f"slowest single request: {max(sequential):.2f}s")
+        print(f"sum of single requests: {sum(sequential):.2f}s")
+        print(f"{len(QUESTIONS)} parallel requests:   {parallel:.2f}s")
+        print(f"event loop stalls over 100ms: {monitor.stalls} (max lag {monitor.max_lag * 1000:.0f} ms)")
+
+        assert parallel < max(sequential) * 1.5, "parallel requests are serialized somewhere on the event loop"
+    finally:
+        await monitor.stop()
+
+
+asyncio.run(main())
@@ -0,0 +1,139 @@
+import json
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from response_encoding import OCTET_STREAM_MEDIA_TYPE, dumps_json, dumps_msgpack, encode, msgpack, orjson
+
+try:
+    from fastapi.encoders import jsonable_encoder
+except ImportError:
+    jsonable_encoder = None
+
+# Serialization cost of /query responses and swap quote payloads.
+#
+#   python serialization_benchmark.py
+#
+# Compares the standard library encoder (what the former FastAPI default path
+# ends with), FastAPI's jsonable_encoder + json.dumps when FastAPI is installed,
+# the server's dumps_json (orjson when installed) and MessagePack.
+
+random.seed(11)
+USDC = {"chainId": 8453, "decimals": "6", "address": "0x833589fCD6eDb6E08f4c7C32D4f71b54bdA02913", "symbol": "USDC"}
+WETH = {"chainId": 8453, "decimals": "18", "address": "0x4200000000000000000000000000000000000006", "symbol": "WETH"}
+
+
+def random_token():
+    return {"chainId": 8453, "decimals": "18", "address": '0x%040x' % random.getrandbits(160), "symbol": "TKN%d" % random.randint(0, 999)}
+
+
+def hop(token_in, token_out):
+    return {
+        "type": "v3-pool",
+        "address": '0x%040x' % random.getrandbits(160),
+        "tokenIn": token_in,
+        "tokenOut": token_out,
+        "sqrtRatioX96": str(random.getrandbits(150)),
+        "liquidity": str(random.getrandbits(100)),
+        "tickCurrent": str(random.randint(-887272, 887272)),
+        "fee": str(random.choice([100, 500, 3000, 10000])),
+        "amountIn": str(random.getrandbits(70)),
+        "amountOut": str(random.getrandbits(70)),
+    }
+
+
+def quote_payload(routes: int, hops: int):
+    """Swap handler response with a Trading API quote of `routes` split routes"""
+    route_list = []
+    for _ in range(routes):
+        tokens = [USDC] + [random_token() for _ in range(hops - 1)] + [WETH]
+        route_list.append([hop(tokens[i], tokens[i + 1]) for i in range(hops)])
+    quote = {
+        "chainId": 8453,
+        "swapper": "0x0000000000000000000000000000000000000001",
+        "input": {"amount": "1000000000000", "token": USDC["address"]},
+        "output": {"amount": str(random.getrandbits(70)), "token": WETH["address"], "recipient": "0x0000000000000000000000000000000000000001"},
+        "slippage": 0.5,
+        "tradeType": "EXACT_INPUT",
+        "route": route_list,
+        "routeString": " , ".join("[V3] 100.00% = USDC -- 0.05% [0x...] --> WETH" for _ in range(routes)),
+        "quoteId": "0b2f1c5a-6f5e-4c07-9a4f-0d1c56b2b8aa",
+        "gasUseEstimate": "214000",
+        "blockNumber": "21493011",
+        "gasPrice": "11000000",
+        "maxFeePerGas": "22000000",
+        "maxPriorityFeePerGas": "1000000",
+        "gasFee": "2354000000000",
+        "gasFeeUSD": "0.0071",
+        "gasFeeQuote": "7100",
+        "priceImpact": 0.02,
+        "txFailureReasons": [],
+        "portionBips": 0,
+    }
+    return {
+        "success": True,
+        "error": None,
+        "data": {
+            "request": {"tokenIn": USDC["address"], "tokenOut": WETH["address"], "amount": "1000000000000", "type": "EXACT_INPUT"},
+            "api_response": {"requestId": "d8c0b1e4-1f47-4a2d-8d44-7b1f3f1c2a90", "routing": "CLASSIC", "quote": quote, "permitData": None},
+            "usdc_path": "0x" + os.urandom(43).hex(),
+            "split_route": {"amount_out": str(random.getrandbits(70)), "improvement_bps": 44.2, "splits": [
+                {"path": "0x" + os.urandom(43).hex(), "amount_in": str(random.getrandbits(60))} for _ in range(routes)
+            ]},
+        },
+    }
+
+
+PAYLOADS = {
+    "query BYTES": {"explanation": "Encoded path: USDC -> 0.05% -> WETH -> 0.1% -> ZRX", "value": os.urandom(66)},
+    # Wei amount beyond 64 bits, which orjson hands to the standard library encoder
+    "query UINT256 > 2**64": {"explanation": "Expected output: 1234.56 WETH", "value": 1234560000000000000000},
+    "query STRING_AND_BOOL": {"explanation": "Found optimal route: USDC -> 0.3% fee -> ZRX", "value": {"explanation": "0xc1a6D4cCB0E913C7f785Fcc60811B34bc8CC801c", "decision": True}},
+    "quote 1 route x 1 hop": quote_payload(1, 1),
+    "quote 4 routes x 3 hops": quote_payload(4, 3),
+    "quote 16 routes x 3 hops": quote_payload(16, 3),
+}
+
+
+def stdlib(payload):
+    return json.dumps(payload, default=lambda value: "0x" + value.hex() if isinstance(value, bytes) else str(value)).encode('utf-8')
+
+
+def fastapi_default(payload):
+    return json.dumps(jsonable_encoder(payload, custom_encoder={bytes: lambda value: "0x" + value.hex()})).encode('utf-8')
+
+
+def bench(func, payload, number):
+    best = min(timeit.repeat(lambda: func(payload), number=number, repeat=5))
+    return best / number * 1e6
+
+
+def main():
+    encoders = [("json", stdlib)]
+    if jsonable_encoder is not None:
+        encoders.append(("fastapi", fastapi_default))
+    encoders.append(("orjson" if orjson is not None else "json compact", dumps_json))
+    if msgpack is not None:
+        encoders.append(("msgpack", dumps_msgpack))
+
+    print(f"{'payload':<26}{'bytes':>8}" + ''.join(f"{name + ' us':>16}" for name, _ in encoders))
+    for name, payload in PAYLOADS.items():
+        size = len(dumps_json(payload))
+        number = max(200, 200000 // size)
+        timings = [bench(func, payload, number) for _, func in encoders]
+        print(f"{name:<26}{size:>8}" + ''.join(f"{timing:>16.2f}" for timing in timings))
+
+    uint256 = PAYLOADS["query UINT256 > 2**64"]
+    assert json.loads(dumps_json(uint256))["value"] == uint256["value"]
+    if msgpack is not None:
+        assert msgpack.unpackb(dumps_msgpack(uint256))["value"] == str(uint256["value"])
+
+    body, media_type = encode(PAYLOADS["query BYTES"], OCTET_STREAM_MEDIA_TYPE)
+    print(f"\nBYTES result as {media_type}: {len(body)} bytes vs {len(dumps_json(PAYLOADS['query BYTES']))} bytes of JSON")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import gc
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from pool_snapshot import PoolSnapshot
+
+# Memory and serialization cost of the GraphQL dict form vs PoolSnapshot
+
+POOL_COUNT = 20000
+TOKEN_COUNT = 3000
+
+random.seed(7)
+tokens = [
+    {
+        "id": f"VG9rZW46QkFTRV8w{i}",
+        "symbol": f"TKN{i}",
+        "name": f"Token number {i}",
+        "address": "0x%040x" % random.getrandbits(160),
+        "chain": "BASE",
+        "__typename": "Token",
+    }
+    for i in range(TOKEN_COUNT)
+]
+pools = []
+for i in range(POOL_COUNT):
+    token0, token1 = random.sample(tokens, 2)
+    pools.append({
+        "id": f"VjNQb29sOkJBU0VfMHg{i}",
+        "protocolVersion": "V3",
+        "address": "0x%040x" % random.getrandbits(160),
+        "totalLiquidity": {"value": random.uniform(1e3, 1e8)},
+        "feeTier": random.choice([100, 500, 3000, 10000]),
+        "token0": token0,
+        "token1": token1,
+        "txCount": random.randint(0, 10**6),
+        "volume24h": {"value": random.uniform(0, 1e7)},
+        "volume30d": {"value": random.uniform(0, 1e9)},
+    })
+raw = json.dumps({"data": {"topV3Pools": pools}})
+del pools, tokens
+
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    value = build()
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return value, current, elapsed
+
+
+dict_form, dict_bytes, dict_time = measure(lambda: json.loads(raw)['data']['topV3Pools'])
+snapshot, snapshot_bytes, snapshot_time = measure(lambda: PoolSnapshot.from_graphql(dict_form, 'BASE'))
+
+start = time.perf_counter()
+encoded = snapshot.to_bytes()
+encode_time = time.perf_counter() - start
+start = time.perf_counter()
+decoded = PoolSnapshot.from_bytes(encoded)
+decode_time = time.perf_counter() - start
+json_encoded = json.dumps(dict_form)
+
+assert decoded.to_records() == snapshot.to_records()
+
+print(f"pools: {POOL_COUNT}, distinct tokens: {TOKEN_COUNT}")
+print(f"dict form in memory:     {dict_bytes / 1e6:8.2f} MB  (json.loads {dict_time * 1000:.0f} ms)")
+print(f"PoolSnapshot in memory:  {snapshot_bytes / 1e6:8.2f} MB  (build {snapshot_time * 1000:.0f} ms)")
+print(f"json.dumps size:         {len(json_encoded) / 1e6:8.2f} MB")
+print(f"PoolSnapshot.to_bytes:   {len(encoded) / 1e6:8.2f} MB  (encode {encode_time * 1000:.1f} ms, decode {decode_time * 1000:.1f} ms)")
@@ -0,0 +1,114 @@
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from multicall_reader import PoolState
+from path_table import USDC_ADDRESSES
+from pool_snapshot import PoolSnapshot
+from split_router import SplitRouter
+
+# Split routing vs the single best path for growing USDC amounts.
+#
+#   python split_route_benchmark.py            synthetic pool graph
+#   python split_route_benchmark.py --live     BASE pools read on-chain (BASE_RPC_URL)
+#                                              vs the quote of _handle_swap_path_query
+
+USDC = USDC_ADDRESSES['BASE']
+WETH = '0x4200000000000000000000000000000000000006'
+AMOUNTS_USDC = [1_000, 100_000, 1_000_000, 10_000_000]
+
+
+def synthetic_market(pools: int = 3000, tokens: int = 400, seed: int = 7):
+    """Random pool graph plus a few USDC/WETH pools of different depth"""
+    random.seed(seed)
+    addresses = [USDC, WETH] + ['0x%040x' % (i + 1) for i in range(tokens)]
+    rows = []
+
+    def add(token0, token1, tvl, fee):
+        rows.append({
+            "address": '0x%040x' % (10 ** 9 + len(rows)),
+            "feeTier": fee,
+            "txCount": 1,
+            "totalLiquidity": {"value": tvl},
+            "volume24h": {"value": tvl / 10},
+            "volume30d": {"value": tvl * 3},
+            "token0": {"address": token0, "symbol": ""},
+            "token1": {"address": token1, "symbol": ""},
+        })
+
+    for tvl, fee in [(20e6, 500), (5e6, 3000), (2e6, 100)]:
+        add(USDC, WETH, tvl, fee)
+    for _ in range(pools):
+        token0, token1 = random.sample(addresses, 2)
+        add(token0, token1, random.lognormvariate(13, 2), random.choice([100, 500, 3000, 10000]))
+
+    snapshot = PoolSnapshot.from_graphql(rows, 'BASE')
+    state = PoolState('BASE', snapshot.version, 0, len(snapshot))
+    # USD value of one raw unit: USDC 6 decimals, WETH at 3000 USD, other tokens 1 USD with 18 decimals
+    unit_value = {USDC: 1e-6, WETH: 3000e-18}
+    for index in range(len(snapshot)):
+        row = snapshot.row(index)
+        value0 = unit_value.get(row.token0_address, 1e-18)
+        value1 = unit_value.get(row.token1_address, 1e-18)
+        price = value0 / value1  # token1 per token0
+        reserve0 = row.tvl / 2 / value0
+        state.sqrt_price[index] = price ** 0.5
+        # In-range liquidity of a concentrated position is a few times the full-range one
+        state.liquidity[index] = 4 * reserve0 * price ** 0.5
+        state.ok[index] = 1
+    return snapshot, state
+
+
+def report(router, amount_in, single_path_out=None):
+    quote = router.optimize(USDC, WETH, amount_in)
+    if quote is None:
+        print(f"{amount_in / 1e6:>12,.0f} USDC  no route")
+        return
+    line = (
+        f"{amount_in / 1e6:>12,.0f} USDC  routes {len(quote.splits):>2}  "
+        f"split {quote.amount_out / 1e18:>12.4f} WETH  single {quote.single_route_out / 1e18:>12.4f} WETH  "
+        f"{quote.improvement_bps:+8.1f} bps  {quote.solve_ms:6.2f} ms"
+    )
+    if single_path_out is not None:
+        line += f"  quote API {single_path_out / 1e18:.4f} WETH ({(quote.amount_out / single_path_out - 1) * 1e4:+.1f} bps)"
+    print(line)
+
+
+def synthetic():
+    snapshot, state = synthetic_market()
+    started = time.perf_counter()
+    router = SplitRouter(snapshot, state)
+    print(f"router over {len(snapshot)} pools built in {(time.perf_counter() - started) * 1000:.1f} ms")
+    for amount in AMOUNTS_USDC:
+        report(router, amount * 10 ** 6)
+
+
+async def live():
+    from uniswap_provider import UniswapPoolAgent
+
+    agent = await UniswapPoolAgent().initialize()
+    try:
+        await agent.refresh_snapshot('BASE')
+        if 'BASE' not in agent.pool_states:
+            raise SystemExit("Set BASE_RPC_URL to read pool state on-chain")
+        router = SplitRouter(agent.snapshots['BASE'], agent.pool_states['BASE'])
+        for amount in AMOUNTS_USDC:
+            answer = await agent._handle_swap_path_query(
+                f"What is the best path to swap amount {amount} USDC ( {USDC} ) to WETH ( {WETH} ) on BASE?", 8453
+            )
+            quote = answer.get('data', {}).get('api_response', {}).get('quote', {})
+            single_path_out = int(quote.get('output', {}).get('amount', 0)) or None
+            report(router, amount * 10 ** 6, single_path_out)
+    finally:
+        await agent.close()
+
+
+if __name__ == "__main__":
+    if '--live' in sys.argv:
+        asyncio.run(live())
+    else:
+        synthetic()